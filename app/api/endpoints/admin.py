@@ -0,0 +1,34 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from app.config import ADMIN_TOKEN
+from app.diagnostics import SamplingProfiler
+
+router = APIRouter()
+
+
+def _require_admin(token: Optional[str]) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def build_router(profiler: SamplingProfiler) -> APIRouter:
+    @router.post("/profile")
+    async def start_profile(
+        requests: int = Query(20, ge=1, le=1000),
+        x_admin_token: Optional[str] = Header(None),
+    ):
+        """Sample stacks over the next `requests` requests and write a folded profile."""
+        _require_admin(x_admin_token)
+        if not profiler.arm(requests):
+            raise HTTPException(status_code=409, detail="A profile is already running")
+        return {"status": "armed", "requests": requests, "directory": profiler.directory}
+
+    @router.get("/profile")
+    async def profile_status(x_admin_token: Optional[str] = Header(None)):
+        _require_admin(x_admin_token)
+        return profiler.status()
+
+    return router
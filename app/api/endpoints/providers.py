@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models import ProviderRequest, ProviderResponse
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from app.config import PROVIDERS_MAX_AGE, PROVIDERS_STALE_WHILE_REVALIDATE
+from app.metrics import track_background
+from app.models import ContentType, ProviderRequest, ProviderResponse
 from app.services.supabase_service import SupabaseService
 from app.services.tmdb_service import TMDBService
-import asyncio
+from app.timing import StageTimer, activate
 
 router = APIRouter()
 
+# Where load_region_providers got its answer
+FROM_CACHE = "cache"
+FROM_TMDB = "tmdb"
+UNAVAILABLE = "unavailable"  # TMDB failed; the empty answer must not be cached
+
 
 def get_supabase_service():
     return SupabaseService()
@@ -15,33 +25,103 @@ def get_tmdb_service():
     return TMDBService()
 
 
-@router.post("/", response_model=ProviderResponse)
-async def get_providers(
-    request: ProviderRequest,
-    supabase_service: SupabaseService = Depends(get_supabase_service),
-    tmdb_service: TMDBService = Depends(get_tmdb_service)
-) -> ProviderResponse:
-    if not request.region:
-        raise HTTPException(status_code=400, detail="Region parameter is required")
+async def load_region_providers(
+    content_id: int,
+    content_type: ContentType,
+    region: str,
+    supabase_service: SupabaseService,
+    tmdb_service: TMDBService,
+    timer: StageTimer,
+) -> Tuple[Dict[str, Any], str]:
+    """Providers for one region and where they came from; TMDB results are cached in the background."""
+    tmdb_providers = None
+    with timer.stage("total"), activate(timer):
+        # Try database first
+        with timer.stage("cache_lookup"):
+            db_providers = await supabase_service.get_providers(content_id, content_type, region)
 
-    # Try database first
-    db_providers = await supabase_service.get_providers(request.content_id, request.content_type, request.region)
+        if not db_providers:
+            # Fetch from TMDB
+            tmdb_providers = await tmdb_service.get_content_providers(content_id, content_type)
 
     if db_providers:
-        return db_providers
+        return db_providers, FROM_CACHE
+
+    if not tmdb_providers or "results" not in tmdb_providers:
+        return {"id": content_id, "results": {region: {}}}, UNAVAILABLE
+
+    track_background(supabase_service.save_providers(content_id, content_type, tmdb_providers))
+    return {"id": content_id, "results": {region: tmdb_providers["results"].get(region, {})}}, FROM_TMDB
+
+
+def _etag(content_type: ContentType, content_id: int, region: str, version: str) -> str:
+    """An ETag for one region's view of a stored providers row, from when the row was last written."""
+    key = f"{content_type.value}:{content_id}:{region}:{version}"
+    return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
 
-    # Fetch from TMDB
-    tmdb_providers = await tmdb_service.get_content_providers(request.content_id, request.content_type)
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires; compression turns our strong ETags weak."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in candidates
 
-    if tmdb_providers and "results" in tmdb_providers:
-        asyncio.create_task(supabase_service.save_providers(request.content_id, request.content_type, tmdb_providers))
 
-    results = tmdb_providers.get("results", {}) if tmdb_providers else {}
-    region_data = results.get(request.region, {})
+@router.get("/{content_type}/{content_id}", response_model=ProviderResponse)
+async def get_region_providers(
+    content_type: ContentType,
+    content_id: int,
+    region: str = Query(..., min_length=2, max_length=2),
+    if_none_match: Optional[str] = Header(None),
+    supabase_service: SupabaseService = Depends(get_supabase_service),
+    tmdb_service: TMDBService = Depends(get_tmdb_service)
+):
+    """
+    Cacheable providers lookup. The ETag comes from when the stored row was
+    last written, so a revalidation reads only that timestamp and a match
+    gets a 304 without loading the providers. Answers fresh from TMDB carry
+    no ETag until they are stored, and an empty answer after a TMDB failure
+    is never cached.
+    """
+    region = region.upper()
+    timer = StageTimer()
+    cache_control = f"public, max-age={PROVIDERS_MAX_AGE}, stale-while-revalidate={PROVIDERS_STALE_WHILE_REVALIDATE}"
 
-    return {
-        "id": request.content_id,
-        "results": {
-            request.region: region_data
-        }
+    with timer.stage("version_lookup"):
+        version = await supabase_service.get_providers_version(content_id, content_type)
+    etag = _etag(content_type, content_id, region, version) if version is not None else None
+    if etag is not None and _etag_matches(if_none_match, etag):
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Server-Timing": timer.server_timing()}
+        return Response(status_code=304, headers=headers)
+
+    data, source = await load_region_providers(content_id, content_type, region, supabase_service, tmdb_service, timer)
+    headers = {
+        "Cache-Control": "no-store" if source == UNAVAILABLE else cache_control,
+        "Server-Timing": timer.server_timing({"cache_lookup": "hit" if source == FROM_CACHE else "miss"}),
     }
+    # The body is at least as new as the version read above; a stale tag only costs one full response
+    if source == FROM_CACHE and etag is not None:
+        headers["ETag"] = etag
+    body = json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.post("/", response_model=ProviderResponse)
+async def get_providers(
+    request: ProviderRequest,
+    response: Response,
+    supabase_service: SupabaseService = Depends(get_supabase_service),
+    tmdb_service: TMDBService = Depends(get_tmdb_service)
+) -> Dict[str, Any]:
+    if not request.region:
+        raise HTTPException(status_code=400, detail="Region parameter is required")
+
+    timer = StageTimer()
+    data, source = await load_region_providers(
+        request.content_id, request.content_type, request.region, supabase_service, tmdb_service, timer
+    )
+    response.headers["Server-Timing"] = timer.server_timing({"cache_lookup": "hit" if source == FROM_CACHE else "miss"})
+    return data
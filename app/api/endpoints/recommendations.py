@@ -1,14 +1,55 @@
+import asyncio
 import json
 import logging
-from fastapi import APIRouter, Depends
+import time
+from typing import Any, AsyncGenerator, AsyncIterator, Dict, List, NamedTuple, Optional, Set, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
+from starlette.requests import HTTPConnection
 
 logger = logging.getLogger(__name__)
-from app.models import UserQuery, Movie, Show, ContentType, ContentTypeMode
+from app import deadline
+from app.config import (
+    BATCH_MAX_ROWS,
+    CLAUDE_MAX_PER_CLIENT,
+    DEGRADE_BELOW_SECONDS,
+    ITEM_DEADLINE_SECONDS,
+    REQUEST_DEADLINE_MAX_SECONDS,
+    REQUEST_DEADLINE_SECONDS,
+)
+from app.deadline import DeadlineExceeded
+from app.api.endpoints.providers import load_region_providers
+from app.metrics import (
+    BATCH_SHARED_LOOKUPS,
+    DEGRADED_ITEMS,
+    DROPPED_ITEMS,
+    TRUNCATED_STREAMS,
+    WEBSOCKET_SESSIONS,
+    WEBSOCKET_TURNS,
+    track_background,
+)
+from app.models import (
+    BatchQuery,
+    BatchRow,
+    ConversationTurn,
+    ContentType,
+    ContentTypeMode,
+    Movie,
+    ProviderRequest,
+    RecommendationSummary,
+    Show,
+    UserQuery,
+)
+from app.schemas import ContentRecommendation
+from app.services.admission import AdmissionRejected, Ticket, get_claude_admission
 from app.services.anthropic_service import AnthropicService
 from app.services.supabase_service import SupabaseService
 from app.services.tmdb_service import TMDBService
-import asyncio
+from app.timing import StageTimer, activate, record
+from app.titles import normalize_title
 from datetime import date, datetime
 
 router = APIRouter()
@@ -43,20 +84,215 @@ async def _cache_providers(tmdb_service: TMDBService, supabase_service: Supabase
         logger.error("Error caching providers for %s ID %s: %s", content_type.value, content_id, e)
 
 
-@router.post("/")
-async def get_recommendations_stream(
+def _request_budget(requested: Optional[float], header: Optional[float]) -> float:
+    """Seconds the request may take: the client's override if any, capped at REQUEST_DEADLINE_MAX_SECONDS."""
+    requested = requested or header
+    if requested is None or requested <= 0:
+        return REQUEST_DEADLINE_SECONDS
+    return min(requested, REQUEST_DEADLINE_MAX_SECONDS)
+
+
+async def _next_recommendation(recs: AsyncIterator[ContentRecommendation]) -> ContentRecommendation:
+    """The next item from the Claude stream. Raises DeadlineExceeded (closing the stream) once the deadline passes."""
+    async with deadline.enforced():
+        return await anext(recs)
+
+
+def _client_key(connection: HTTPConnection) -> str:
+    """
+    Who a request counts against for admission: its client IP, as resolved
+    from X-Forwarded-For by uvicorn's proxy headers. Nothing the client
+    chooses, like a session id, goes into the key, or a client could take a
+    fresh share of the slots with every request.
+    """
+    return f"ip:{connection.client.host if connection.client else 'unknown'}"
+
+
+async def _admit(request: Request) -> Ticket:
+    """A Claude generation slot, or a 429 with a Retry-After hint."""
+    try:
+        return await get_claude_admission().admit(_client_key(request))
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many recommendation requests, try again shortly",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+async def _releasing(stream: AsyncIterator[str], ticket: Ticket) -> AsyncIterator[str]:
+    """Pass the stream through, releasing the admission slot however it ends."""
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        ticket.release()
+
+
+def _claude_only(rec: ContentRecommendation, content_type: ContentType) -> dict:
+    """What can be sent about a recommendation without any metadata."""
+    title_field = "name" if content_type == ContentType.SHOW else "title"
+    return {title_field: rec.title, "year": rec.year, "reason": rec.reason or ""}
+
+
+class _Resolution(NamedTuple):
+    data: Optional[Dict[str, Any]]
+    content_type: ContentType
+    source: str  # cache, stale, tmdb or degraded
+    fetched: bool = False  # came from TMDB, so it should be cached
+    degraded: bool = False
+
+
+async def _resolve(
+    rec: ContentRecommendation,
+    rec_type: ContentType,
+    supabase_service: SupabaseService,
+    tmdb_service: TMDBService,
+) -> _Resolution:
+    """Metadata for one recommendation: the cache, then TMDB. Out of time, it comes back degraded with any stale row."""
+    stale = None
+    try:
+        # Check Supabase cache first
+        started_lookup = time.perf_counter()
+        cache_result = await supabase_service.get_content_by_titles([rec], rec_type)
+        record("cache_lookup", time.perf_counter() - started_lookup)
+
+        if cache_result.found:
+            return _Resolution(cache_result.found[0], rec_type, "cache")
+        if not cache_result.to_fetch:
+            return _Resolution(None, rec_type, "cache")
+
+        fetch_item = cache_result.to_fetch[0]
+        stale = fetch_item.stale
+        left = deadline.remaining()
+        if left is not None and left < DEGRADE_BELOW_SECONDS:
+            # Too late to start on TMDB; send what we have instead
+            raise DeadlineExceeded()
+
+        if fetch_item.id:
+            # Direct fetch by cached ID
+            fetched = await tmdb_service.fetch_content_data([fetch_item], rec_type)
+            return _Resolution(fetched[0] if fetched else None, rec_type, "stale", fetched=True)
+
+        # Search TMDB with fallback to other type
+        data, resolved_type = await tmdb_service.search_content(fetch_item.title, fetch_item.year, rec_type)
+        return _Resolution(data, resolved_type if data else rec_type, "tmdb", fetched=True)
+
+    except DeadlineExceeded:
+        logger.warning("Out of time resolving %s '%s'; sending it degraded", rec_type.value, rec.title)
+        return _Resolution(stale, rec_type, "degraded", degraded=True)
+
+
+async def _timed_resolve(
+    rec: ContentRecommendation,
+    rec_type: ContentType,
+    supabase_service: SupabaseService,
+    tmdb_service: TMDBService,
+) -> Tuple[_Resolution, StageTimer]:
+    """_resolve with its stages on a timer of its own, to be handed to every row that reads it."""
+    timer = StageTimer()
+    with activate(timer):
+        return await _resolve(rec, rec_type, supabase_service, tmdb_service), timer
+
+
+class SharedResolutions:
+    """
+    Title resolution shared by the rows of a batch: the first row to reach a
+    title looks it up, later rows wait for that lookup instead of repeating it.
+    Each row that reads a lookup gets its stages recorded, not only the row
+    that started it. A degraded lookup was cut short by its own row's
+    deadline, so it is not shared: the other rows look the title up again.
+    """
+
+    def __init__(self):
+        self._lookups: Dict[Tuple[str, Optional[int], ContentType], asyncio.Task] = {}
+
+    async def resolve(
+        self,
+        rec: ContentRecommendation,
+        rec_type: ContentType,
+        supabase_service: SupabaseService,
+        tmdb_service: TMDBService,
+    ) -> Tuple[_Resolution, bool]:
+        """The resolution, and whether this caller started it (and so owns caching it)."""
+        normalized = normalize_title(rec.title)
+        if not normalized:
+            # No key to share it under
+            return await _resolve(rec, rec_type, supabase_service, tmdb_service), True
+        key = (normalized, rec.year, rec_type)
+        lookup = self._lookups.get(key)
+        owner = lookup is None
+        if lookup is None:
+            lookup = asyncio.create_task(_timed_resolve(rec, rec_type, supabase_service, tmdb_service))
+            self._lookups[key] = lookup
+        # Shielded: a row that goes away must not cancel a lookup other rows are waiting for
+        resolution, timer = await asyncio.shield(lookup)
+        if resolution.degraded:
+            if self._lookups.get(key) is lookup:
+                del self._lookups[key]
+            if not owner:
+                return await _resolve(rec, rec_type, supabase_service, tmdb_service), True
+        elif not owner:
+            BATCH_SHARED_LOOKUPS.inc()
+        for stage, seconds in timer.stages.items():
+            record(stage, seconds)
+        return resolution, owner
+
+    def close(self) -> None:
+        for lookup in self._lookups.values():
+            lookup.cancel()
+
+
+async def recommendation_events(
     query: UserQuery,
-    anthropic_service: AnthropicService = Depends(get_anthropic_service),
-    supabase_service: SupabaseService = Depends(get_supabase_service),
-    tmdb_service: TMDBService = Depends(get_tmdb_service)
-):
+    debug: bool,
+    expires_at: float,
+    ticket: Ticket,
+    anthropic_service: AnthropicService,
+    supabase_service: SupabaseService,
+    tmdb_service: TMDBService,
+    shared: Optional[SharedResolutions] = None,
+) -> AsyncGenerator[dict, None]:
+    """
+    One recommendation turn as events (init, content..., degraded, summary),
+    shared by the NDJSON, batch and WebSocket transports. `ticket` is the
+    admission slot, released as soon as Claude is done; `expires_at` is the
+    turn's deadline on the time.monotonic() clock. Batch rows pass `shared`
+    so that a title recommended to several rows is looked up once.
+    """
     request_mode = query.content_type
     is_both = request_mode == ContentTypeMode.BOTH
 
-    async def generate():
-        yield json.dumps({"type": "init", "query": query.query, "content_type": request_mode.value}) + "\n"
+    started = time.perf_counter()
+    totals = StageTimer()
+    sources = {"cache": 0, "stale": 0, "tmdb": 0, "degraded": 0}
+    emitted = 0
+    dropped = 0
+    degraded_items = []
+    truncated = False
+
+    yield {"type": "init", "query": query.query, "content_type": request_mode.value}
+
+    recs = anthropic_service.get_recommendations(query.query, query.history, request_mode, query.web_search)
+    try:
+        waiting_since = time.perf_counter()
+        while True:
+            # The deadline is re-entered around each step; a scope must not span a yield
+            try:
+                with deadline.until(expires_at):
+                    rec = await _next_recommendation(recs)
+            except StopAsyncIteration:
+                break
+            except DeadlineExceeded:
+                logger.warning("Request deadline passed after %d items; closing the Claude stream", emitted)
+                TRUNCATED_STREAMS.inc()
+                truncated = True
+                break
+
+            timer = StageTimer() if debug else None
+            if timer:
+                timer.add("claude_wait", time.perf_counter() - waiting_since)
 
-        async for rec in anthropic_service.get_recommendations(query.query, query.history, request_mode, query.web_search):
             # Determine content_type for this specific recommendation
             if is_both:
                 # Use Claude's per-item classification
@@ -65,52 +301,389 @@ async def get_recommendations_stream(
                 # Explicit mode — ignore Claude's classification, use request type
                 rec_type = ContentType(request_mode.value)
 
-            model_class = Show if rec_type == ContentType.SHOW else Movie
-
-            # Check Supabase cache first
-            cache_result = await supabase_service.get_content_by_titles([rec], rec_type)
-
-            item_data = None
-            resolved_type = rec_type
+            with activate(timer), deadline.until(expires_at), deadline.scope(ITEM_DEADLINE_SECONDS):
+                if shared is None:
+                    resolution, owner = await _resolve(rec, rec_type, supabase_service, tmdb_service), True
+                else:
+                    resolution, owner = await shared.resolve(rec, rec_type, supabase_service, tmdb_service)
 
-            if cache_result.found:
-                item_data = cache_result.found[0]
-            elif cache_result.to_fetch:
-                fetch_item = cache_result.to_fetch[0]
+            resolved_type = resolution.content_type
+            model_class = Show if resolved_type == ContentType.SHOW else Movie
+            # A shared resolution is read by several rows; each gets its own copy to add its reason to
+            item_data = dict(resolution.data) if resolution.data else None
+            source = resolution.source
+            degraded = resolution.degraded
 
-                if fetch_item.id:
-                    # Direct fetch by cached ID
-                    fetched = await tmdb_service.fetch_content_data([fetch_item], rec_type)
-                    if fetched:
-                        item_data = fetched[0]
-                else:
-                    # Search TMDB with fallback to other type
-                    data, resolved_type = await tmdb_service.search_content(
-                        fetch_item.title, fetch_item.year, rec_type
-                    )
-                    if data:
-                        item_data = data
-                        item_data['reason'] = fetch_item.reason or ''
-                        model_class = Show if resolved_type == ContentType.SHOW else Movie
-
-            if item_data:
+            if item_data or degraded:
                 try:
-                    item_data["reason"] = rec.reason or ""
-                    validated = model_class.model_validate(item_data)
-                    yield json.dumps({
+                    started_validation = time.perf_counter()
+                    if item_data:
+                        item_data["reason"] = rec.reason or ""
+                        data = model_class.model_validate(item_data).model_dump()
+                    else:
+                        data = _claude_only(rec, rec_type)
+                    event: Dict[str, Any] = {
                         "type": "content",
                         "content_type": resolved_type.value,
-                        "data": validated.model_dump()
-                    }, default=json_serial) + "\n"
+                        "data": data
+                    }
+                    if degraded:
+                        event["degraded"] = True
+                        fallback = "stale" if item_data else "claude"
+                        degraded_items.append({
+                            "title": rec.title,
+                            "year": rec.year,
+                            "content_type": rec_type.value,
+                            "source": fallback,
+                        })
+                        DEGRADED_ITEMS.labels(fallback).inc()
+                    if timer:
+                        timer.add("validation", time.perf_counter() - started_validation)
+                        totals.merge(timer)
+                        sources[source] += 1
+                        event["source"] = source
+                        event["timing"] = timer.as_ms()
+                    emitted += 1
+                    yield event
                 except Exception as e:
                     logger.error("Error processing %s '%s': %s", resolved_type.value, rec.title, e)
+                    DROPPED_ITEMS.labels("validation").inc()
+                    dropped += 1
+
+                # Background: cache content and providers (only if freshly fetched).
+                # Started outside the deadline scopes, so they don't inherit the request's deadline.
+                if owner and resolution.fetched and item_data:
+                    track_background(supabase_service.save_content([item_data], resolved_type))
+                    track_background(_cache_providers(tmdb_service, supabase_service, item_data["id"], resolved_type))
+            else:
+                DROPPED_ITEMS.labels("not_found").inc()
+                dropped += 1
+
+            waiting_since = time.perf_counter()
+    finally:
+        # Closes the Claude stream (and its shard tasks) if the consumer stops early
+        await recs.aclose()
+
+    # Claude is done; the slot can go to the next request
+    ticket.release()
 
-                # Background: cache content and providers (only if freshly fetched)
-                if cache_result.to_fetch:
-                    asyncio.create_task(supabase_service.save_content([item_data], resolved_type))
-                    asyncio.create_task(_cache_providers(tmdb_service, supabase_service, item_data["id"], resolved_type))
+    if degraded_items or truncated:
+        yield {
+            "type": "degraded",
+            "items": degraded_items,
+            "truncated": truncated,
+        }
+
+    if debug:
+        yield {
+            "type": "summary",
+            "items": emitted,
+            "dropped": dropped,
+            "degraded": len(degraded_items),
+            "total_ms": round((time.perf_counter() - started) * 1000.0, 2),
+            "stages_ms": totals.as_ms(),
+            "sources": sources,
+        }
+
+
+@router.post("/")
+async def get_recommendations_stream(
+    query: UserQuery,
+    request: Request,
+    x_debug_timing: Optional[str] = Header(None),
+    x_request_deadline: Optional[float] = Header(None),
+    anthropic_service: AnthropicService = Depends(get_anthropic_service),
+    supabase_service: SupabaseService = Depends(get_supabase_service),
+    tmdb_service: TMDBService = Depends(get_tmdb_service)
+):
+    debug = query.debug or bool(x_debug_timing)
+    expires_at = time.monotonic() + _request_budget(query.deadline_seconds, x_request_deadline)
+    ticket = await _admit(request)
+
+    events = recommendation_events(
+        query, debug, expires_at, ticket, anthropic_service, supabase_service, tmdb_service
+    )
+    lines = (json.dumps(event, default=json_serial) + "\n" async for event in events)
 
     return StreamingResponse(
-        generate(),
-        media_type="application/x-ndjson"
+        _releasing(lines, ticket),
+        media_type="application/x-ndjson",
+        # In case the stream was never started
+        background=BackgroundTask(ticket.release),
+    )
+
+
+async def _batch_row(
+    row: BatchRow,
+    debug: bool,
+    expires_at: float,
+    client: str,
+    slots: asyncio.Semaphore,
+    shared: SharedResolutions,
+    out: "asyncio.Queue[Optional[dict]]",
+    anthropic_service: AnthropicService,
+    supabase_service: SupabaseService,
+    tmdb_service: TMDBService,
+) -> None:
+    """Run one row of a batch, putting its events on `out` tagged with the row id, then None."""
+    if row.deadline_seconds is not None:
+        # A row may ask for less time than the batch, never more
+        expires_at = min(expires_at, time.monotonic() + _request_budget(row.deadline_seconds, None))
+    try:
+        async with slots:
+            try:
+                ticket = await get_claude_admission().admit(client)
+            except AdmissionRejected as e:
+                out.put_nowait({"type": "error", "row": row.id, "status": 429, "retry_after": e.retry_after})
+                return
+            events = recommendation_events(
+                row, debug or row.debug, expires_at, ticket, anthropic_service, supabase_service, tmdb_service, shared
+            )
+            try:
+                async for event in events:
+                    out.put_nowait({**event, "row": row.id})
+                out.put_nowait({"type": "done", "row": row.id})
+            except Exception as e:
+                logger.error("Batch row '%s' failed: %s", row.id, e)
+                out.put_nowait({"type": "error", "row": row.id, "status": 500})
+            finally:
+                await events.aclose()
+                ticket.release()
+    finally:
+        out.put_nowait(None)
+
+
+@router.post("/batch")
+async def get_batch_recommendations(
+    batch: BatchQuery,
+    request: Request,
+    x_debug_timing: Optional[str] = Header(None),
+    x_request_deadline: Optional[float] = Header(None),
+    anthropic_service: AnthropicService = Depends(get_anthropic_service),
+    supabase_service: SupabaseService = Depends(get_supabase_service),
+    tmdb_service: TMDBService = Depends(get_tmdb_service)
+):
+    """
+    Several queries in one NDJSON stream, e.g. the carousels of a landing
+    page. Rows generate concurrently, as many at a time as a client may hold
+    admission slots, and every event carries its row id; each row ends with
+    {"type": "done"} or {"type": "error"}. A title recommended to more than
+    one row is looked up once. The deadline covers the whole batch; a row's
+    own deadline_seconds can only shorten it for that row.
+    """
+    if len(batch.rows) > BATCH_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ROWS} rows per batch")
+    if len({row.id for row in batch.rows}) != len(batch.rows):
+        raise HTTPException(status_code=400, detail="Row ids must be unique")
+
+    debug = bool(x_debug_timing)
+    expires_at = time.monotonic() + _request_budget(batch.deadline_seconds, x_request_deadline)
+    client = _client_key(request)
+
+    async def generate():
+        out: "asyncio.Queue[Optional[dict]]" = asyncio.Queue()
+        slots = asyncio.Semaphore(CLAUDE_MAX_PER_CLIENT)
+        shared = SharedResolutions()
+        rows = [
+            asyncio.create_task(_batch_row(
+                row, debug, expires_at, client, slots, shared, out, anthropic_service, supabase_service, tmdb_service
+            ))
+            for row in batch.rows
+        ]
+        try:
+            running = len(rows)
+            while running:
+                event = await out.get()
+                if event is None:
+                    running -= 1
+                else:
+                    yield json.dumps(event, default=json_serial) + "\n"
+        finally:
+            # The client went away, or every row is done
+            for row in rows:
+                row.cancel()
+            await asyncio.gather(*rows, return_exceptions=True)
+            shared.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def _summarize(data: Dict[str, Any]) -> RecommendationSummary:
+    """A streamed item as the conversation history records it."""
+    released = data.get("release_date") or data.get("first_air_date")
+    return RecommendationSummary(
+        title=data.get("title") or data.get("name") or "",
+        year=released.year if released else data.get("year"),
+        reason=data.get("reason"),
+    )
+
+
+class _Session:
+    """
+    One WebSocket conversation: its history, the turn in flight and any
+    provider lookups. Only one turn runs at a time; starting another cancels it.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        client: str,
+        anthropic_service: AnthropicService,
+        supabase_service: SupabaseService,
+        tmdb_service: TMDBService,
+    ):
+        self.websocket = websocket
+        self.client = client
+        self.anthropic_service = anthropic_service
+        self.supabase_service = supabase_service
+        self.tmdb_service = tmdb_service
+        self.history: List[ConversationTurn] = []
+        self.turns = 0
+        self._turn: Optional[asyncio.Task] = None
+        self._lookups: Set[asyncio.Task] = set()
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, event: Dict[str, Any]) -> None:
+        # Turns and provider lookups send from their own tasks
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(event, default=json_serial))
+
+    async def start_turn(self, query: UserQuery) -> None:
+        await self.cancel_turn()
+        if query.history is not None:
+            # A client that keeps its own history (e.g. after reconnecting) overrides ours
+            self.history = list(query.history)
+        self.turns += 1
+        self._turn = asyncio.create_task(self._run_turn(self.turns, query))
+
+    async def cancel_turn(self) -> None:
+        turn, self._turn = self._turn, None
+        if turn is None or turn.done():
+            return
+        turn.cancel()
+        try:
+            await turn
+        except asyncio.CancelledError:
+            pass
+        await self.send({"type": "cancelled", "turn": self.turns})
+
+    async def _run_turn(self, number: int, query: UserQuery) -> None:
+        expires_at = time.monotonic() + _request_budget(query.deadline_seconds, None)
+        try:
+            ticket = await get_claude_admission().admit(self.client)
+        except AdmissionRejected as e:
+            WEBSOCKET_TURNS.labels("rejected").inc()
+            await self.send({
+                "type": "error",
+                "turn": number,
+                "status": 429,
+                "detail": "Too many recommendation requests, try again shortly",
+                "retry_after": e.retry_after,
+            })
+            return
+
+        query = query.model_copy(update={"history": list(self.history)})
+        events = recommendation_events(
+            query, query.debug, expires_at, ticket, self.anthropic_service, self.supabase_service, self.tmdb_service
+        )
+        recommended = []
+        outcome = "cancelled"
+        try:
+            async for event in events:
+                if event["type"] == "content":
+                    recommended.append(_summarize(event["data"]))
+                await self.send({**event, "turn": number})
+            await self.send({"type": "done", "turn": number})
+            outcome = "completed"
+        except Exception as e:
+            logger.error("Recommendation turn %d failed: %s", number, e)
+            outcome = "failed"
+            await self.send({"type": "error", "turn": number, "status": 500, "detail": "Recommendation failed"})
+        finally:
+            await events.aclose()
+            ticket.release()
+            WEBSOCKET_TURNS.labels(outcome).inc()
+            # A cancelled turn still happened as far as the user is concerned; the next one builds on it
+            self.history.append(ConversationTurn(query=query.query, recommendations=recommended))
+
+    def lookup_providers(self, request: ProviderRequest) -> None:
+        task = asyncio.create_task(self._providers(request))
+        self._lookups.add(task)
+        task.add_done_callback(self._lookups.discard)
+
+    async def _providers(self, request: ProviderRequest) -> None:
+        region = request.region.upper()
+        try:
+            data, _ = await load_region_providers(
+                request.content_id, request.content_type, region, self.supabase_service, self.tmdb_service, StageTimer()
+            )
+        except Exception as e:
+            logger.error("Error loading providers for %s ID %s: %s", request.content_type.value, request.content_id, e)
+            data = None
+        await self.send({
+            "type": "providers",
+            "content_id": request.content_id,
+            "content_type": request.content_type.value,
+            "region": region,
+            "data": data,
+        })
+
+    async def close(self) -> None:
+        tasks = [task for task in [self._turn, *self._lookups] if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@router.websocket("/ws")
+async def recommendations_socket(
+    websocket: WebSocket,
+    anthropic_service: AnthropicService = Depends(get_anthropic_service),
+    supabase_service: SupabaseService = Depends(get_supabase_service),
+    tmdb_service: TMDBService = Depends(get_tmdb_service)
+):
+    """
+    One connection per conversation. The client sends JSON messages:
+
+      {"type": "query", ...UserQuery fields}   start a turn, cancelling the one in flight
+      {"type": "cancel"}                       cancel the turn in flight
+      {"type": "providers", "content_id", "content_type", "region"}
+
+    and gets the same events as the NDJSON stream, tagged with the turn
+    number, followed by {"type": "done"} or {"type": "cancelled"}. The
+    conversation history is kept here, so queries need not re-send it.
+    """
+    await websocket.accept()
+    session = _Session(
+        websocket, _client_key(websocket), anthropic_service, supabase_service, tmdb_service
     )
+    WEBSOCKET_SESSIONS.inc()
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                await session.send({"type": "error", "status": 400, "detail": "Messages must be JSON"})
+                continue
+            kind = message.get("type") if isinstance(message, dict) else None
+
+            try:
+                if kind == "query":
+                    await session.start_turn(UserQuery.model_validate(message))
+                elif kind == "cancel":
+                    await session.cancel_turn()
+                elif kind == "providers":
+                    session.lookup_providers(ProviderRequest.model_validate(message))
+                else:
+                    await session.send({"type": "error", "status": 400, "detail": f"Unknown message type: {kind}"})
+            except ValidationError as e:
+                await session.send({
+                    "type": "error",
+                    "status": 422,
+                    "detail": jsonable_encoder(e.errors()),
+                })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await session.close()
+        WEBSOCKET_SESSIONS.dec()
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from app.metrics import track_background
+from app.models import ShowDetails
+from app.services.storage.base import SHOW_DETAIL_COLUMNS
+from app.services.supabase_service import SupabaseService
+from app.services.tmdb_service import TMDBService
+from app.timing import StageTimer, activate
+
+router = APIRouter()
+
+
+def get_supabase_service():
+    return SupabaseService()
+
+
+def get_tmdb_service():
+    return TMDBService()
+
+
+@router.get("/{show_id}/details", response_model=ShowDetails)
+async def get_show_details(
+    show_id: int,
+    response: Response,
+    supabase_service: SupabaseService = Depends(get_supabase_service),
+    tmdb_service: TMDBService = Depends(get_tmdb_service)
+):
+    """
+    Seasons and the last and next episodes of a show. They are kept out of
+    the shows row that every recommendation reads, and loaded here when a
+    client opens the show.
+    """
+    timer = StageTimer()
+    with timer.stage("total"), activate(timer):
+        with timer.stage("cache_lookup"):
+            details = await supabase_service.get_show_details(show_id)
+        cached = details is not None
+
+        if details is None:
+            show = await tmdb_service.get_show_details(show_id)
+            if not show:
+                raise HTTPException(status_code=404, detail="Show not found")
+            details = {"id": show_id, **{column: show.get(column) for column in SHOW_DETAIL_COLUMNS}}
+            track_background(supabase_service.save_show_details(show))
+
+    response.headers["Server-Timing"] = timer.server_timing({"cache_lookup": "hit" if cached else "miss"})
+    return details
@@ -0,0 +1,84 @@
+"""
+Build the memory-mapped title index (app/services/title_index.py) from the
+cached catalog and atomically swap it into place. Running workers remap the
+new file within 30 seconds; no restart is needed.
+
+    python -m app.cli.build_title_index
+    python -m app.cli.build_title_index --out /srv/pikflix/title_index.bin
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from app.config import TITLE_INDEX_PATH, config_errors
+from app.models import ContentType
+from app.services.storage import close_backend, get_backend
+from app.services.title_index import write_index
+
+logger = logging.getLogger("app.cli.build_title_index")
+
+Entry = Tuple[str, Optional[int], int, ContentType, float]
+
+
+def _year(value) -> Optional[int]:
+    text = str(value or "")[:4]
+    return int(text) if text.isdigit() else None
+
+
+def _entries(rows: List[dict], content_type: ContentType) -> Iterator[Entry]:
+    for row in rows:
+        year = _year(row.get("date"))
+        popularity = row.get("popularity") or 0.0
+        # Index the original title too, so "Amélie" and "Le Fabuleux Destin d'Amélie Poulain" both resolve
+        for title in {row.get("title"), row.get("original_title")}:
+            if title:
+                yield title, year, row["id"], content_type, popularity
+
+
+async def collect(page_size: int) -> List[Entry]:
+    backend = get_backend()
+    entries: List[Entry] = []
+    for content_type in ContentType:
+        after_id = 0
+        count = 0
+        while True:
+            rows = await backend.scan_titles(content_type, after_id, page_size)
+            if not rows:
+                break
+            entries.extend(_entries(rows, content_type))
+            count += len(rows)
+            after_id = rows[-1]["id"]
+        logger.info("Read %d %s rows", count, content_type.value)
+    return entries
+
+
+async def build(out: str, page_size: int) -> None:
+    started = time.monotonic()
+    try:
+        entries = await collect(page_size)
+    finally:
+        await close_backend()
+    written = write_index(out, entries)
+    logger.info("Wrote %d entries to %s in %.1fs", written, out, time.monotonic() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the title index from the cached catalog")
+    parser.add_argument("--out", default=TITLE_INDEX_PATH, help="Index file to replace (default: TITLE_INDEX_PATH)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows read per storage query")
+    args = parser.parse_args()
+    errors = config_errors()
+    if errors:
+        parser.error("; ".join(errors))
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    if not args.out:
+        parser.error("TITLE_INDEX_PATH is empty; pass --out")
+    asyncio.run(build(args.out, args.page_size))
+
+
+if __name__ == "__main__":
+    main()
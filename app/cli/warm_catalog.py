@@ -0,0 +1,226 @@
+"""
+Warm the content cache from a TMDB daily ID export.
+
+TMDB publishes gzipped JSON-lines exports of every movie and series id
+(https://developer.themoviedb.org/docs/daily-id-exports), one object per line:
+
+    {"adult":false,"id":550,"original_title":"Fight Club","popularity":61.4,"video":false}
+
+This streams a downloaded export, keeps the N most popular ids in a heap (so
+memory is bounded by N, not by the export), fetches their details with a
+bounded worker pool and bulk-upserts them through the configured storage
+backend. TMDB calls go through TMDBService's shared rate limiter, which also
+retries 429s. Ids are appended to a checkpoint file after every batch is
+stored, so an interrupted run resumes where it stopped.
+
+    python -m app.cli.warm_catalog movie_ids_10_17_2026.json.gz --top 20000
+    python -m app.cli.warm_catalog tv_series_ids_10_17_2026.json.gz --top 5000 --rate 30
+"""
+
+import argparse
+import asyncio
+import gzip
+import heapq
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.config import config_errors
+from app.models import ContentType
+from app.services.rate_limiter import get_tmdb_limiter
+from app.services.storage import close_backend
+from app.services.supabase_service import SupabaseService
+from app.services.tmdb_service import TMDBService
+
+logger = logging.getLogger("app.cli.warm_catalog")
+
+_DONE = None  # queue sentinel
+
+
+def content_type_for(path: str) -> Optional[ContentType]:
+    name = os.path.basename(path)
+    if name.startswith("movie_ids"):
+        return ContentType.MOVIE
+    if name.startswith("tv_series_ids"):
+        return ContentType.SHOW
+    return None
+
+
+def read_export(path: str) -> Iterator[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning("Skipping malformed export line: %.80s", line)
+
+
+def select_top(path: str, top: int, skip: Set[int]) -> List[Tuple[float, int]]:
+    """The `top` most popular (popularity, id) pairs, most popular first, ignoring ids in `skip`."""
+    heap: List[Tuple[float, int]] = []
+    scanned = 0
+    for entry in read_export(path):
+        scanned += 1
+        if entry.get("adult") or entry.get("video"):
+            continue
+        content_id = entry.get("id")
+        if content_id is None or content_id in skip:
+            continue
+        candidate = (float(entry.get("popularity") or 0.0), int(content_id))
+        if len(heap) < top:
+            heapq.heappush(heap, candidate)
+        elif candidate > heap[0]:
+            heapq.heapreplace(heap, candidate)
+    logger.info("Scanned %d export entries, selected %d", scanned, len(heap))
+    return sorted(heap, reverse=True)
+
+
+def load_checkpoint(path: str) -> Set[int]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {int(line) for line in f if line.strip()}
+
+
+class CatalogWarmer:
+    def __init__(
+        self,
+        content_type: ContentType,
+        checkpoint_path: str,
+        concurrency: int = 8,
+        rate: float = 40.0,
+        batch_size: int = 100,
+    ):
+        self.content_type = content_type
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        # TMDBService calls go through the shared limiter; run it at the requested rate
+        get_tmdb_limiter().set_rate(rate)
+        self.tmdb = TMDBService()
+        self.storage = SupabaseService()
+        self.stored = 0
+        self.missing = 0
+        self.failed = 0
+        self._batch: List[Dict[str, Any]] = []
+        self._batch_missing: List[int] = []
+        self._flush_lock = asyncio.Lock()
+
+    async def run(self, ids: List[int]) -> None:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        started = time.monotonic()
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        try:
+            for position, content_id in enumerate(ids, start=1):
+                await queue.put(content_id)
+                if position % (self.batch_size * 10) == 0:
+                    elapsed = time.monotonic() - started
+                    logger.info(
+                        "%d/%d queued, %d stored, %d missing, %d failed (%.1f/s)",
+                        position, len(ids), self.stored, self.missing, self.failed, position / elapsed,
+                    )
+            for _ in workers:
+                await queue.put(_DONE)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await self._flush()
+
+        logger.info(
+            "Finished in %.0fs: %d stored, %d missing on TMDB, %d failed (rerun to retry)",
+            time.monotonic() - started, self.stored, self.missing, self.failed,
+        )
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            content_id = await queue.get()
+            if content_id is _DONE:
+                return
+            try:
+                if self.content_type == ContentType.SHOW:
+                    data = await self.tmdb.get_show_details(content_id)
+                else:
+                    data = await self.tmdb.get_movie_details(content_id)
+            except Exception as e:
+                logger.warning("Fetching %s %s failed: %s", self.content_type.value, content_id, e)
+                self.failed += 1
+                continue
+
+            if data:
+                self._batch.append(data)
+            else:
+                # Deleted or hidden on TMDB since the export; don't retry it
+                self._batch_missing.append(content_id)
+            if len(self._batch) + len(self._batch_missing) >= self.batch_size:
+                await self._flush()
+
+    async def _flush(self) -> None:
+        async with self._flush_lock:
+            batch, self._batch = self._batch, []
+            missing, self._batch_missing = self._batch_missing, []
+            if batch:
+                try:
+                    await self.storage.save_content_batch(batch, self.content_type)
+                except Exception as e:
+                    logger.error("Storing a batch of %d failed: %s (%s)", len(batch), e, e.__class__.__name__)
+                    self.failed += len(batch)
+                    batch = []
+            self.stored += len(batch)
+            self.missing += len(missing)
+            done = [item["id"] for item in batch] + missing
+            if done:
+                with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{content_id}\n" for content_id in done))
+
+
+async def warm(args: argparse.Namespace, content_type: ContentType) -> None:
+    checkpoint = args.checkpoint or f"{args.export}.done"
+    done = load_checkpoint(checkpoint)
+    if done:
+        logger.info("Resuming: %d ids already stored according to %s", len(done), checkpoint)
+
+    selected = select_top(args.export, args.top, done)
+    warmer = CatalogWarmer(
+        content_type,
+        checkpoint,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        batch_size=args.batch_size,
+    )
+    try:
+        await warmer.run([content_id for _, content_id in selected])
+    finally:
+        await close_backend()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Warm the content cache from a TMDB daily ID export")
+    parser.add_argument("export", help="Path to movie_ids_*.json.gz or tv_series_ids_*.json.gz")
+    parser.add_argument("--type", choices=[t.value for t in ContentType], help="Content type (default: from the file name)")
+    parser.add_argument("--top", type=int, default=10000, help="Number of most popular titles to load")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent TMDB requests")
+    parser.add_argument("--rate", type=float, default=40.0, help="Maximum TMDB requests per second")
+    parser.add_argument("--batch-size", type=int, default=100, help="Rows per bulk upsert")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <export>.done)")
+    args = parser.parse_args()
+    errors = config_errors()
+    if errors:
+        parser.error("; ".join(errors))
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    content_type = ContentType(args.type) if args.type else content_type_for(args.export)
+    if content_type is None:
+        parser.error("cannot tell the content type from the file name; pass --type")
+
+    asyncio.run(warm(args, content_type))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Response compression that keeps streams streaming.
+
+CompressionMiddleware negotiates brotli or gzip from Accept-Encoding and
+compresses JSON, NDJSON and text responses. A streamed response is flushed
+after every body chunk (zlib's Z_SYNC_FLUSH, brotli's flush), and every
+chunk of the NDJSON recommendation stream is one event. The client can
+decode each event as soon as it arrives, and later events still compress
+against the earlier ones. Responses sent in a single body message below
+`minimum_size` bytes, like most /api/providers lookups, go out uncompressed.
+
+brotli is optional (see requirements-optional.txt); without it only gzip is offered.
+"""
+
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli  # type: ignore[import-not-found]
+except ImportError:  # optional dependency
+    brotli = None
+
+_COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """"br", "gzip" or None for an Accept-Encoding header, preferring brotli on a tie."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip().lower()] = q
+
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for name in offered:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class StreamCompressor:
+    """One response's compressor: compress() returns bytes ready to send, flushed."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, brotli_quality: int = 4):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_FINISH)
+
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware; see the module docstring."""
+
+    def __init__(self, app, minimum_size: int = 500, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = _header(scope["headers"], b"accept-encoding")
+        encoding = negotiate(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[StreamCompressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                content_type = _header(headers, b"content-type") or b""
+                if (
+                    _header(headers, b"content-encoding") is not None
+                    or not content_type.startswith(_COMPRESSIBLE_TYPES)
+                    or message["status"] < 200
+                    or message["status"] in (204, 304)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    # Held until the first body chunk shows whether this is a stream
+                    start = {**message, "headers": headers}
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+                compressor = StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+                headers.append((b"content-encoding", encoding.encode()))
+                # The compressed bytes differ from what a strong ETag promised
+                headers = [
+                    (k, b"W/" + v if k.lower() == b"etag" and not v.startswith(b"W/") else v)
+                    for k, v in headers
+                ]
+                vary = _header(headers, b"vary")
+                if vary is None:
+                    headers.append((b"vary", b"Accept-Encoding"))
+                elif b"accept-encoding" not in vary.lower():
+                    headers = [(k, v + b", Accept-Encoding" if k.lower() == b"vary" else v) for k, v in headers]
+                if not more_body:
+                    body = compressor.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": headers})
+                    start = None
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send({**start, "headers": headers})
+                start = None
+
+            if more_body:
+                # Keep-alive chunks can be empty; there is nothing to flush for them
+                chunk = compressor.compress(body) if body else b""
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": compressor.finish(body)})
+
+        await self.app(scope, receive, send_wrapper)
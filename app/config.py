@@ -1,5 +1,5 @@
 import os
-import sys
+from typing import List
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,29 +12,179 @@ TMDB_READ_ACCESS_TOKEN = os.getenv("TMDB_READ_ACCESS_TOKEN")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-# Validate required env vars
-_required = {
-    "ANTHROPIC_API_KEY": ANTHROPIC_API_KEY,
-    "TMDB_READ_ACCESS_TOKEN": TMDB_READ_ACCESS_TOKEN,
-    "SUPABASE_URL": SUPABASE_URL,
-    "SUPABASE_KEY": SUPABASE_KEY,
-}
-_missing = [name for name, val in _required.items() if not val]
-if _missing:
-    print(f"Missing required environment variables: {', '.join(_missing)}", file=sys.stderr)
-    sys.exit(1)
+# Cache storage: "postgrest" uses Supabase's HTTP API (SUPABASE_URL/SUPABASE_KEY),
+# "postgres" connects to DATABASE_URL directly (requires asyncpg)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgrest")
+DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "1"))
+DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+# Set to 0 behind a transaction-mode pooler, where prepared statements cannot be reused
+DATABASE_STATEMENT_CACHE_SIZE = int(os.getenv("DATABASE_STATEMENT_CACHE_SIZE", "100"))
+
+# Circuit breaker around storage. It opens when STORAGE_BREAKER_FAILURE_RATIO of
+# the last STORAGE_BREAKER_WINDOW calls failed or took STORAGE_BREAKER_SLOW_SECONDS
+# or longer. While open, reads count as cache misses and writes are held in a
+# spill buffer of STORAGE_SPILL_MAX_ROWS rows until storage recovers.
+STORAGE_BREAKER_ENABLED = os.getenv("STORAGE_BREAKER_ENABLED", "true").lower() in ("1", "true", "yes")
+STORAGE_BREAKER_FAILURE_RATIO = float(os.getenv("STORAGE_BREAKER_FAILURE_RATIO", "0.5"))
+STORAGE_BREAKER_SLOW_SECONDS = float(os.getenv("STORAGE_BREAKER_SLOW_SECONDS", "1.5"))
+STORAGE_BREAKER_WINDOW = int(os.getenv("STORAGE_BREAKER_WINDOW", "20"))
+STORAGE_BREAKER_MIN_CALLS = int(os.getenv("STORAGE_BREAKER_MIN_CALLS", "10"))
+# Seconds to stay open before letting STORAGE_BREAKER_PROBES trial calls through
+STORAGE_BREAKER_OPEN_SECONDS = float(os.getenv("STORAGE_BREAKER_OPEN_SECONDS", "30"))
+STORAGE_BREAKER_PROBES = int(os.getenv("STORAGE_BREAKER_PROBES", "3"))
+STORAGE_SPILL_MAX_ROWS = int(os.getenv("STORAGE_SPILL_MAX_ROWS", "5000"))
+
+
+def config_errors() -> List[str]:
+    """
+    What is wrong with the environment, if anything. Checked by the app's
+    lifespan and the CLI commands rather than on import, so that importing
+    the app (tests, tooling, the startup benchmark) never exits the process.
+    """
+    if STORAGE_BACKEND not in ("postgrest", "postgres"):
+        return [f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND} (expected postgrest or postgres)"]
+    required = {
+        "ANTHROPIC_API_KEY": ANTHROPIC_API_KEY,
+        "TMDB_READ_ACCESS_TOKEN": TMDB_READ_ACCESS_TOKEN,
+    }
+    if STORAGE_BACKEND == "postgres":
+        required["DATABASE_URL"] = DATABASE_URL
+    else:
+        required["SUPABASE_URL"] = SUPABASE_URL
+        required["SUPABASE_KEY"] = SUPABASE_KEY
+    missing = [name for name, value in required.items() if not value]
+    if missing:
+        return [f"Missing required environment variables: {', '.join(missing)}"]
+    return []
+
 
 # Cache settings (in hours)
 CACHE_DURATION = 24 * 7  # 1 week default cache
 
+# Minimum trigram similarity (0-1) for a fuzzy cache hit when no normalized title
+# matches exactly. Values below pg_trgm.similarity_threshold (0.3) act as 0.3.
+TITLE_MATCH_THRESHOLD = float(os.getenv("TITLE_MATCH_THRESHOLD", "0.6"))
+
+# Memory-mapped (title, year) -> TMDB id index built by python -m app.cli.build_title_index.
+# Lookups skip it while the file does not exist; set to an empty string to disable.
+TITLE_INDEX_PATH = os.getenv("TITLE_INDEX_PATH", "data/title_index.bin")
+
+# Node-local cache shared by all workers: per-process LRU in front of a SQLite
+# file in WAL mode. Off unless LOCAL_CACHE_PATH is set: it writes to local
+# disk, which not every deployment has (or keeps across restarts).
+LOCAL_CACHE_PATH = os.getenv("LOCAL_CACHE_PATH", "")
+LOCAL_CACHE_MAX_MB = float(os.getenv("LOCAL_CACHE_MAX_MB", "256"))
+LOCAL_CACHE_MEMORY_ITEMS = int(os.getenv("LOCAL_CACHE_MEMORY_ITEMS", "2048"))
+# L1 entries expire sooner so workers converge on what other workers wrote to L2
+LOCAL_CACHE_MEMORY_TTL = float(os.getenv("LOCAL_CACHE_MEMORY_TTL", "60"))
+# Seconds; content staleness is still decided by last_updated and CACHE_DURATION
+LOCAL_CACHE_TTL = {
+    "content": float(os.getenv("LOCAL_CACHE_CONTENT_TTL", "3600")),
+    "providers": float(os.getenv("LOCAL_CACHE_PROVIDERS_TTL", "3600")),
+    "titles": float(os.getenv("LOCAL_CACHE_TITLES_TTL", "86400")),
+}
+
 # Anthropic API settings
 ANTHROPIC_MODEL = "claude-haiku-4-5-20251001"
 
+# Optional override of the Messages API endpoint, e.g. the local stand-in in
+# benchmarks/stubs/anthropic_stub.py
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL") or None
+
+# When set, every Claude stream is captured to a JSONL fixture in this directory
+ANTHROPIC_RECORD_DIR = os.getenv("ANTHROPIC_RECORD_DIR") or None
+
+# Number of recommendations generated per request
+RECOMMENDATION_COUNT = 9
+
+# Admission control for Claude generations, per worker: at most
+# CLAUDE_MAX_CONCURRENT run at once, up to CLAUDE_QUEUE_SIZE more wait for
+# CLAUDE_QUEUE_TIMEOUT seconds, and each client IP holds at most
+# CLAUDE_MAX_PER_CLIENT running or queued. Everything else gets a 429.
+CLAUDE_MAX_CONCURRENT = int(os.getenv("CLAUDE_MAX_CONCURRENT", "16"))
+CLAUDE_QUEUE_SIZE = int(os.getenv("CLAUDE_QUEUE_SIZE", "32"))
+CLAUDE_QUEUE_TIMEOUT = float(os.getenv("CLAUDE_QUEUE_TIMEOUT", "2"))
+CLAUDE_MAX_PER_CLIENT = int(os.getenv("CLAUDE_MAX_PER_CLIENT", "2"))
+
+# Most rows one POST /api/recommendations/batch may ask for. A batch runs at
+# most CLAUDE_MAX_PER_CLIENT rows at a time; the rest wait their turn.
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "6"))
+
+# Split each generation into this many concurrent Claude calls (1 disables sharding).
+# In "both" mode, 2 shards split into one movie and one show generation.
+ANTHROPIC_SHARDS = int(os.getenv("ANTHROPIC_SHARDS", "1"))
+
+# Fraction of recommendation requests generated with the compact wire schema
+# (short keys, enum codes, bounded reasons). 0 disables it, 1 always uses it.
+COMPACT_SCHEMA_RATIO = float(os.getenv("COMPACT_SCHEMA_RATIO", "0"))
+
 # CORS
 CORS_ORIGINS = [
     origin.strip()
     for origin in os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
 ]
 
+# Browser/CDN caching of GET /api/providers/{content_type}/{content_id} (seconds)
+PROVIDERS_MAX_AGE = int(os.getenv("PROVIDERS_MAX_AGE", "3600"))
+PROVIDERS_STALE_WHILE_REVALIDATE = int(os.getenv("PROVIDERS_STALE_WHILE_REVALIDATE", "86400"))
+
+# Response compression (gzip, or brotli when installed). Streams are flushed per
+# event; single-message responses smaller than COMPRESSION_MIN_SIZE bytes are
+# sent as is.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
 # API Base URLs
-TMDB_BASE_URL = "https://api.themoviedb.org/3"
+TMDB_BASE_URL = os.getenv("TMDB_BASE_URL", "https://api.themoviedb.org/3")
+
+# Outbound TMDB limits, per process. TMDB allows roughly 50 requests/second.
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_BURST = float(os.getenv("TMDB_BURST", "20"))
+TMDB_MAX_CONCURRENCY = int(os.getenv("TMDB_MAX_CONCURRENCY", "20"))
+# Each 429 multiplies the rate by TMDB_RATE_BACKOFF; it then climbs back to
+# TMDB_RATE_LIMIT within TMDB_RATE_RECOVERY_SECONDS
+TMDB_RATE_BACKOFF = float(os.getenv("TMDB_RATE_BACKOFF", "0.5"))
+TMDB_RATE_RECOVERY_SECONDS = float(os.getenv("TMDB_RATE_RECOVERY_SECONDS", "30"))
+# Retries for 429, 5xx and connection errors, with full-jitter exponential backoff
+# (seconds) unless TMDB sends Retry-After
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+TMDB_BACKOFF_BASE = float(os.getenv("TMDB_BACKOFF_BASE", "0.25"))
+TMDB_BACKOFF_MAX = float(os.getenv("TMDB_BACKOFF_MAX", "8"))
+# Longest a single TMDB call may take; shortened further by the request's deadline
+TMDB_TIMEOUT = float(os.getenv("TMDB_TIMEOUT", "10"))
+# Calls still running after this percentile of recent latency get a duplicate
+# request; at most TMDB_HEDGE_MAX_RATIO of calls are hedged
+TMDB_HEDGE_PERCENTILE = float(os.getenv("TMDB_HEDGE_PERCENTILE", "0.95"))
+TMDB_HEDGE_MAX_RATIO = float(os.getenv("TMDB_HEDGE_MAX_RATIO", "0.05"))
+TMDB_HEDGE_MIN_DELAY = float(os.getenv("TMDB_HEDGE_MIN_DELAY", "0.05"))
+
+# Overall time budget for a recommendation request. Clients may ask for a
+# different one (deadline_seconds in the body or X-Request-Deadline), capped
+# at REQUEST_DEADLINE_MAX_SECONDS.
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "60"))
+# Time budget for resolving one recommendation (cache lookup + TMDB)
+ITEM_DEADLINE_SECONDS = float(os.getenv("ITEM_DEADLINE_SECONDS", "8"))
+# With less time than this left, TMDB is skipped and items are sent from the
+# expired cache row or Claude's title alone, marked "degraded"
+DEGRADE_BELOW_SECONDS = float(os.getenv("DEGRADE_BELOW_SECONDS", "2"))
+
+# Diagnostics: log the loop thread's stack when the event loop is blocked
+# longer than this (0 disables the monitor)
+LOOP_BLOCK_THRESHOLD_MS = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+# Logging: records are formatted and written by a background thread.
+# LOG_FORMAT is "color" (terminal), "json" (one object per line, for
+# production) or "plain". Per-item INFO logs on the hot paths are sampled at
+# LOG_SAMPLE_RATE; records that would overflow LOG_QUEUE_SIZE are dropped.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "color").lower()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Admin endpoints (/admin/*) are disabled unless a token is configured
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/pikflix-profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
@@ -0,0 +1,89 @@
+"""
+Per-request deadlines.
+
+A deadline is activated around some work, like a StageTimer (see timing.py).
+Services ask remaining() to size their own timeouts, so no deadline parameter
+needs threading through every call. Nested scopes can only tighten the
+deadline, never extend it.
+
+A streaming response keeps its deadline as an absolute time and re-enters it
+with until() around each step, since a scope must not span a yield. Tasks
+inherit the deadline active when they are created, so start background work
+outside any scope.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Iterator, Optional
+
+_current: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+# Seconds before the deadline at which it counts as expired()
+_SLACK = 0.005
+
+
+class DeadlineExceeded(TimeoutError):
+    """The active deadline ran out before the work finished."""
+
+
+@contextmanager
+def until(expires_at: Optional[float]) -> Iterator[None]:
+    """Run the block with the deadline at `expires_at` (a time.monotonic() value), or the enclosing one if sooner."""
+    current = _current.get()
+    if expires_at is None or (current is not None and current < expires_at):
+        expires_at = current
+    token = _current.set(expires_at)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def scope(seconds: Optional[float]) -> Iterator[None]:
+    """Run the block with at most `seconds` left (None keeps the enclosing deadline). Must not span a generator yield."""
+    with until(None if seconds is None else time.monotonic() + seconds):
+        yield
+
+
+def remaining() -> Optional[float]:
+    """Seconds left on the active deadline (may be negative), or None without one."""
+    expires_at = _current.get()
+    return None if expires_at is None else expires_at - time.monotonic()
+
+
+def expired() -> bool:
+    """Whether the active deadline has passed. Timers may fire a hair early, so this allows a little slack."""
+    left = remaining()
+    return left is not None and left <= _SLACK
+
+
+def timeout(ceiling: float) -> float:
+    """A per-call timeout: `ceiling`, shortened to the time left. Raises DeadlineExceeded once it has passed."""
+    left = remaining()
+    if left is None:
+        return ceiling
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(ceiling, left)
+
+
+@asynccontextmanager
+async def enforced() -> AsyncIterator[None]:
+    """Cancel the block when the active deadline passes, raising DeadlineExceeded instead."""
+    left = remaining()
+    if left is None:
+        yield
+        return
+    if left <= 0:
+        raise DeadlineExceeded()
+    timer = asyncio.timeout(left)
+    try:
+        async with timer:
+            yield
+    except TimeoutError:
+        if timer.expired():
+            raise DeadlineExceeded() from None
+        raise
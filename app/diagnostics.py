@@ -0,0 +1,209 @@
+"""
+Event-loop stall detection and an on-demand sampling profiler.
+
+LoopMonitor runs a heartbeat coroutine on the event loop and a watchdog thread
+beside it. When the heartbeat is late by more than the threshold, the loop is
+stuck in a callback, and the watchdog logs the loop thread's current stack,
+which is the code doing the blocking.
+
+SamplingProfiler samples every thread's stack at a fixed interval while a
+requested number of HTTP requests run and writes the result in the collapsed
+("folded") format read by flamegraph.pl, speedscope and similar tools.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from types import FrameType
+from typing import Optional
+
+from app.metrics import EVENT_LOOP_LAG, EVENT_LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    def __init__(self, threshold: float, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self._beat = time.monotonic()
+        self._reported_beat: Optional[float] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start monitoring the running loop. Call from the loop thread."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        # A new event per start: a watchdog that has not yet seen the last stop still exits
+        self._stop = threading.Event()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, args=(self._loop_thread_id, self._stop), name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Event loop monitor started (threshold %.0f ms)", self.threshold * 1000)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._beat = time.monotonic()
+            before = loop.time()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(0.0, loop.time() - before - self.interval))
+
+    def _watch(self, loop_thread_id: int, stop: threading.Event) -> None:
+        while not stop.wait(self.interval / 2):
+            beat = self._beat
+            stalled = time.monotonic() - beat - self.interval
+            if stalled < self.threshold or beat == self._reported_beat:
+                continue
+            # Report each stall once, with the stack of whatever is running right now
+            self._reported_beat = beat
+            EVENT_LOOP_STALLS.inc()
+            frame = sys._current_frames().get(loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>\n"
+            logger.warning("Event loop blocked for %.0f ms; loop thread stack:\n%s", stalled * 1000, stack.rstrip())
+
+
+class SamplingProfiler:
+    """Samples all thread stacks while the next N requests are in flight."""
+
+    def __init__(self, directory: str, interval: float = 0.005):
+        self.directory = directory
+        self.interval = interval
+        self.last_output: Optional[str] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # requests still to be admitted into the profile
+        self._in_flight = 0
+        self._requested = 0
+        # The running sampler's stop signal; each run has its own, so a
+        # re-armed profile never shares a thread or samples with the last one
+        self._stop: Optional[threading.Event] = None
+
+    @property
+    def active(self) -> bool:
+        return self._pending > 0 or self._in_flight > 0
+
+    def arm(self, requests: int) -> bool:
+        """Profile the next `requests` requests. Returns False if a profile is already pending."""
+        with self._lock:
+            if self.active:
+                return False
+            self._pending = requests
+            self._requested = requests
+            return True
+
+    def status(self) -> dict:
+        return {
+            "active": self.active,
+            "pending_requests": self._pending,
+            "in_flight_requests": self._in_flight,
+            "last_output": self.last_output,
+        }
+
+    def request_started(self) -> bool:
+        """Returns True if this request is part of the profile."""
+        with self._lock:
+            if self._pending <= 0:
+                return False
+            self._pending -= 1
+            self._in_flight += 1
+            if self._stop is None:
+                self._stop = threading.Event()
+                threading.Thread(
+                    target=self._run, args=(self._stop, self._requested), name="sampling-profiler", daemon=True
+                ).start()
+            return True
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if self._pending == 0 and self._in_flight == 0 and self._stop is not None:
+                self._stop.set()
+                self._stop = None
+
+    def _run(self, stop: threading.Event, requested: int) -> None:
+        own_id = threading.get_ident()
+        names = {}
+        samples: Counter = Counter()
+        started = time.time()
+        while not stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, top in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                frame: Optional[FrameType] = top
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                samples[";".join(reversed(stack))] += 1
+        self._write(started, samples, requested)
+
+    def _write(self, started: float, samples: Counter, requested: int) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(started))}.folded")
+            with open(path, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.last_output = path
+            logger.info(
+                "Wrote profile of %d requests (%d samples) to %s",
+                requested, sum(samples.values()), path,
+            )
+        except OSError as e:
+            logger.error("Could not write profile to %s: %s", self.directory, e)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that feeds request start/finish events to the profiler."""
+
+    _EXCLUDED_PREFIXES = ("/admin", "/metrics", "/health")
+
+    def __init__(self, app, profiler: SamplingProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not self.profiler.active
+            or scope["path"].startswith(self._EXCLUDED_PREFIXES)
+            or not self.profiler.request_started()
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal finished
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not finished:
+                finished = True
+                self.profiler.request_finished()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not finished:
+                finished = True
+                self.profiler.request_finished()
@@ -0,0 +1,102 @@
+"""
+Incremental extraction of JSON objects from a streamed document.
+
+Claude's structured output arrives as text deltas of a document like
+{"movies": [{...}, {...}, ...]}. JSONObjectExtractor is fed those deltas and
+returns each list item as soon as its closing brace arrives, without waiting
+for the rest of the document.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+_decoder = json.JSONDecoder()
+
+_WHITESPACE = " \t\n\r"
+
+# An item that still fails to decode past this size is treated as malformed
+_MAX_ITEM_CHARS = 64 * 1024
+
+
+class JSONObjectExtractor:
+    """
+    Incremental extractor for the objects of the first list in a streamed
+    JSON document.
+
+    Deltas are appended to a buffer that only ever holds the current item.
+    Python never walks the item character by character: when a delta brings a
+    closing brace, the item is handed to the C JSON decoder, which handles
+    escapes and brackets inside strings. Completed items are sliced off the
+    buffer by index. `done` is set once the list closes; anything fed after
+    that is ignored.
+    """
+
+    def __init__(self):
+        self.done = False
+        self._buffer = ""
+        self._in_list = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume a text delta and return the items completed by it."""
+        completed: List[Dict[str, Any]] = []
+        if self.done or not text:
+            return completed
+
+        self._buffer += text
+        if not self._in_list and not self._enter_list():
+            return completed
+        if "}" not in text and "]" not in text:
+            return completed
+
+        buffer = self._buffer
+        pos = 0
+        end = len(buffer)
+        while True:
+            # Skip the separators between items
+            while pos < end and (buffer[pos] in _WHITESPACE or buffer[pos] == ","):
+                pos += 1
+            if pos == end:
+                break
+            if buffer[pos] == "]":
+                self.done = True
+                break
+            if buffer[pos] != "{":
+                logger.warning("Unexpected list item: %s", buffer[pos:])
+                self.done = True
+                break
+            try:
+                item, pos = _decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # Incomplete item (or a brace inside one of its strings)
+                if end - pos > _MAX_ITEM_CHARS:
+                    logger.warning("Failed to parse: %s", buffer[pos:])
+                    self.done = True
+                break
+            completed.append(item)
+
+        self._buffer = "" if self.done else buffer[pos:]
+        return completed
+
+    def _enter_list(self) -> bool:
+        """Drop the document prefix up to and including the opening bracket of the list."""
+        buffer = self._buffer
+        in_string = False
+        escape = False
+        for index, ch in enumerate(buffer):
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "[":
+                self._buffer = buffer[index + 1:]
+                self._in_list = True
+                return True
+        return False
@@ -0,0 +1,178 @@
+"""
+Logging that stays off the event loop.
+
+configure_logging() routes every record through a bounded queue to a
+QueueListener thread, which does the formatting and the writes. On the
+calling side a log call stamps the record with the request id, merges the
+message arguments into the message (and renders any traceback), as the
+stock QueueHandler does, and enqueues it. The record then holds plain
+strings: an argument that changes after the call cannot change what is
+logged, and the record keeps no objects alive. If the queue is full the
+record is dropped and counted rather than blocking the loop.
+
+- LOG_FORMAT picks the output: "color" for a terminal, "json" (one object
+  per line) for production, "plain" otherwise.
+- RequestIdMiddleware gives each request an id (the client's X-Request-Id,
+  or a fresh one), returns it in the response headers and puts it on every
+  record logged while handling the request, including its background tasks.
+- Per-item INFO logs pass extra=SAMPLED. Only LOG_SAMPLE_RATE of them are
+  kept; warnings and errors are never sampled.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.config import LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+from app.metrics import LOG_RECORDS_DROPPED
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# extra= for high-volume per-item logs
+SAMPLED = {"sampled": True}
+
+_FORMAT = "%(asctime)s %(name)s %(levelname)s [%(request_id)s] %(message)s"
+
+RESET = "\033[0m"
+LEVEL_COLORS = {
+    logging.DEBUG:    "\033[36m",    # cyan
+    logging.INFO:     "\033[32m",    # green
+    logging.WARNING:  "\033[33m",    # yellow
+    logging.ERROR:    "\033[31m",    # red
+    logging.CRITICAL: "\033[1;31m",  # bold red
+}
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class ColorFormatter(logging.Formatter):
+    def format(self, record):
+        # Colors go on a copy: other handlers format the same record
+        record = logging.makeLogRecord(record.__dict__)
+        color = LEVEL_COLORS.get(record.levelno, RESET)
+        record.levelname = f"{color}{record.levelname}{RESET}"
+        record.name = f"\033[35m{record.name}{RESET}"  # magenta for logger name
+        return super().format(record)
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id != "-":
+            entry["request_id"] = record.request_id
+        if record.sampled and record.levelno < logging.WARNING:
+            entry["sample_rate"] = LOG_SAMPLE_RATE
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextFilter(logging.Filter):
+    """Runs on the caller's thread: stamps the request id and drops sampled-out records before they are queued."""
+
+    def filter(self, record):
+        # Only records logged with extra=SAMPLED carry it; give the rest a default to read
+        record.__dict__.setdefault("sampled", False)
+        if record.sampled and record.levelno < logging.WARNING and random.random() >= LOG_SAMPLE_RATE:
+            return False
+        record.request_id = _request_id.get() or "-"
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    _tracebacks = logging.Formatter()
+
+    def prepare(self, record):
+        # Like the stock prepare(), but without applying the output format:
+        # timestamps, colors and JSON are left to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or self._tracebacks.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging() -> None:
+    """Install the queue handler on the root logger and start the listener thread. Idempotent."""
+    global _listener
+    if _listener is not None:
+        return
+    formatter: logging.Formatter
+    if LOG_FORMAT == "json":
+        formatter = JSONFormatter()
+    elif LOG_FORMAT == "color":
+        formatter = ColorFormatter(_FORMAT)
+    else:
+        formatter = logging.Formatter(_FORMAT)
+    output = logging.StreamHandler()
+    output.setFormatter(formatter)
+
+    handler = _QueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(_ContextFilter())
+    logging.basicConfig(level=LOG_LEVEL, handlers=[handler], force=True)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what is still queued on exit
+    atexit.register(_listener.stop)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware; see the module docstring."""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for key, value in scope["headers"]:
+            if key.lower() == self.header:
+                # Bounded, in case a client sends something huge
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = _request_id.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((self.header, request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_id.reset(token)
@@ -1,33 +1,100 @@
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import recommendations, providers
-from app.config import CORS_ORIGINS
-
-RESET = "\033[0m"
-LEVEL_COLORS = {
-    logging.DEBUG:    "\033[36m",    # cyan
-    logging.INFO:     "\033[32m",    # green
-    logging.WARNING:  "\033[33m",    # yellow
-    logging.ERROR:    "\033[31m",    # red
-    logging.CRITICAL: "\033[1;31m",  # bold red
-}
-
-class ColorFormatter(logging.Formatter):
-    def format(self, record):
-        color = LEVEL_COLORS.get(record.levelno, RESET)
-        record.levelname = f"{color}{record.levelname}{RESET}"
-        record.name = f"\033[35m{record.name}{RESET}"  # magenta for logger name
-        return super().format(record)
-
-handler = logging.StreamHandler()
-handler.setFormatter(ColorFormatter("%(asctime)s %(name)s %(levelname)s %(message)s"))
-logging.basicConfig(level=logging.INFO, handlers=[handler])
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.api.endpoints import admin, recommendations, providers, shows
+from app.compression import CompressionMiddleware
+from app.config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_SIZE,
+    CORS_ORIGINS,
+    LOOP_BLOCK_THRESHOLD_MS,
+    PROFILE_DIR,
+    PROFILE_INTERVAL_MS,
+    config_errors,
+)
+from app.diagnostics import LoopMonitor, ProfilingMiddleware, SamplingProfiler
+from app.logging_config import RequestIdMiddleware, configure_logging
+from app.metrics import REGISTRY
+from app.services import anthropic_service
+from app.services.shared_cache import close_shared_cache, get_shared_cache
+from app.services.storage import close_backend, get_backend
+from app.services.title_index import get_title_index
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+profiler = SamplingProfiler(PROFILE_DIR, interval=PROFILE_INTERVAL_MS / 1000.0)
+loop_monitor = LoopMonitor(LOOP_BLOCK_THRESHOLD_MS / 1000.0)
+
+# What the warm-up has prepared; reported by /ready
+warm_state: Dict[str, Any] = {"ready": False}
+
+# Seconds between warm-up attempts after a failure, doubling up to the max
+_WARM_RETRY_SECONDS = 1.0
+_WARM_RETRY_MAX_SECONDS = 30.0
+
+
+def _warm_up() -> Dict[str, Any]:
+    """SDK imports, clients, schemas and prompts that would otherwise land on the first requests."""
+    started = time.perf_counter()
+    state: Dict[str, Any] = dict(anthropic_service.warm_up())
+    get_backend()
+    state["title_index"] = get_title_index() is not None
+    state["shared_cache"] = get_shared_cache() is not None
+    state["seconds"] = round(time.perf_counter() - started, 3)
+    return state
+
+
+async def _warm() -> None:
+    """Run the warm-up until it succeeds. /ready stays 503 meanwhile, reporting the last error."""
+    delay = _WARM_RETRY_SECONDS
+    attempts = 0
+    while True:
+        attempts += 1
+        try:
+            state = await asyncio.to_thread(_warm_up)
+        except Exception as e:
+            logger.error("Warm-up attempt %d failed, retrying in %.0fs: %s", attempts, delay, e)
+            warm_state.update(error=f"{e.__class__.__name__}: {e}", attempts=attempts)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _WARM_RETRY_MAX_SECONDS)
+            continue
+        warm_state.pop("error", None)
+        warm_state.update(state, attempts=attempts, ready=True)
+        logger.info("Warm-up done in %.3fs", state["seconds"])
+        return
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    errors = config_errors()
+    if errors:
+        raise RuntimeError("; ".join(errors))
+    if LOOP_BLOCK_THRESHOLD_MS > 0:
+        loop_monitor.start()
+    # In the background, so /health answers while the SDKs load
+    warming = asyncio.create_task(_warm())
+    try:
+        yield
+    finally:
+        warming.cancel()
+        loop_monitor.stop()
+        await close_backend()
+        close_shared_cache()
+        await anthropic_service.close_client()
+
 
 app = FastAPI(
     title="PikFlix API",
     description="A FastAPI server for handling content recommendations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -37,17 +104,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-Id"],
+)
+
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_GZIP_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY,
 )
 
+# Outermost, so every log line of a request carries its id
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(recommendations.router, prefix="/api/recommendations", tags=["recommendations"])
 app.include_router(providers.router, prefix="/api/providers", tags=["providers"])
+app.include_router(shows.router, prefix="/api/shows", tags=["shows"])
+app.include_router(admin.build_router(profiler), prefix="/admin", tags=["admin"], include_in_schema=False)
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """503 until the warm-up has succeeded, with its last error if an attempt failed; then what it prepared."""
+    if not warm_state["ready"]:
+        return JSONResponse({"status": "warming", **warm_state}, status_code=503)
+    return {"status": "ready", **warm_state}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,359 @@
+"""
+Low-overhead, in-process metrics rendered in the Prometheus text format.
+
+Counters, gauges and fixed-bucket histograms are plain Python objects updated
+on the hot path with a dict lookup and an addition; formatting only happens
+when /metrics is scraped. Values are per process.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Coroutine, Dict, List, Sequence, Set, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow generations
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self, name: str, labelnames: Sequence[str], key: Sequence[str]) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def render(self, name: str, labelnames: Sequence[str], key: Sequence[str]) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CLAUDE_TTFT = Histogram(
+    "pikflix_claude_time_to_first_token_seconds",
+    "Time from sending a Claude request to the first text delta",
+    ["schema"],
+)
+CLAUDE_ITEM_INTERVAL = Histogram(
+    "pikflix_claude_item_interarrival_seconds",
+    "Time between consecutive recommendations parsed from one Claude stream",
+    ["schema"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "pikflix_admission_in_flight",
+    "Requests holding an admission slot",
+    ["controller"],
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "pikflix_admission_queue_depth",
+    "Requests waiting for an admission slot",
+    ["controller"],
+)
+ADMISSION_WAIT = Histogram(
+    "pikflix_admission_wait_seconds",
+    "Time admitted requests waited for a slot",
+    ["controller"],
+)
+ADMISSION_REJECTED = Counter(
+    "pikflix_admission_rejected_total",
+    "Requests turned away with a 429, by cause (client_limit, queue_full, queue_timeout)",
+    ["controller", "reason"],
+)
+SUPABASE_LATENCY = Histogram(
+    "pikflix_supabase_duration_seconds",
+    "Supabase cache call latency",
+    ["operation"],
+)
+TMDB_LATENCY = Histogram(
+    "pikflix_tmdb_request_duration_seconds",
+    "TMDB request latency by endpoint and HTTP status",
+    ["endpoint", "status"],
+)
+TMDB_RETRIES = Counter(
+    "pikflix_tmdb_retries_total",
+    "TMDB requests retried, by endpoint and cause (HTTP status or error)",
+    ["endpoint", "reason"],
+)
+HEDGED_REQUESTS = Counter(
+    "pikflix_hedged_requests_total",
+    "Duplicate requests for slow calls, by endpoint and outcome (sent, won, over_budget)",
+    ["endpoint", "outcome"],
+)
+RATE_LIMITER_WAITING = Gauge(
+    "pikflix_rate_limiter_waiting",
+    "Outbound requests waiting for a rate limiter slot",
+    ["limiter"],
+)
+RATE_LIMITER_IN_FLIGHT = Gauge(
+    "pikflix_rate_limiter_in_flight",
+    "Outbound requests holding a rate limiter slot",
+    ["limiter"],
+)
+RATE_LIMITER_RATE = Gauge(
+    "pikflix_rate_limiter_rate",
+    "Requests per second a rate limiter currently allows, after cuts for 429s",
+    ["limiter"],
+)
+RATE_LIMITER_PAUSES = Counter(
+    "pikflix_rate_limiter_pauses_total",
+    "Times a Retry-After paused all requests through a limiter",
+    ["limiter"],
+)
+CIRCUIT_STATE = Gauge(
+    "pikflix_circuit_state",
+    "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+    ["breaker"],
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "pikflix_circuit_transitions_total",
+    "Circuit breaker state changes, by the state entered",
+    ["breaker", "state"],
+)
+CIRCUIT_REJECTED = Counter(
+    "pikflix_circuit_rejected_total",
+    "Calls skipped because a circuit breaker was open",
+    ["breaker"],
+)
+SPILLED_WRITES = Counter(
+    "pikflix_spilled_writes_total",
+    "Storage writes held back from an unavailable store, by kind and outcome (spilled, replayed, dropped)",
+    ["kind", "outcome"],
+)
+SPILL_BUFFER_SIZE = Gauge(
+    "pikflix_spill_buffer_rows",
+    "Storage writes waiting in the spill buffer",
+)
+CACHE_LOOKUPS = Counter(
+    "pikflix_cache_lookups_total",
+    "Content cache lookups by result (hit, stale, miss)",
+    ["content_type", "result"],
+)
+CACHE_FUZZY_MATCHES = Counter(
+    "pikflix_cache_fuzzy_matches_total",
+    "Cache hits found through the trigram fallback rather than an exact normalized title",
+    ["content_type"],
+)
+LOCAL_CACHE_LOOKUPS = Counter(
+    "pikflix_local_cache_lookups_total",
+    "Shared node-local cache lookups by namespace and result (memory, disk, miss)",
+    ["namespace", "result"],
+)
+TITLE_INDEX_LOOKUPS = Counter(
+    "pikflix_title_index_lookups_total",
+    "Title index lookups by caller and result (hit, miss)",
+    ["caller", "result"],
+)
+TMDB_SEARCHES = Counter(
+    "pikflix_tmdb_searches_total",
+    "search_content calls by outcome (index, primary, fallback, not_found)",
+    ["content_type", "outcome"],
+)
+DROPPED_ITEMS = Counter(
+    "pikflix_dropped_items_total",
+    "Recommendations that never reached the client",
+    ["reason"],
+)
+DEGRADED_ITEMS = Counter(
+    "pikflix_degraded_items_total",
+    "Recommendations sent without fresh metadata because time ran out, by what was sent (stale, claude)",
+    ["source"],
+)
+TRUNCATED_STREAMS = Counter(
+    "pikflix_truncated_streams_total",
+    "Recommendation streams cut short by the request deadline",
+)
+BATCH_SHARED_LOOKUPS = Counter(
+    "pikflix_batch_shared_lookups_total",
+    "Batch row items served by another row's title lookup instead of their own",
+)
+WEBSOCKET_SESSIONS = Gauge(
+    "pikflix_websocket_sessions",
+    "Open recommendation WebSocket connections",
+)
+WEBSOCKET_TURNS = Counter(
+    "pikflix_websocket_turns_total",
+    "Recommendation turns run over WebSocket connections, by how they ended (completed, cancelled, failed, rejected)",
+    ["outcome"],
+)
+BACKGROUND_TASKS = Gauge(
+    "pikflix_background_tasks_in_flight",
+    "Background cache writes currently running",
+)
+EVENT_LOOP_LAG = Histogram(
+    "pikflix_event_loop_lag_seconds",
+    "How late the event loop heartbeat timer fired",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+EVENT_LOOP_STALLS = Counter(
+    "pikflix_event_loop_stalls_total",
+    "Times the event loop was blocked longer than LOOP_BLOCK_THRESHOLD_MS",
+)
+LOG_RECORDS_DROPPED = Counter(
+    "pikflix_log_records_dropped_total",
+    "Log records dropped because the logging queue was full",
+)
+
+
+def timed(histogram: Histogram, *label_values: str) -> Callable:
+    """Decorator recording the duration of an async function, including failures."""
+    def decorator(func: Callable[..., Coroutine]) -> Callable[..., Coroutine]:
+        child = histogram.labels(*label_values)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        return wrapper
+    return decorator
+
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def track_background(coro: Coroutine) -> asyncio.Task:
+    """create_task that counts the task as in flight and keeps a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.inc()
+    _background_tasks.add(task)
+
+    def _done(finished: asyncio.Task) -> None:
+        BACKGROUND_TASKS.dec()
+        _background_tasks.discard(finished)
+
+    task.add_done_callback(_done)
+    return task
@@ -148,9 +148,7 @@ class Show(BaseModel):
     created_by: Optional[List[Creator]] = []
     origin_country: Optional[List[str]] = []
     languages: Optional[List[str]] = []
-    seasons: Optional[List[Season]] = []
-    last_episode_to_air: Optional[EpisodeInfo] = None
-    next_episode_to_air: Optional[EpisodeInfo] = None
+    # seasons and last/next episodes are not part of a card: see ShowDetails
     in_production: Optional[bool] = None
     type: Optional[str] = None
     last_updated: Optional[datetime] = None
@@ -159,6 +157,15 @@ class Show(BaseModel):
         from_attributes = True
 
 
+class ShowDetails(BaseModel):
+    """Per-season and episode data for a show, loaded on demand rather than with every card."""
+    id: int
+    seasons: Optional[List[Season]] = []
+    last_episode_to_air: Optional[EpisodeInfo] = None
+    next_episode_to_air: Optional[EpisodeInfo] = None
+    last_updated: Optional[datetime] = None
+
+
 class RecommendationSummary(BaseModel):
     title: str
     year: Optional[int] = None
@@ -175,6 +182,17 @@ class UserQuery(BaseModel):
     content_type: ContentTypeMode = ContentTypeMode.MOVIE
     history: Optional[List[ConversationTurn]] = None
     web_search: bool = False
+    debug: bool = False  # Adds per-item stage timing and a final summary event
+    deadline_seconds: Optional[float] = Field(None, gt=0)  # Overrides REQUEST_DEADLINE_SECONDS
+
+
+class BatchRow(UserQuery):
+    id: str = Field(..., min_length=1, max_length=64, description="Row id echoed on every event of this row")
+
+
+class BatchQuery(BaseModel):
+    rows: List[BatchRow] = Field(..., min_length=1)
+    deadline_seconds: Optional[float] = Field(None, gt=0)  # For the whole batch; a row's own can only shorten it
 
 class FetchRequest(BaseModel):
     """Item that needs to be fetched from TMDB — either fresh or cache-expired."""
@@ -182,6 +200,7 @@ class FetchRequest(BaseModel):
     year: Optional[int] = None
     reason: Optional[str] = None
     id: Optional[int] = None  # Present when cache had an expired entry
+    stale: Optional[Dict[str, Any]] = None  # The expired row, served as-is when there's no time to refresh it
 
 
 class CacheResult(BaseModel):
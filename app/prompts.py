@@ -5,15 +5,18 @@ Prompts are composed from a shared base + content-type-specific injections.
 Each content type only adds what's unique to it.
 """
 
+from functools import lru_cache
+
+from app.config import RECOMMENDATION_COUNT
 from app.models import ContentTypeMode
 
 _RECOMMENDATION_BASE = (
     "You are a recommendation assistant. Given a user's requirements, "
-    "provide exactly 9 diverse recommendations that match their criteria.\n\n"
+    "provide exactly {count} diverse recommendations that match their criteria.\n\n"
     "Make sure the results are diverse in terms of era, style, and popularity.\n"
-    "If the user searched for a specific title or a prompt that warrants less than 9 responses, "
+    "If the user searched for a specific title or a prompt that warrants less than {count} responses, "
     "smartly recommend the remaining titles that are the closest match.\n"
-    "You MUST give exactly 9 recommendations. No more. No less.\n"
+    "You MUST give exactly {count} recommendations. No more. No less.\n"
     "When the user provides follow-up requests, use the conversation history to understand context "
     "and avoid recommending titles that were already suggested."
 )
@@ -33,10 +36,36 @@ _SHOW_CONTEXT = (
 _BOTH_CONTEXT = (
     "\n\nRecommend a mix of movies AND TV shows. "
     "Use the content_type field to indicate whether each recommendation is a \"movie\" or a \"show\". "
-    "Aim for roughly 5 movies and 4 shows, but adjust the split based on what best matches the query. "
+    "Aim for roughly {movies} movies and {shows} shows, but adjust the split based on what best matches the query. "
     "If the query leans more toward serialized storytelling, favor shows; if it leans toward standalone stories, favor movies."
 )
 
+_COMPACT_FORMAT = (
+    "\n\nRespond using the compact schema: \"r\" is the list of recommendations, and each item has "
+    "\"t\" (title), \"y\" (year), \"r\" (reason) and \"k\" (\"m\" for a movie, \"s\" for a show). "
+    "Wherever these instructions mention the content_type field, use \"k\" instead. "
+    "Keep every reason to a single clause of at most 15 words."
+)
+
+_SHARD_CONTEXT = (
+    "\n\nThis list is one of {total} parts generated in parallel for the same request. "
+    "The other parts cover different angles, so to avoid overlapping with them, "
+    "recommend only {focus}."
+)
+
+# Disjoint angles handed out to parallel shards, in order
+_SHARD_FOCUS = [
+    "the closest, most direct matches for the request",
+    "strong matches from a different era or country than the most obvious picks",
+    "lesser-known, cult or critically acclaimed picks that still fit well",
+    "matches that are recent (roughly the last ten years)",
+    "older classics (released before roughly 2000) that fit the request",
+    "picks that match the mood and themes rather than the literal genre",
+    "widely popular crowd-pleasers that fit the request",
+    "independent or international productions that fit the request",
+    "unconventional or genre-bending picks that still fit the request",
+]
+
 _CONTENT_TYPE_CONTEXTS = {
     ContentTypeMode.MOVIE: _MOVIE_CONTEXT,
     ContentTypeMode.SHOW: _SHOW_CONTEXT,
@@ -50,15 +79,49 @@ _CONTENT_TYPE_LABELS = {
 }
 
 
-def get_recommendation_system_prompt(content_type: ContentTypeMode) -> str:
-    """Compose system prompt from base + content-type-specific injection."""
+@lru_cache(maxsize=None)
+def get_recommendation_system_prompt(
+    content_type: ContentTypeMode,
+    compact: bool = False,
+    count: int = RECOMMENDATION_COUNT,
+    shard: tuple[int, int] | None = None,
+) -> str:
+    """
+    Compose system prompt from base + content-type-specific injection.
+    Optionally appends the compact schema legend and, for sharded generation,
+    a disjointness hint for shard (index, total). Cached: there are only a
+    few dozen combinations.
+    """
     context = _CONTENT_TYPE_CONTEXTS[content_type]
-    return _RECOMMENDATION_BASE + context
+    if content_type == ContentTypeMode.BOTH:
+        movies = (count + 1) // 2
+        context = context.format(movies=movies, shows=count - movies)
+    if compact:
+        context += _COMPACT_FORMAT
+    if shard is not None:
+        index, total = shard
+        context += _SHARD_CONTEXT.format(total=total, focus=_SHARD_FOCUS[index % len(_SHARD_FOCUS)])
+    return _RECOMMENDATION_BASE.format(count=count) + context
+
+
+def get_shard_count_limit() -> int:
+    """Maximum number of shards that still get distinct focus hints."""
+    return len(_SHARD_FOCUS)
 
 
-def get_recommendation_user_message(query: str, content_type: ContentTypeMode, history: list | None = None) -> str:
-    """Build user message with optional conversation history."""
+def get_recommendation_user_message(
+    query: str,
+    content_type: ContentTypeMode,
+    history: list | None = None,
+    count: int | None = None,
+) -> str:
+    """
+    Build user message with optional conversation history. Shards pass their
+    own content type and count, which can differ from the request's.
+    """
     label = _CONTENT_TYPE_LABELS[content_type]
+    if count is not None:
+        label = f"{count} {label}"
 
     if not history:
         return f"Find me {label} that match this description: {query}"
@@ -1,4 +1,5 @@
 from typing import List
+from enum import Enum
 from pydantic import BaseModel, Field
 from app.models import ContentType
 
@@ -12,3 +13,29 @@ class ContentRecommendation(BaseModel):
 
 class ContentRecommendations(BaseModel):
     movies: List[ContentRecommendation] = Field(description="A list of exactly 9 recommendations")
+
+
+class CompactContentType(str, Enum):
+    """Single-letter content type codes used by the compact wire schema."""
+    MOVIE = "m"
+    SHOW = "s"
+
+
+class CompactRecommendation(BaseModel):
+    """Short-key variant of ContentRecommendation, used to cut output tokens."""
+    t: str = Field(description="Title")
+    y: int = Field(description="Release or first air year")
+    r: str = Field(description="Why it matches, at most 15 words")
+    k: CompactContentType = Field(description="m = movie, s = show")
+
+    def to_recommendation(self) -> ContentRecommendation:
+        return ContentRecommendation(
+            title=self.t,
+            year=self.y,
+            reason=self.r,
+            content_type=ContentType.SHOW if self.k == CompactContentType.SHOW else ContentType.MOVIE,
+        )
+
+
+class CompactRecommendations(BaseModel):
+    r: List[CompactRecommendation] = Field(description="Exactly 9 recommendations")
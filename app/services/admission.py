@@ -0,0 +1,169 @@
+"""
+Admission control for Claude generations.
+
+An AdmissionController caps how many generations run at once in this worker.
+Requests over the cap wait in a short queue; when a slot frees up, queues
+are served round-robin by client, so one client sending a burst cannot
+starve the others. Each client may also hold at most `max_per_client`
+slots and queue places combined. The caller picks the client key; it must
+be something the client cannot choose freely, like its IP, or a client
+could claim a fresh share with every request.
+
+A request that cannot get a slot is rejected straight away rather than left
+to slow every stream down: over its client's share, with the queue full, or
+after waiting `max_wait` seconds. AdmissionRejected carries a Retry-After
+hint estimated from how long recent generations held their slot.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+
+from app.config import CLAUDE_MAX_CONCURRENT, CLAUDE_MAX_PER_CLIENT, CLAUDE_QUEUE_SIZE, CLAUDE_QUEUE_TIMEOUT
+from app.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT
+
+# Bounds for the Retry-After hint, in seconds
+_MIN_RETRY_AFTER = 1
+_MAX_RETRY_AFTER = 30
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Admission rejected ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot. release() is idempotent, so every exit path can call it."""
+
+    def __init__(self, controller: "AdmissionController", client: str):
+        self._controller = controller
+        self.client = client
+        self.granted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, max_wait: float, max_per_client: int):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_per_client = max_per_client
+        self._active = 0
+        self._queued = 0
+        self._per_client: Dict[str, int] = {}  # slots held + places queued
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._mean_hold = 5.0  # seconds, moving average of how long a slot is held
+
+    async def admit(self, client: str) -> Ticket:
+        """A slot for `client`, waiting in the queue if needed. Raises AdmissionRejected."""
+        if self._per_client.get(client, 0) >= self.max_per_client:
+            self._reject("client_limit")
+        if self._active < self.max_concurrent and not self._queued:
+            return self._grant(client, waited=0.0)
+        if self._queued >= self.max_queue:
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(client, deque()).append(future)
+        self._queued += 1
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(self._queued)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except BaseException as e:
+            self._abandon(client, future)
+            if isinstance(e, TimeoutError):
+                self._reject("queue_timeout")
+            raise
+        waited = time.monotonic() - started
+        ADMISSION_WAIT.labels(self.name).observe(waited)
+        return Ticket(self, client)
+
+    def _grant(self, client: str, waited: float) -> Ticket:
+        self._active += 1
+        self._per_client[client] = self._per_client.get(client, 0) + 1
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self._active)
+        ADMISSION_WAIT.labels(self.name).observe(waited)
+        return Ticket(self, client)
+
+    def _release(self, ticket: Ticket) -> None:
+        held = time.monotonic() - ticket.granted_at
+        self._mean_hold += 0.1 * (held - self._mean_hold)
+        self._active -= 1
+        self._per_client[ticket.client] -= 1
+        self._forget(ticket.client)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued requests, one client at a time in turn."""
+        while self._active < self.max_concurrent and self._queues:
+            client, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            # The waiter's place in the queue becomes its slot
+            self._active += 1
+            future.set_result(None)
+        ADMISSION_IN_FLIGHT.labels(self.name).set(self._active)
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(self._queued)
+
+    def _abandon(self, client: str, future: asyncio.Future) -> None:
+        """Give up a queue place, or the slot if it was granted just as the waiter gave up."""
+        if future.done():
+            self._active -= 1
+            self._per_client[client] -= 1
+            self._forget(client)
+            self._dispatch()
+            return
+        future.cancel()
+        queue = self._queues[client]
+        queue.remove(future)
+        if not queue:
+            del self._queues[client]
+        self._queued -= 1
+        self._per_client[client] -= 1
+        self._forget(client)
+        ADMISSION_QUEUE_DEPTH.labels(self.name).set(self._queued)
+
+    def _forget(self, client: str) -> None:
+        if self._per_client.get(client) == 0:
+            del self._per_client[client]
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free: the queue ahead drained at the recent hold time."""
+        waves = (self._queued + 1) / max(1, self.max_concurrent)
+        return max(_MIN_RETRY_AFTER, min(_MAX_RETRY_AFTER, math.ceil(waves * self._mean_hold)))
+
+    def _reject(self, reason: str) -> None:
+        ADMISSION_REJECTED.labels(self.name, reason).inc()
+        raise AdmissionRejected(reason, self.retry_after())
+
+
+_claude_admission: Optional[AdmissionController] = None
+
+
+def get_claude_admission() -> AdmissionController:
+    global _claude_admission
+    if _claude_admission is None:
+        _claude_admission = AdmissionController(
+            "claude",
+            max_concurrent=CLAUDE_MAX_CONCURRENT,
+            max_queue=CLAUDE_QUEUE_SIZE,
+            max_wait=CLAUDE_QUEUE_TIMEOUT,
+            max_per_client=CLAUDE_MAX_PER_CLIENT,
+        )
+    return _claude_admission
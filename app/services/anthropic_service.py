@@ -1,42 +1,208 @@
-import json
+"""
+Claude recommendations.
+
+The anthropic SDK is slow to import, so it is imported on first use, or
+ahead of the first request by warm_up() from the app's lifespan. One
+AsyncAnthropic client, the structured output schemas and the system prompts
+are shared by every AnthropicService, which makes constructing one per
+request free.
+"""
+
+import asyncio
+import copy
 import logging
-from typing import AsyncGenerator
+import random
+import time
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
-import anthropic
 import httpx
-from pydantic import TypeAdapter
+from pydantic import BaseModel, TypeAdapter
 
-from app.config import ANTHROPIC_API_KEY, ANTHROPIC_MODEL
+from app import deadline
+from app.config import ANTHROPIC_API_KEY, ANTHROPIC_BASE_URL, ANTHROPIC_MODEL, ANTHROPIC_RECORD_DIR, ANTHROPIC_SHARDS, COMPACT_SCHEMA_RATIO, RECOMMENDATION_COUNT
+from app.json_stream import JSONObjectExtractor
+from app.logging_config import SAMPLED
+from app.metrics import CLAUDE_ITEM_INTERVAL, CLAUDE_TTFT, DROPPED_ITEMS
 from app.models import ContentTypeMode
-from app.schemas import ContentRecommendation, ContentRecommendations
-from app.prompts import get_recommendation_system_prompt, get_recommendation_user_message
+from app.schemas import ContentRecommendation, ContentRecommendations, CompactRecommendation, CompactRecommendations
+from app.prompts import get_recommendation_system_prompt, get_recommendation_user_message, get_shard_count_limit
+from app.services.stream_recorder import open_recorder
+from app.titles import normalize_title
 
 
-class AnthropicService:
-    def __init__(self):
-        http_client = httpx.Client(http2=True)
-        self.client = anthropic.Anthropic(
+class ShardPlan(BaseModel):
+    """One slice of a sharded generation: what to ask for and how many."""
+    content_type: ContentTypeMode
+    count: int
+    shard: Optional[Tuple[int, int]] = None  # (index, total) when a disjointness hint is needed
+
+
+_client = None  # anthropic.AsyncAnthropic, shared by every AnthropicService
+
+
+def get_client():
+    global _client
+    if _client is None:
+        import anthropic
+        _client = anthropic.AsyncAnthropic(
             api_key=ANTHROPIC_API_KEY,
-            http_client=http_client
+            base_url=ANTHROPIC_BASE_URL,
+            http_client=httpx.AsyncClient(http2=True)
         )
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+@lru_cache(maxsize=None)
+def _base_schema(compact: bool) -> Dict[str, Any]:
+    import anthropic
+    model = CompactRecommendations if compact else ContentRecommendations
+    return anthropic.transform_schema(TypeAdapter(model).json_schema())
+
+
+@lru_cache(maxsize=None)
+def schema_for(compact: bool, count: int) -> Dict[str, Any]:
+    """Structured output schema for the given wire variant, with the list size in its description."""
+    schema = _base_schema(compact)
+    if count != RECOMMENDATION_COUNT:
+        schema = copy.deepcopy(schema)
+        list_field = schema["properties"]["r" if compact else "movies"]
+        list_field["description"] = f"A list of exactly {count} recommendations"
+    return schema
+
+
+def warm_up() -> Dict[str, int]:
+    """
+    Import the SDK, create the client and build every schema and system
+    prompt a request can ask for. Blocking; run it off the event loop.
+    """
+    get_client()
+    plans = [
+        plan
+        for content_type in ContentTypeMode
+        for shards in range(1, max(1, ANTHROPIC_SHARDS) + 1)
+        for plan in AnthropicService._plan_shards(content_type, shards)
+    ]
+    for compact in (False, True):
+        for plan in plans:
+            schema_for(compact, plan.count)
+            get_recommendation_system_prompt(plan.content_type, compact=compact, count=plan.count, shard=plan.shard)
+    return {
+        "schemas": schema_for.cache_info().currsize,
+        "prompts": get_recommendation_system_prompt.cache_info().currsize,
+    }
+
+
+class AnthropicService:
+    def __init__(self):
+        self.client = get_client()
         self.model = ANTHROPIC_MODEL
-        self._schema = self._build_schema()
 
     @staticmethod
-    def _build_schema() -> dict:
-        adapter = TypeAdapter(ContentRecommendations)
-        return anthropic.transform_schema(adapter.json_schema())
+    def _use_compact_schema() -> bool:
+        """A/B switch: pick the compact wire schema for COMPACT_SCHEMA_RATIO of requests."""
+        return random.random() < COMPACT_SCHEMA_RATIO
+
+    @staticmethod
+    def _plan_shards(content_type: ContentTypeMode, shards: int) -> List[ShardPlan]:
+        """
+        Split one generation into concurrent shards.
+        "both" with 2 shards splits by type; otherwise the count is spread evenly
+        and each shard gets its own focus hint to keep the slices disjoint.
+        """
+        shards = max(1, min(shards, RECOMMENDATION_COUNT, get_shard_count_limit()))
+        if shards == 1:
+            return [ShardPlan(content_type=content_type, count=RECOMMENDATION_COUNT)]
+
+        if content_type == ContentTypeMode.BOTH and shards == 2:
+            movies = (RECOMMENDATION_COUNT + 1) // 2
+            return [
+                ShardPlan(content_type=ContentTypeMode.MOVIE, count=movies),
+                ShardPlan(content_type=ContentTypeMode.SHOW, count=RECOMMENDATION_COUNT - movies),
+            ]
+
+        base, extra = divmod(RECOMMENDATION_COUNT, shards)
+        return [
+            ShardPlan(content_type=content_type, count=base + (1 if i < extra else 0), shard=(i, shards))
+            for i in range(shards)
+        ]
+
+    @staticmethod
+    def _dedup_key(rec: ContentRecommendation) -> Optional[tuple[str, int]]:
+        """None for a title that normalizes to nothing: it cannot be told apart from others, so it is never dropped."""
+        normalized = normalize_title(rec.title)
+        return (normalized, rec.year) if normalized else None
 
-    async def get_recommendations(self, query: str, history: list | None = None, content_type: ContentTypeMode = ContentTypeMode.MOVIE, web_search: bool = False) -> AsyncGenerator[ContentRecommendation, None]:
+    async def get_recommendations(self, query: str, history: list | None = None, content_type: ContentTypeMode = ContentTypeMode.MOVIE, web_search: bool = False, shards: int | None = None) -> AsyncGenerator[ContentRecommendation, None]:
         """
         Stream content recommendations using structured output.
         Yields individual recommendation dicts as they complete in the stream.
         Each dict has: title, year, reason, content_type.
+
+        With more than one shard (ANTHROPIC_SHARDS by default), the request is split
+        into concurrent generations whose items are merged in arrival order,
+        dropping titles already yielded by another shard.
+
+        The deadline active when the first item is requested caps every
+        Claude call's timeout; the caller stops iterating once it passes.
         """
-        system_prompt = get_recommendation_system_prompt(content_type)
-        user_message = get_recommendation_user_message(query, content_type, history)
+        compact = self._use_compact_schema()
+        plans = self._plan_shards(content_type, shards if shards is not None else ANTHROPIC_SHARDS)
+
+        def user_message(plan: ShardPlan) -> str:
+            # A shard asks for its own slice, e.g. only the shows of a "both" request
+            return get_recommendation_user_message(query, plan.content_type, history, plan.count)
+
+        if len(plans) == 1:
+            async for rec in self._generate(user_message(plans[0]), plans[0], compact, web_search):
+                yield rec
+            return
+
+        queue: asyncio.Queue = asyncio.Queue()
+        finished = object()
+
+        async def run_shard(plan: ShardPlan) -> None:
+            try:
+                async for rec in self._generate(user_message(plan), plan, compact, web_search):
+                    await queue.put(rec)
+            finally:
+                await queue.put(finished)
+
+        tasks = [asyncio.create_task(run_shard(plan)) for plan in plans]
+        seen = set()
+        remaining = len(tasks)
+        try:
+            while remaining:
+                item = await queue.get()
+                if item is finished:
+                    remaining -= 1
+                    continue
+                key = self._dedup_key(item)
+                if key is None:
+                    yield item
+                    continue
+                if key in seen:
+                    logger.info("Dropping cross-shard duplicate: %s (%s)", item.title, item.year)
+                    DROPPED_ITEMS.labels("shard_duplicate").inc()
+                    continue
+                seen.add(key)
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _generate(self, user_message: str, plan: ShardPlan, compact: bool, web_search: bool) -> AsyncGenerator[ContentRecommendation, None]:
+        """Run a single Claude generation and yield recommendations as their objects complete."""
+        system_prompt = get_recommendation_system_prompt(plan.content_type, compact=compact, count=plan.count, shard=plan.shard)
 
         tools = []
         if web_search:
@@ -46,33 +212,56 @@ class AnthropicService:
                 "max_uses": 2,
             })
 
+        variant = "compact" if compact else "verbose"
+        shard_label = f"{plan.shard[0] + 1}/{plan.shard[1]}" if plan.shard else plan.content_type.value
+        started = time.perf_counter()
+        first_token_at = None
+        input_tokens = None
+        output_tokens = None
+        item_count = 0
+        last_item_at = None
+
+        request = {
+            "model": self.model,
+            "system": system_prompt,
+            "messages": [{"role": "user", "content": user_message}],
+            "max_tokens": 4096,
+            **({"tools": tools} if tools else {}),
+            "output_config": {
+                "format": {
+                    "type": "json_schema",
+                    "schema": schema_for(compact, plan.count),
+                }
+            },
+        }
+        recorder = open_recorder(ANTHROPIC_RECORD_DIR, f"{variant}-{shard_label.replace('/', 'of')}", request)
+        left = deadline.remaining()
+        timeout = {"timeout": max(left, 0.0)} if left is not None else {}
+
         try:
-            with self.client.messages.stream(
-                model=self.model,
-                system=system_prompt,
-                messages=[{"role": "user", "content": user_message}],
-                max_tokens=4096,
-                **({"tools": tools} if tools else {}),
-                output_config={
-                    "format": {
-                        "type": "json_schema",
-                        "schema": self._schema,
-                    }
-                },
-            ) as stream:
-                buffer = ""
-                depth = 0
-                in_string = False
-
-                for event in stream:
+            async with self.client.messages.stream(**request, **timeout) as stream:
+                extractor = JSONObjectExtractor()
+
+                async for event in stream:
+                    if recorder:
+                        recorder.record(event)
+
+                    if event.type == "message_start":
+                        input_tokens = event.message.usage.input_tokens
+                        continue
+
+                    if event.type == "message_delta":
+                        output_tokens = event.usage.output_tokens
+                        continue
+
                     if event.type == "content_block_start":
                         if event.content_block.type == "server_tool_use":
-                            logger.info("Web search triggered: %s", event.content_block.name)
+                            logger.info("Web search triggered: %s", event.content_block.name, extra=SAMPLED)
                         elif event.content_block.type == "web_search_tool_result":
                             try:
                                 for result in event.content_block.content:
                                     if result.type == "web_search_result":
-                                        logger.info("Search result: %s — %s", result.title, result.url)
+                                        logger.info("Search result: %s — %s", result.title, result.url, extra=SAMPLED)
                             except (AttributeError, TypeError):
                                 pass
                         continue
@@ -81,41 +270,38 @@ class AnthropicService:
                         continue
                     if event.delta.type != "text_delta":
                         continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        CLAUDE_TTFT.labels(variant).observe(first_token_at - started)
 
-                    for ch in event.delta.text:
-                        if in_string:
-                            buffer += ch
-                            if ch == '"':
-                                in_string = False
+                    # Once the list closes the extractor ignores further text; keep
+                    # draining so the final usage is logged
+                    for obj in extractor.feed(event.delta.text):
+                        try:
+                            if compact:
+                                rec = CompactRecommendation.model_validate(obj).to_recommendation()
+                            else:
+                                rec = ContentRecommendation.model_validate(obj)
+                        except ValueError:
+                            logger.warning("Failed to validate: %s", obj)
+                            DROPPED_ITEMS.labels("invalid_recommendation").inc()
                             continue
-
-                        if ch == '"' and depth >= 2:
-                            in_string = True
-                            buffer += ch
-                            continue
-
-                        if ch == '{':
-                            depth += 1
-                            if depth == 2:
-                                buffer = '{'
-                            continue
-
-                        if ch == '}' and depth == 2:
-                            buffer += '}'
-                            try:
-                                yield ContentRecommendation.model_validate(json.loads(buffer))
-                            except json.JSONDecodeError:
-                                logger.warning("Failed to parse: %s", buffer)
-                            buffer = ""
-                            depth -= 1
-                            continue
-
-                        if ch == ']':
-                            return
-
-                        if depth >= 2:
-                            buffer += ch
+                        now = time.perf_counter()
+                        if last_item_at is not None:
+                            CLAUDE_ITEM_INTERVAL.labels(variant).observe(now - last_item_at)
+                        last_item_at = now
+                        item_count += 1
+                        yield rec
 
         except Exception as e:
             logger.error("Error streaming from Anthropic API: %s", e)
             return
+        finally:
+            if recorder:
+                recorder.close()
+            elapsed = time.perf_counter() - started
+            ttft = (first_token_at - started) if first_token_at is not None else -1.0
+            logger.info(
+                "Claude usage: schema=%s shard=%s input_tokens=%s output_tokens=%s items=%d ttft=%.3fs total=%.3fs",
+                variant, shard_label, input_tokens, output_tokens, item_count, ttft, elapsed,
+            )
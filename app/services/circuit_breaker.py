@@ -0,0 +1,130 @@
+"""
+Circuit breaker for a dependency that may turn slow or fail.
+
+The breaker watches a rolling window of recent calls. A call counts against
+the dependency when it fails or takes longer than `slow_seconds`. Once at
+least `min_calls` are in the window and the bad share reaches
+`failure_ratio`, the breaker opens: callers skip the dependency for
+`open_seconds`. It then goes half-open and lets up to `probes` calls
+through at a time. If `probes` of them succeed in a row it closes again;
+a single bad probe reopens it.
+
+Callers ask allow() for a Permit before a call and report the outcome with
+record(), or with release() if the call was abandoned for reasons that say
+nothing about the dependency (the client went away). Every permit must be
+returned through one of the two. A permit belongs to the state it was issued
+in: once the breaker has moved on, its outcome no longer counts, so a slow
+call started while closed cannot fail a half-open probe round.
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, List, NamedTuple, Optional
+
+from app.metrics import CIRCUIT_REJECTED, CIRCUIT_STATE, CIRCUIT_TRANSITIONS
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class Permit(NamedTuple):
+    state: str
+    epoch: int  # bumped on every transition
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_ratio: float = 0.5,
+        slow_seconds: float = 1.0,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+        probes: int = 3,
+    ):
+        self.name = name
+        self.failure_ratio = failure_ratio
+        self.slow_seconds = slow_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)  # True for a bad call
+        self._opened_at = 0.0
+        self._epoch = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._on_close: List[Callable[[], None]] = []
+        CIRCUIT_STATE.labels(name).set(_STATE_VALUES[CLOSED])
+
+    def on_close(self, callback: Callable[[], None]) -> None:
+        """Call `callback` whenever the breaker closes after having been open."""
+        self._on_close.append(callback)
+
+    def allow(self) -> Optional[Permit]:
+        """A permit if a call may go to the dependency now, else None."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                CIRCUIT_REJECTED.labels(self.name).inc()
+                return None
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.probes:
+                CIRCUIT_REJECTED.labels(self.name).inc()
+                return None
+            self._probes_in_flight += 1
+        return Permit(self.state, self._epoch)
+
+    def release(self, permit: Permit) -> None:
+        """Return a permit without an outcome."""
+        if permit.epoch == self._epoch and self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def record(self, permit: Permit, duration: float, error: Optional[BaseException] = None) -> None:
+        """Report a permitted call: how long it took and what it raised, if anything."""
+        if permit.epoch != self._epoch:
+            # Issued under an earlier state, e.g. before the breaker opened
+            return
+        bad = error is not None or duration >= self.slow_seconds
+        if self.state == HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            if bad:
+                logger.warning("%s probe failed (%.2fs, %s); reopening", self.name, duration, error or "slow")
+                self._transition(OPEN)
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._transition(CLOSED)
+            return
+
+        self._outcomes.append(bad)
+        if len(self._outcomes) >= self.min_calls:
+            ratio = sum(self._outcomes) / len(self._outcomes)
+            if ratio >= self.failure_ratio:
+                logger.warning(
+                    "%s breaker opening: %.0f%% of the last %d calls failed or were slower than %.2fs",
+                    self.name, ratio * 100, len(self._outcomes), self.slow_seconds,
+                )
+                self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        previous, self.state = self.state, state
+        self._epoch += 1
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        CIRCUIT_STATE.labels(self.name).set(_STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(self.name, state).inc()
+        logger.info("%s breaker %s -> %s", self.name, previous, state)
+        if state == CLOSED:
+            for callback in self._on_close:
+                callback()
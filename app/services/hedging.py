@@ -0,0 +1,118 @@
+"""
+Latency-aware request hedging.
+
+If a call is still running after the recent p95 latency for its endpoint, a
+duplicate is sent and whichever finishes first wins; the other is cancelled.
+A HedgeBudget caps duplicates at a fixed fraction of calls, so a slow upstream
+sees at most that much extra load instead of double the traffic.
+"""
+
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from app.metrics import HEDGED_REQUESTS
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """Recent latencies per key, with a percentile recomputed every few samples."""
+
+    def __init__(self, size: int = 200, percentile: float = 0.95, min_samples: int = 50, refresh_every: int = 20):
+        self.size = size
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self._samples: Dict[str, Deque[float]] = {}
+        self._since_refresh: Dict[str, int] = {}
+        self._thresholds: Dict[str, float] = {}
+
+    def observe(self, key: str, seconds: float) -> None:
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.size)
+        samples.append(seconds)
+        count = self._since_refresh.get(key, 0) + 1
+        if count >= self.refresh_every and len(samples) >= self.min_samples:
+            ordered = sorted(samples)
+            self._thresholds[key] = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))]
+            count = 0
+        self._since_refresh[key] = count
+
+    def threshold(self, key: str) -> Optional[float]:
+        """The percentile latency for `key`, or None until enough samples are in."""
+        return self._thresholds.get(key)
+
+
+class HedgeBudget:
+    """Token budget: each call earns `ratio` of a hedge, up to `burst` banked hedges."""
+
+    def __init__(self, ratio: float, burst: float = 5.0):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+
+    def earn(self) -> None:
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+        return False
+
+
+async def first_of(
+    call: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    budget: HedgeBudget,
+    label: str,
+    sent: Optional[asyncio.Event] = None,
+) -> Tuple[T, bool]:
+    """
+    Await call(), hedging with a second call() if it is still running after
+    `delay` seconds and the budget allows. Returns the first successful result
+    and whether it came from the hedge; raises if every attempt failed.
+
+    If call() first queues (for a rate limiter slot, say), it should set
+    `sent` once the request is actually on its way: the delay is counted from
+    then, so time spent queued locally never looks like a slow upstream.
+    """
+    budget.earn()
+    primary = asyncio.ensure_future(call())
+    tasks = [primary]
+    try:
+        if delay is not None and sent is not None and not sent.is_set():
+            waiting = asyncio.ensure_future(sent.wait())
+            try:
+                await asyncio.wait([primary, waiting], return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                waiting.cancel()
+        if delay is not None and not primary.done():
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                if budget.try_spend():
+                    HEDGED_REQUESTS.labels(label, "sent").inc()
+                    tasks.append(asyncio.ensure_future(call()))
+                else:
+                    HEDGED_REQUESTS.labels(label, "over_budget").inc()
+
+        pending = set(tasks)
+        errors: List[BaseException] = []
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    if task is not primary:
+                        HEDGED_REQUESTS.labels(label, "won").inc()
+                    return task.result(), task is not primary
+                errors.append(error)
+        raise errors[0]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # mark a losing failure as retrieved
@@ -0,0 +1,180 @@
+"""
+Outbound rate limiting shared by every caller of an upstream API.
+
+A RateLimiter combines three controls, applied in order:
+
+- a pause window, opened by a 429's Retry-After, that holds back all callers;
+- a semaphore capping requests in flight;
+- a token bucket capping the request rate, with bursts up to its capacity.
+
+The bucket's rate adapts to the upstream: each 429 (see throttled()) cuts it
+by `backoff_factor`, at most once per second so one burst of 429s counts
+once, and it then climbs back linearly, reaching the configured rate again
+within `recovery_seconds` of the last cut.
+
+The limiter is process-wide (see get_tmdb_limiter), so the cap holds across
+requests and background tasks. With several workers, size the rate per worker.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+
+from app.config import (
+    TMDB_BACKOFF_BASE,
+    TMDB_BACKOFF_MAX,
+    TMDB_BURST,
+    TMDB_MAX_CONCURRENCY,
+    TMDB_RATE_BACKOFF,
+    TMDB_RATE_LIMIT,
+    TMDB_RATE_RECOVERY_SECONDS,
+)
+from app.metrics import RATE_LIMITER_IN_FLIGHT, RATE_LIMITER_PAUSES, RATE_LIMITER_RATE, RATE_LIMITER_WAITING
+
+# 429s closer together than this are one overload and cut the rate once
+_DECREASE_INTERVAL = 1.0
+# The adaptive rate never drops below this fraction of the configured rate
+_MIN_RATE_FRACTION = 0.05
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self) -> None:
+        if self.rate <= 0:
+            return
+        # Waiters queue on the lock, so tokens are handed out first come, first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        max_concurrency: int,
+        backoff_factor: float = 0.5,
+        recovery_seconds: float = 30.0,
+    ):
+        self.name = name
+        self.rate = rate  # configured rate; bucket.rate is the current, adapted one
+        self.backoff_factor = backoff_factor
+        self.recovery_seconds = recovery_seconds
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._recovered_at = time.monotonic()
+        RATE_LIMITER_RATE.labels(name).set(rate)
+
+    def set_rate(self, rate: float) -> None:
+        """Change the configured rate, dropping any 429 backoff."""
+        self.rate = rate
+        self.bucket.rate = rate
+        self._recovered_at = time.monotonic()
+        RATE_LIMITER_RATE.labels(self.name).set(rate)
+
+    def throttled(self) -> None:
+        """The upstream answered 429: cut the current rate (see the module docstring)."""
+        now = time.monotonic()
+        if self.rate <= 0 or now - self._last_decrease < _DECREASE_INTERVAL:
+            return
+        self._recover(now)
+        self._last_decrease = now
+        self.bucket.rate = max(self.rate * _MIN_RATE_FRACTION, self.bucket.rate * self.backoff_factor)
+        RATE_LIMITER_RATE.labels(self.name).set(self.bucket.rate)
+
+    def _recover(self, now: float) -> None:
+        """Raise a cut rate toward the configured one for the time since the last adjustment."""
+        if 0 < self.bucket.rate < self.rate:
+            step = (now - self._recovered_at) * self.rate / self.recovery_seconds
+            self.bucket.rate = min(self.rate, self.bucket.rate + step)
+            RATE_LIMITER_RATE.labels(self.name).set(self.bucket.rate)
+        self._recovered_at = now
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for `seconds` (e.g. after a 429 with Retry-After)."""
+        until = time.monotonic() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            RATE_LIMITER_PAUSES.labels(self.name).inc()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        waiting = RATE_LIMITER_WAITING.labels(self.name)
+        waiting.inc()
+        acquired = False
+        try:
+            while (delay := self._paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+            await self._semaphore.acquire()
+            acquired = True
+            self._recover(time.monotonic())
+            await self.bucket.take()
+        except BaseException:
+            if acquired:
+                self._semaphore.release()
+            raise
+        finally:
+            waiting.dec()
+
+        in_flight = RATE_LIMITER_IN_FLIGHT.labels(self.name)
+        in_flight.inc()
+        try:
+            yield
+        finally:
+            in_flight.dec()
+            self._semaphore.release()
+
+
+def retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt: int, base: float = TMDB_BACKOFF_BASE, cap: float = TMDB_BACKOFF_MAX) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+_tmdb_limiter: Optional[RateLimiter] = None
+
+
+def get_tmdb_limiter() -> RateLimiter:
+    global _tmdb_limiter
+    if _tmdb_limiter is None:
+        _tmdb_limiter = RateLimiter(
+            "tmdb",
+            TMDB_RATE_LIMIT,
+            TMDB_BURST,
+            TMDB_MAX_CONCURRENCY,
+            backoff_factor=TMDB_RATE_BACKOFF,
+            recovery_seconds=TMDB_RATE_RECOVERY_SECONDS,
+        )
+    return _tmdb_limiter
@@ -0,0 +1,248 @@
+"""
+Node-local cache shared by every worker process.
+
+Two tiers sit in front of the storage backend:
+
+- L1: a small per-process LRU with a short TTL, a dict lookup on the hot path.
+- L2: a SQLite database in WAL mode on local disk, shared by all workers on
+  the node. WAL readers never wait for writers, so reads run inline on the
+  event loop. Writes are handed to a single writer thread with its own
+  connection, so lock waits never block the loop.
+
+Entries live in namespaces ("content", "providers", "titles"), each with its
+own TTL. L2 is size-bounded: once the live pages exceed LOCAL_CACHE_MAX_MB,
+the entries closest to expiry are evicted first, expired ones before all.
+Values are stored as JSON, so dates come back as ISO strings, the same shape
+PostgREST returns.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import (
+    LOCAL_CACHE_MAX_MB,
+    LOCAL_CACHE_MEMORY_ITEMS,
+    LOCAL_CACHE_MEMORY_TTL,
+    LOCAL_CACHE_PATH,
+)
+from app.metrics import LOCAL_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+  namespace TEXT NOT NULL,
+  key TEXT NOT NULL,
+  value TEXT NOT NULL,
+  expires_at REAL NOT NULL,
+  PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expires_idx ON entries (expires_at);
+"""
+
+# Check the size bound every this many writes
+_EVICTION_CHECK_INTERVAL = 256
+
+# SQLite's default limit on bound parameters is 999
+_MAX_KEYS_PER_QUERY = 500
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, default=str, separators=(",", ":"))
+
+
+def _copy(value: Any) -> Any:
+    # Callers annotate rows (e.g. with the recommendation reason); keep L1 entries pristine
+    return dict(value) if isinstance(value, dict) else value
+
+
+class MemoryLRU:
+    """Per-process TTL LRU. Only touched from the event loop thread."""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        entry = self._entries.get((namespace, key))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[(namespace, key)]
+            return None
+        self._entries.move_to_end((namespace, key))
+        return value
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: float) -> None:
+        self._entries[(namespace, key)] = (expires_at, value)
+        self._entries.move_to_end((namespace, key))
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+
+class SharedCache:
+    def __init__(self, path: str, max_bytes: int, memory_items: int, memory_ttl: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_ttl = memory_ttl
+        self.memory = MemoryLRU(memory_items)
+        self._reader: Optional[sqlite3.Connection] = None
+        self._reader_pid: Optional[int] = None
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache-writer")
+        self._executor_pid = os.getpid()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _read_conn(self) -> sqlite3.Connection:
+        # Connections must not cross a fork
+        if self._reader is None or self._reader_pid != os.getpid():
+            self._reader = self._connect()
+            self._reader_pid = os.getpid()
+        return self._reader
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Cached values for whichever keys are present and unexpired."""
+        found: Dict[str, Any] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            value = self.memory.get(namespace, key)
+            if value is not None:
+                LOCAL_CACHE_LOOKUPS.labels(namespace, "memory").inc()
+                found[key] = _copy(value)
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+
+        now = time.time()
+        try:
+            conn = self._read_conn()
+            for start in range(0, len(missing), _MAX_KEYS_PER_QUERY):
+                chunk = missing[start:start + _MAX_KEYS_PER_QUERY]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, value, expires_at FROM entries WHERE namespace = ? AND key IN ({placeholders}) AND expires_at > ?",
+                    (namespace, *chunk, now),
+                ).fetchall()
+                for key, raw, expires_at in rows:
+                    value = json.loads(raw)
+                    self.memory.set(namespace, key, value, min(expires_at, now + self.memory_ttl))
+                    found[key] = _copy(value)
+        except sqlite3.Error as e:
+            logger.warning("Shared cache read failed: %s", e)
+
+        hits = sum(1 for key in missing if key in found)
+        if hits:
+            LOCAL_CACHE_LOOKUPS.labels(namespace, "disk").inc(hits)
+        if len(missing) > hits:
+            LOCAL_CACHE_LOOKUPS.labels(namespace, "miss").inc(len(missing) - hits)
+        return found
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        return self.get_many(namespace, [key]).get(key)
+
+    def set_many(self, namespace: str, items: Dict[str, Any], ttl: float) -> None:
+        """Store values in L1 now and in L2 from the writer thread."""
+        if not items:
+            return
+        now = time.time()
+        expires_at = now + ttl
+        for key, value in items.items():
+            self.memory.set(namespace, key, _copy(value), min(expires_at, now + self.memory_ttl))
+        rows = [(namespace, key, _encode(value), expires_at) for key, value in items.items()]
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache-writer")
+            self._executor_pid = os.getpid()
+            self._writer = None
+        self._executor.submit(self._write, rows)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        self.set_many(namespace, {key: value}, ttl)
+
+    def _write(self, rows: List[Tuple[str, str, str, float]]) -> None:
+        try:
+            writer = self._writer
+            if writer is None:
+                writer = self._writer = self._connect()
+            writer.executemany(
+                "INSERT INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                rows,
+            )
+            self._writes += len(rows)
+            if self._writes >= _EVICTION_CHECK_INTERVAL:
+                self._writes = 0
+                self._evict(writer)
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed: %s", e)
+
+    @staticmethod
+    def _used_bytes(writer: sqlite3.Connection) -> int:
+        page_size = writer.execute("PRAGMA page_size").fetchone()[0]
+        page_count = writer.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = writer.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self, writer: sqlite3.Connection) -> None:
+        """Runs on the writer thread. Freed pages are reused, so the file stops growing at the bound."""
+        if self._used_bytes(writer) <= self.max_bytes:
+            return
+        removed = writer.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+        while self._used_bytes(writer) > self.max_bytes:
+            count = writer.execute("SELECT count(*) FROM entries").fetchone()[0]
+            if not count:
+                break
+            batch = max(1, count // 10)
+            removed += writer.execute(
+                "DELETE FROM entries WHERE (namespace, key) IN "
+                "(SELECT namespace, key FROM entries ORDER BY expires_at LIMIT ?)",
+                (batch,),
+            ).rowcount
+        logger.info("Shared cache evicted %d entries", removed)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        for conn in (self._reader, self._writer):
+            if conn is not None:
+                conn.close()
+        self._reader = self._writer = None
+
+
+_cache: Optional[SharedCache] = None
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """The process-wide cache, or None when LOCAL_CACHE_PATH is empty."""
+    global _cache
+    if _cache is None and LOCAL_CACHE_PATH:
+        _cache = SharedCache(
+            LOCAL_CACHE_PATH,
+            max_bytes=int(LOCAL_CACHE_MAX_MB * 1024 * 1024),
+            memory_items=LOCAL_CACHE_MEMORY_ITEMS,
+            memory_ttl=LOCAL_CACHE_MEMORY_TTL,
+        )
+    return _cache
+
+
+def close_shared_cache() -> None:
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
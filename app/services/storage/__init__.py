@@ -0,0 +1,70 @@
+"""
+Storage backends for the pikflix schema.
+
+STORAGE_BACKEND selects the implementation: "postgrest" (default) goes through
+Supabase's HTTP API, "postgres" connects to DATABASE_URL directly. The backend
+is shared by every SupabaseService instance in the process. Unless
+STORAGE_BREAKER_ENABLED is off, it sits behind a circuit breaker (see
+guarded.py).
+"""
+
+from typing import Optional
+from app.config import (
+    DATABASE_POOL_MAX_SIZE,
+    DATABASE_POOL_MIN_SIZE,
+    DATABASE_STATEMENT_CACHE_SIZE,
+    DATABASE_URL,
+    STORAGE_BACKEND,
+    STORAGE_BREAKER_ENABLED,
+    STORAGE_BREAKER_FAILURE_RATIO,
+    STORAGE_BREAKER_MIN_CALLS,
+    STORAGE_BREAKER_OPEN_SECONDS,
+    STORAGE_BREAKER_PROBES,
+    STORAGE_BREAKER_SLOW_SECONDS,
+    STORAGE_BREAKER_WINDOW,
+    STORAGE_SPILL_MAX_ROWS,
+)
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.storage.base import StorageBackend, TitleKey
+from app.services.storage.guarded import GuardedBackend
+
+__all__ = ["StorageBackend", "TitleKey", "get_backend", "close_backend"]
+
+_backend: Optional[StorageBackend] = None
+
+
+def get_backend() -> StorageBackend:
+    global _backend
+    if _backend is None:
+        if STORAGE_BACKEND == "postgres":
+            from app.services.storage.postgres import PostgresBackend
+            if not DATABASE_URL:
+                raise RuntimeError("The postgres storage backend needs DATABASE_URL")
+            _backend = PostgresBackend(
+                DATABASE_URL,
+                min_size=DATABASE_POOL_MIN_SIZE,
+                max_size=DATABASE_POOL_MAX_SIZE,
+                statement_cache_size=DATABASE_STATEMENT_CACHE_SIZE,
+            )
+        else:
+            from app.services.storage.postgrest import PostgRESTBackend
+            _backend = PostgRESTBackend()
+        if STORAGE_BREAKER_ENABLED:
+            breaker = CircuitBreaker(
+                "storage",
+                failure_ratio=STORAGE_BREAKER_FAILURE_RATIO,
+                slow_seconds=STORAGE_BREAKER_SLOW_SECONDS,
+                window=STORAGE_BREAKER_WINDOW,
+                min_calls=STORAGE_BREAKER_MIN_CALLS,
+                open_seconds=STORAGE_BREAKER_OPEN_SECONDS,
+                probes=STORAGE_BREAKER_PROBES,
+            )
+            _backend = GuardedBackend(_backend, breaker, STORAGE_SPILL_MAX_ROWS)
+    return _backend
+
+
+async def close_backend() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
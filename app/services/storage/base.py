@@ -0,0 +1,104 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from app.models import ContentType, Movie, Show
+
+# (title, year) pairs looked up in one batch; year may be None
+TitleKey = Tuple[str, Optional[int]]
+
+# Nested show data kept out of the shows row, in pikflix.show_details (see the show details migration)
+SHOW_DETAIL_COLUMNS = ("seasons", "last_episode_to_air", "next_episode_to_air")
+
+# SQLSTATE classes that say nothing about the statement itself: connection
+# exceptions, transaction rollbacks (deadlocks, serialization failures),
+# insufficient resources and operator intervention (cancels, restarts)
+_TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+
+
+def transient_sqlstate(code: Optional[str]) -> bool:
+    return code is not None and code[:2] in _TRANSIENT_SQLSTATE_CLASSES
+
+
+def table_for(content_type: ContentType) -> str:
+    return "shows" if content_type == ContentType.SHOW else "movies"
+
+
+def title_columns(content_type: ContentType) -> Tuple[str, str, str]:
+    """(title, original title, date) columns of the content table."""
+    if content_type == ContentType.SHOW:
+        return "name", "original_name", "first_air_date"
+    return "title", "original_title", "release_date"
+
+
+@lru_cache(maxsize=2)
+def content_columns(content_type: ContentType) -> Tuple[str, ...]:
+    """Columns of the content table that are read and written: the card model's fields."""
+    model = Show if content_type == ContentType.SHOW else Movie
+    return tuple(model.model_fields)
+
+
+def match_function(content_type: ContentType) -> str:
+    """SQL function doing the batched title lookup (see the title search migration)."""
+    return f"match_{table_for(content_type)}"
+
+
+class StorageBackend(ABC):
+    """
+    Row access to the pikflix schema. Backends only move rows; cache expiry,
+    metrics and shaping results for the API stay in SupabaseService.
+    """
+
+    @abstractmethod
+    async def find_content(self, content_type: ContentType, keys: List[TitleKey], threshold: float) -> List[Optional[Dict[str, Any]]]:
+        """
+        Return the best row for each (title, year) key, or None, in key order.
+        Titles match on their normalized form, falling back to the most similar
+        title scoring at least `threshold`. Each row carries its match score
+        under "_score" (1.0 for an exact normalized match).
+        """
+
+    @abstractmethod
+    async def get_content_by_ids(self, content_type: ContentType, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Rows for the given ids, keyed by id; missing ids are absent."""
+
+    @abstractmethod
+    async def scan_titles(self, content_type: ContentType, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` rows with id > after_id in id order, each with id, title,
+        original_title, date and popularity (whatever the table's column names).
+        """
+
+    @abstractmethod
+    async def upsert_content(self, content_type: ContentType, rows: List[Dict[str, Any]]) -> None:
+        """Insert or update rows by id. Raises on failure."""
+
+    @abstractmethod
+    async def get_show_details(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """show_details rows for the given show ids, keyed by id; missing ids are absent."""
+
+    @abstractmethod
+    async def upsert_show_details(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert or update show_details rows by id. Raises on failure."""
+
+    @abstractmethod
+    async def get_providers(self, content_id: int, content_type: ContentType) -> Optional[Dict[str, Any]]:
+        """Return the providers row for the content, or None."""
+
+    @abstractmethod
+    async def get_providers_updated(self, content_id: int, content_type: ContentType) -> Optional[Any]:
+        """Return the providers row's last_updated without reading its results, or None if there is no row."""
+
+    @abstractmethod
+    async def upsert_providers(self, row: Dict[str, Any]) -> None:
+        """Insert or update a providers row by (content_id, content_type). Raises on failure."""
+
+    def is_transient(self, error: Exception) -> bool:
+        """
+        Whether `error` says storage is unreachable, overloaded or slow, so the
+        same call may succeed later, rather than that the call itself is wrong
+        (a constraint violation, a schema mismatch, a 4xx).
+        """
+        return isinstance(error, (OSError, TimeoutError))
+
+    async def close(self) -> None:
+        """Release connections held by the backend."""
@@ -0,0 +1,241 @@
+"""
+Storage behind a circuit breaker (see app/services/circuit_breaker.py).
+
+GuardedBackend wraps the configured backend. While storage is healthy, calls
+pass straight through. While the breaker is open:
+
+- reads answer "not cached", so lookups fall through to the shared cache
+  and TMDB instead of waiting on storage;
+- writes go to a bounded spill buffer, keeping the newest row per key, and
+  are replayed once half-open probes have closed the breaker again.
+
+A failed read is also answered as "not cached" rather than raised, so a
+storage outage costs cache hits, not responses. Only transient errors (see
+StorageBackend.is_transient) count against the breaker, and only a write
+that failed transiently is spilled; a write storage rejected outright would
+fail the same way on every replay, so it is logged and raised instead.
+scan_titles is not guarded: the maintenance commands need
+every page or an error, never a silently short scan.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+from app import deadline
+from app.deadline import DeadlineExceeded
+from app.metrics import SPILL_BUFFER_SIZE, SPILLED_WRITES, track_background
+from app.models import ContentType
+from app.services.circuit_breaker import CircuitBreaker, Permit
+from app.services.storage.base import StorageBackend, TitleKey
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rows per upsert when replaying spilled content
+_REPLAY_BATCH = 200
+
+
+class SpillBuffer:
+    """Writes waiting for storage, newest row per key, oldest dropped first when full."""
+
+    def __init__(self, max_rows: int):
+        self.max_rows = max_rows
+        self._rows: "OrderedDict[Tuple[str, Hashable], Tuple[Optional[ContentType], Dict[str, Any]]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, kind: str, key: Hashable, content_type: Optional[ContentType], row: Dict[str, Any]) -> None:
+        self._rows.pop((kind, key), None)
+        self._rows[(kind, key)] = (content_type, row)
+        SPILLED_WRITES.labels(kind, "spilled").inc()
+        while len(self._rows) > self.max_rows:
+            (dropped_kind, _), _ = self._rows.popitem(last=False)
+            SPILLED_WRITES.labels(dropped_kind, "dropped").inc()
+        SPILL_BUFFER_SIZE.set(len(self._rows))
+
+    def drain(self) -> List[Tuple[str, Optional[ContentType], Dict[str, Any]]]:
+        rows = [(kind, content_type, row) for (kind, _), (content_type, row) in self._rows.items()]
+        self._rows.clear()
+        SPILL_BUFFER_SIZE.set(0)
+        return rows
+
+
+class GuardedBackend(StorageBackend):
+    def __init__(self, backend: StorageBackend, breaker: CircuitBreaker, spill_rows: int):
+        self.backend = backend
+        self.breaker = breaker
+        self.spill = SpillBuffer(spill_rows)
+        self._replaying = False
+        breaker.on_close(self._schedule_replay)
+
+    async def _guarded(self, permit: Permit, call: Callable[[], Awaitable[T]]) -> T:
+        """Run a permitted call and report its outcome to the breaker."""
+        started = time.perf_counter()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            if deadline.expired():
+                # Cut off by the request deadline: the call was too slow
+                self.breaker.record(permit, time.perf_counter() - started, DeadlineExceeded())
+            else:
+                # The client went away or the turn was cancelled; storage is not to blame
+                self.breaker.release(permit)
+            raise
+        except Exception as e:
+            # Storage answered a call it will not serve; it is not the one failing
+            self.breaker.record(permit, time.perf_counter() - started, e if self.backend.is_transient(e) else None)
+            raise
+        self.breaker.record(permit, time.perf_counter() - started)
+        return result
+
+    async def _read(self, operation: str, call: Callable[[], Awaitable[T]], default: T) -> T:
+        permit = self.breaker.allow()
+        if permit is None:
+            return default
+        try:
+            return await self._guarded(permit, call)
+        except Exception as e:
+            logger.warning("Storage %s failed, treating it as a cache miss: %s (%s)", operation, e, e.__class__.__name__)
+            return default
+
+    async def find_content(self, content_type: ContentType, keys: List[TitleKey], threshold: float) -> List[Optional[Dict[str, Any]]]:
+        return await self._read(
+            "find_content",
+            lambda: self.backend.find_content(content_type, keys, threshold),
+            [None] * len(keys),
+        )
+
+    async def get_content_by_ids(self, content_type: ContentType, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        return await self._read("get_content_by_ids", lambda: self.backend.get_content_by_ids(content_type, ids), {})
+
+    async def scan_titles(self, content_type: ContentType, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        return await self.backend.scan_titles(content_type, after_id, limit)
+
+    async def get_show_details(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        return await self._read("get_show_details", lambda: self.backend.get_show_details(ids), {})
+
+    async def get_providers(self, content_id: int, content_type: ContentType) -> Optional[Dict[str, Any]]:
+        return await self._read("get_providers", lambda: self.backend.get_providers(content_id, content_type), None)
+
+    async def get_providers_updated(self, content_id: int, content_type: ContentType) -> Optional[Any]:
+        return await self._read(
+            "get_providers_updated", lambda: self.backend.get_providers_updated(content_id, content_type), None
+        )
+
+    async def upsert_content(self, content_type: ContentType, rows: List[Dict[str, Any]]) -> None:
+        await self._write(
+            lambda: self.backend.upsert_content(content_type, rows),
+            lambda: self._spill_content(content_type, rows),
+        )
+
+    async def upsert_show_details(self, rows: List[Dict[str, Any]]) -> None:
+        await self._write(
+            lambda: self.backend.upsert_show_details(rows),
+            lambda: self._spill_show_details(rows),
+        )
+
+    async def upsert_providers(self, row: Dict[str, Any]) -> None:
+        await self._write(lambda: self.backend.upsert_providers(row), lambda: self._spill_providers(row))
+
+    async def _write(self, call: Callable[[], Awaitable[None]], spill: Callable[[], None]) -> bool:
+        """True if the write reached storage, False if it was spilled because the breaker is open."""
+        permit = self.breaker.allow()
+        if permit is None:
+            spill()
+            return False
+        try:
+            await self._guarded(permit, call)
+        except Exception as e:
+            if self.backend.is_transient(e):
+                spill()
+            else:
+                logger.error("Storage rejected a write, not spilling it: %s (%s)", e, e.__class__.__name__)
+            raise
+        return True
+
+    def _spill_content(self, content_type: ContentType, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.spill.add("content", (content_type.value, row["id"]), content_type, row)
+
+    def _spill_show_details(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.spill.add("show_details", row["id"], None, row)
+
+    def _spill_providers(self, row: Dict[str, Any]) -> None:
+        self.spill.add("providers", (row["content_id"], row["content_type"]), None, row)
+
+    def _schedule_replay(self) -> None:
+        if len(self.spill) and not self._replaying:
+            track_background(self.replay())
+
+    async def replay(self) -> None:
+        """Write spilled rows back through the breaker; rows it rejects again are re-spilled."""
+        if self._replaying:
+            return
+        self._replaying = True
+        try:
+            pending = self.spill.drain()
+            if not pending:
+                return
+            logger.info("Replaying %d spilled storage writes", len(pending))
+            content: Dict[ContentType, List[Dict[str, Any]]] = {}
+            show_details: List[Dict[str, Any]] = []
+            providers: List[Dict[str, Any]] = []
+            for kind, content_type, row in pending:
+                if kind == "content" and content_type is not None:
+                    content.setdefault(content_type, []).append(row)
+                elif kind == "show_details":
+                    show_details.append(row)
+                else:
+                    providers.append(row)
+
+            for content_type, rows in content.items():
+                for start in range(0, len(rows), _REPLAY_BATCH):
+                    batch = rows[start:start + _REPLAY_BATCH]
+                    try:
+                        written = await self._write(
+                            lambda: self.backend.upsert_content(content_type, batch),
+                            lambda: self._spill_content(content_type, batch),
+                        )
+                    except Exception as e:
+                        logger.warning("Replaying %d %s rows failed: %s", len(batch), content_type.value, e)
+                        continue
+                    if written:
+                        SPILLED_WRITES.labels("content", "replayed").inc(len(batch))
+            for start in range(0, len(show_details), _REPLAY_BATCH):
+                batch = show_details[start:start + _REPLAY_BATCH]
+                try:
+                    written = await self._write(
+                        lambda: self.backend.upsert_show_details(batch),
+                        lambda: self._spill_show_details(batch),
+                    )
+                except Exception as e:
+                    logger.warning("Replaying %d show details rows failed: %s", len(batch), e)
+                    continue
+                if written:
+                    SPILLED_WRITES.labels("show_details", "replayed").inc(len(batch))
+            for row in providers:
+                try:
+                    written = await self._write(lambda: self.backend.upsert_providers(row), lambda: self._spill_providers(row))
+                except Exception as e:
+                    logger.warning("Replaying providers for %s %s failed: %s", row["content_type"], row["content_id"], e)
+                    continue
+                if written:
+                    SPILLED_WRITES.labels("providers", "replayed").inc()
+        finally:
+            self._replaying = False
+
+    def is_transient(self, error: Exception) -> bool:
+        return self.backend.is_transient(error)
+
+    async def close(self) -> None:
+        if len(self.spill):
+            await self.replay()
+        if len(self.spill):
+            logger.error("Closing storage with %d spilled writes that could not be saved", len(self.spill))
+        await self.backend.close()
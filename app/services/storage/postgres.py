@@ -0,0 +1,240 @@
+"""
+Direct access to the pikflix schema over an asyncpg connection pool.
+
+Compared to PostgREST, a cache lookup is one pooled binary-protocol query
+instead of an HTTP request per title. asyncpg prepares and caches every
+statement per connection, so the lookup and upsert statements are parsed
+once per connection. Behind a transaction-mode pooler (Supabase's port 6543),
+set DATABASE_STATEMENT_CACHE_SIZE=0 because prepared statements do not
+survive there.
+
+asyncpg is imported when the pool is first needed, so deployments on the
+PostgREST backend do not need it installed.
+"""
+
+import asyncio
+import json
+import logging
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from app.models import ContentType
+from app.services.storage.base import (
+    SHOW_DETAIL_COLUMNS,
+    StorageBackend,
+    TitleKey,
+    content_columns,
+    match_function,
+    table_for,
+    title_columns,
+    transient_sqlstate,
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "pikflix"
+
+# At most one row per key, numbered from 1 (see the title search migration)
+_MATCH_SQL = "SELECT key_index, score, item FROM {schema}.{function}($1::text[], $2::int[], $3::real)"
+
+_GET_PROVIDERS_SQL = f"""
+SELECT content_id, content_type::text AS content_type, last_updated, results
+FROM {SCHEMA}.providers
+WHERE content_id = $1 AND content_type = $2::{SCHEMA}.content_type
+"""
+
+_GET_PROVIDERS_UPDATED_SQL = f"""
+SELECT last_updated
+FROM {SCHEMA}.providers
+WHERE content_id = $1 AND content_type = $2::{SCHEMA}.content_type
+"""
+
+_UPSERT_PROVIDERS_SQL = f"""
+INSERT INTO {SCHEMA}.providers (content_id, content_type, last_updated, results)
+VALUES ($1, $2::{SCHEMA}.content_type, $3, $4)
+ON CONFLICT (content_id, content_type)
+DO UPDATE SET last_updated = EXCLUDED.last_updated, results = EXCLUDED.results
+"""
+
+_GET_SHOW_DETAILS_SQL = f"""
+SELECT id, {", ".join(SHOW_DETAIL_COLUMNS)}, last_updated
+FROM {SCHEMA}.show_details
+WHERE id = ANY($1::int[])
+"""
+
+_COLUMNS_SQL = """
+SELECT column_name, data_type FROM information_schema.columns
+WHERE table_schema = $1 AND table_name = $2 AND is_generated = 'NEVER'
+"""
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+@lru_cache(maxsize=2)
+def _get_content_sql(content_type: ContentType) -> str:
+    columns = ", ".join(_quote(c) for c in content_columns(content_type))
+    return f"SELECT {columns} FROM {SCHEMA}.{table_for(content_type)} WHERE id = ANY($1::int[])"
+
+
+@lru_cache(maxsize=64)
+def _upsert_sql(table: str, columns: Tuple[str, ...], conflict: Tuple[str, ...]) -> str:
+    names = ", ".join(_quote(c) for c in columns)
+    params = ", ".join(f"${i}" for i in range(1, len(columns) + 1))
+    updates = ", ".join(f"{_quote(c)} = EXCLUDED.{_quote(c)}" for c in columns if c not in conflict)
+    return (
+        f"INSERT INTO {SCHEMA}.{table} ({names}) VALUES ({params}) "
+        f"ON CONFLICT ({', '.join(conflict)}) DO UPDATE SET {updates}"
+    )
+
+
+def _to_param(value: Any, data_type: str) -> Any:
+    """Convert a PostgREST-style JSON value to what asyncpg expects for the column type."""
+    if value is None:
+        return None
+    if data_type == "date" and isinstance(value, str):
+        # TMDB sends "" for unknown dates
+        return date.fromisoformat(value[:10]) if value else None
+    if data_type.startswith("timestamp") and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if data_type == "text" and isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+async def _init_connection(conn) -> None:
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class PostgresBackend(StorageBackend):
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10, statement_cache_size: int = 100):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.statement_cache_size = statement_cache_size
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self._columns: Dict[str, Dict[str, str]] = {}
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    try:
+                        import asyncpg  # type: ignore[import-not-found]
+                    except ImportError as e:
+                        raise RuntimeError("STORAGE_BACKEND=postgres requires the asyncpg package") from e
+                    self._pool = await asyncpg.create_pool(
+                        self.dsn,
+                        min_size=self.min_size,
+                        max_size=self.max_size,
+                        statement_cache_size=self.statement_cache_size,
+                        init=_init_connection,
+                    )
+                    logger.info("Postgres pool ready (%d-%d connections)", self.min_size, self.max_size)
+        return self._pool
+
+    def is_transient(self, error: Exception) -> bool:
+        if super().is_transient(error):
+            return True
+        if self._pool is None:
+            # Failed before asyncpg was even loaded: configuration, not an outage
+            return False
+        import asyncpg  # type: ignore[import-not-found]
+        if isinstance(error, asyncpg.PostgresError):
+            return transient_sqlstate(error.sqlstate)
+        # The connection dropped mid-query
+        return isinstance(error, asyncpg.ConnectionDoesNotExistError)
+
+    async def _table_columns(self, conn, table: str) -> Dict[str, str]:
+        """Writable columns of a table and their types, read once per process."""
+        columns = self._columns.get(table)
+        if columns is None:
+            rows = await conn.fetch(_COLUMNS_SQL, SCHEMA, table)
+            columns = {row["column_name"]: row["data_type"] for row in rows}
+            self._columns[table] = columns
+        return columns
+
+    async def find_content(self, content_type: ContentType, keys: List[TitleKey], threshold: float) -> List[Optional[Dict[str, Any]]]:
+        if not keys:
+            return []
+        sql = _MATCH_SQL.format(schema=SCHEMA, function=match_function(content_type))
+        pool = await self._get_pool()
+        records = await pool.fetch(sql, [title for title, _ in keys], [year for _, year in keys], threshold)
+
+        rows: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        for record in records:
+            rows[record["key_index"] - 1] = {**record["item"], "_score": record["score"]}
+        return rows
+
+    async def get_content_by_ids(self, content_type: ContentType, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not ids:
+            return {}
+        pool = await self._get_pool()
+        records = await pool.fetch(_get_content_sql(content_type), ids)
+        return {record["id"]: dict(record) for record in records}
+
+    async def scan_titles(self, content_type: ContentType, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        title_col, original_col, date_col = title_columns(content_type)
+        sql = (
+            f"SELECT id, {title_col} AS title, {original_col} AS original_title, {date_col} AS date, popularity "
+            f"FROM {SCHEMA}.{table_for(content_type)} WHERE id > $1 ORDER BY id LIMIT $2"
+        )
+        pool = await self._get_pool()
+        return [dict(record) for record in await pool.fetch(sql, after_id, limit)]
+
+    async def upsert_content(self, content_type: ContentType, rows: List[Dict[str, Any]]) -> None:
+        await self._upsert(table_for(content_type), rows)
+
+    async def get_show_details(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not ids:
+            return {}
+        pool = await self._get_pool()
+        records = await pool.fetch(_GET_SHOW_DETAILS_SQL, ids)
+        return {record["id"]: dict(record) for record in records}
+
+    async def upsert_show_details(self, rows: List[Dict[str, Any]]) -> None:
+        await self._upsert("show_details", rows)
+
+    async def _upsert(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        """Upsert rows by id, converting values to each column's type."""
+        if not rows:
+            return
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            columns = await self._table_columns(conn, table)
+
+            # Rows with the same key set share one prepared statement
+            batches: Dict[Tuple[str, ...], List[List[Any]]] = {}
+            for row in rows:
+                names = tuple(name for name in row if name in columns)
+                batches.setdefault(names, []).append([_to_param(row[name], columns[name]) for name in names])
+
+            async with conn.transaction():
+                for names, values in batches.items():
+                    await conn.executemany(_upsert_sql(table, names, ("id",)), values)
+
+    async def get_providers(self, content_id: int, content_type: ContentType) -> Optional[Dict[str, Any]]:
+        pool = await self._get_pool()
+        record = await pool.fetchrow(_GET_PROVIDERS_SQL, content_id, content_type.value)
+        return dict(record) if record else None
+
+    async def get_providers_updated(self, content_id: int, content_type: ContentType) -> Optional[Any]:
+        pool = await self._get_pool()
+        return await pool.fetchval(_GET_PROVIDERS_UPDATED_SQL, content_id, content_type.value)
+
+    async def upsert_providers(self, row: Dict[str, Any]) -> None:
+        pool = await self._get_pool()
+        await pool.execute(
+            _UPSERT_PROVIDERS_SQL,
+            row["content_id"],
+            row["content_type"],
+            _to_param(row.get("last_updated"), "timestamp with time zone"),
+            row.get("results") or {},
+        )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
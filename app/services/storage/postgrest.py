@@ -0,0 +1,123 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+import httpx
+from postgrest.exceptions import APIError
+from supabase import Client, ClientOptions, create_client
+from app.config import SUPABASE_URL, SUPABASE_KEY
+from app.models import ContentType
+from app.services.storage.base import (
+    SHOW_DETAIL_COLUMNS,
+    StorageBackend,
+    TitleKey,
+    content_columns,
+    match_function,
+    table_for,
+    title_columns,
+    transient_sqlstate,
+)
+
+# PostgREST's own codes for "could not reach or use the database": connection
+# failures, a stale schema cache and pool timeouts
+_TRANSIENT_PGRST_CODES = {"PGRST000", "PGRST001", "PGRST002", "PGRST003"}
+
+
+async def _execute(query) -> Any:
+    """Run a built supabase-py query on a worker thread."""
+    return await asyncio.to_thread(query.execute)
+
+
+class PostgRESTBackend(StorageBackend):
+    """
+    Supabase's PostgREST HTTP API through supabase-py. Its client is
+    synchronous, so every request runs on a worker thread: the event loop
+    keeps serving other requests, and deadlines and the breaker's latency
+    checks can fire, while a storage call is in flight.
+    """
+
+    def __init__(self, schema: str = "pikflix"):
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise RuntimeError("The postgrest storage backend needs SUPABASE_URL and SUPABASE_KEY")
+        self.client: Client = create_client(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            options=ClientOptions().replace(schema=schema)
+        )
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, httpx.TransportError):
+            return True
+        if isinstance(error, APIError):
+            code = error.code
+            if isinstance(code, int):
+                # A response that was not PostgREST JSON (a gateway error page): only the status is known
+                return code >= 500 or code in (408, 429)
+            return code in _TRANSIENT_PGRST_CODES or transient_sqlstate(code)
+        return super().is_transient(error)
+
+    async def find_content(self, content_type: ContentType, keys: List[TitleKey], threshold: float) -> List[Optional[Dict[str, Any]]]:
+        if not keys:
+            return []
+        params = {
+            "titles": [title for title, _ in keys],
+            "years": [year for _, year in keys],
+            "threshold": threshold,
+        }
+        result = await _execute(self.client.rpc(match_function(content_type), params))
+
+        rows: List[Optional[Dict[str, Any]]] = [None] * len(keys)
+        for match in result.data or []:
+            rows[match["key_index"] - 1] = {**match["item"], "_score": match["score"]}
+        return rows
+
+    async def get_content_by_ids(self, content_type: ContentType, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not ids:
+            return {}
+        columns = ",".join(content_columns(content_type))
+        result = await _execute(self.client.table(table_for(content_type)).select(columns).in_("id", ids))
+        return {row["id"]: row for row in result.data or []}
+
+    async def scan_titles(self, content_type: ContentType, after_id: int, limit: int) -> List[Dict[str, Any]]:
+        title_col, original_col, date_col = title_columns(content_type)
+        columns = f"id,title:{title_col},original_title:{original_col},date:{date_col},popularity"
+        result = await _execute(self.client.table(table_for(content_type)).select(columns).gt("id", after_id).order("id").limit(limit))
+        return result.data or []
+
+    async def upsert_content(self, content_type: ContentType, rows: List[Dict[str, Any]]) -> None:
+        # PostgREST bulk upserts need every object to have the same keys
+        batches: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            batches.setdefault(tuple(sorted(row)), []).append(row)
+
+        table = table_for(content_type)
+        for batch in batches.values():
+            await _execute(self.client.table(table).upsert(batch))
+
+    async def get_show_details(self, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not ids:
+            return {}
+        columns = ",".join(("id",) + SHOW_DETAIL_COLUMNS + ("last_updated",))
+        result = await _execute(self.client.table("show_details").select(columns).in_("id", ids))
+        return {row["id"]: row for row in result.data or []}
+
+    async def upsert_show_details(self, rows: List[Dict[str, Any]]) -> None:
+        if rows:
+            await _execute(self.client.table("show_details").upsert(rows))
+
+    async def get_providers(self, content_id: int, content_type: ContentType) -> Optional[Dict[str, Any]]:
+        result = await _execute(self.client.table("providers").select("*").eq("content_id", content_id).eq("content_type", content_type.value))
+        return result.data[0] if result.data else None
+
+    async def get_providers_updated(self, content_id: int, content_type: ContentType) -> Optional[Any]:
+        result = await _execute(self.client.table("providers").select("last_updated").eq("content_id", content_id).eq("content_type", content_type.value))
+        return result.data[0]["last_updated"] if result.data else None
+
+    async def upsert_providers(self, row: Dict[str, Any]) -> None:
+        content_id = row["content_id"]
+        content_type = row["content_type"]
+        query = self.client.table("providers").select("content_id").eq("content_id", content_id).eq("content_type", content_type)
+        result = await _execute(query)
+
+        if result.data:
+            await _execute(self.client.table("providers").update(row).eq("content_id", content_id).eq("content_type", content_type))
+        else:
+            await _execute(self.client.table("providers").insert(row))
@@ -0,0 +1,68 @@
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Raw Messages API stream events. The SDK also yields derived events ("text",
+# "input_json", ...) that are not part of the wire protocol and are skipped.
+_RAW_EVENT_TYPES = {
+    "message_start",
+    "content_block_start",
+    "content_block_delta",
+    "content_block_stop",
+    "message_delta",
+    "message_stop",
+}
+
+
+class StreamRecorder:
+    """
+    Captures a Claude stream to a JSONL fixture file.
+
+    The first line holds metadata about the request; every following line is
+    {"t": seconds_since_request, "event": <raw stream event>}. Fixtures are
+    replayed by benchmarks/stubs/anthropic_stub.py.
+    """
+
+    def __init__(self, directory: str, label: str, request: Dict[str, Any]):
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{uuid.uuid4().hex[:8]}.jsonl"
+        self.path = os.path.join(directory, name)
+        self._started = time.perf_counter()
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write({"meta": {"label": label, "recorded_at": time.time(), "request": request}})
+
+    def record(self, event: Any) -> None:
+        if event.type not in _RAW_EVENT_TYPES:
+            return
+        if event.type in ("content_block_stop", "message_stop"):
+            # The SDK attaches accumulated snapshots to these; the wire event is bare
+            payload: Dict[str, Any] = {"type": event.type}
+            if event.type == "content_block_stop":
+                payload["index"] = event.index
+        else:
+            payload = event.model_dump(mode="json")
+        self._write({"t": round(time.perf_counter() - self._started, 4), "event": payload})
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+            logger.info("Recorded Claude stream to %s", self.path)
+
+    def _write(self, line: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def open_recorder(directory: Optional[str], label: str, request: Dict[str, Any]) -> Optional[StreamRecorder]:
+    """Return a recorder when recording is enabled, logging (not raising) on failure."""
+    if not directory:
+        return None
+    try:
+        return StreamRecorder(directory, label, request)
+    except OSError as e:
+        logger.error("Could not open stream recorder in %s: %s", directory, e)
+        return None
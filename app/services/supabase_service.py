@@ -1,91 +1,204 @@
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
 from datetime import datetime, timedelta, timezone, date
 
 logger = logging.getLogger(__name__)
-from supabase import create_client, Client
-from supabase.lib.client_options import ClientOptions
-from app.config import SUPABASE_URL, SUPABASE_KEY, CACHE_DURATION
+from app import deadline
+from app.config import CACHE_DURATION, LOCAL_CACHE_TTL, TITLE_MATCH_THRESHOLD
+from app.logging_config import SAMPLED
+from app.metrics import CACHE_FUZZY_MATCHES, CACHE_LOOKUPS, SUPABASE_LATENCY, TITLE_INDEX_LOOKUPS, timed
 from app.models import ContentType, FetchRequest, CacheResult
 from app.schemas import ContentRecommendation
+from app.services.shared_cache import get_shared_cache
+from app.services.storage import StorageBackend, get_backend
+from app.services.storage.base import SHOW_DETAIL_COLUMNS, TitleKey, content_columns, title_columns
+from app.services.title_index import get_title_index
+from app.titles import normalize_title
+
+
+def _content_key(content_type: ContentType, content_id: int) -> str:
+    return f"{content_type.value}:{content_id}"
+
+
+def _title_key(content_type: ContentType, title: str, year: Optional[int]) -> Optional[str]:
+    """Shared cache key for a title, or None if it normalizes to nothing and so cannot identify one."""
+    normalized = normalize_title(title)
+    return f"{content_type.value}:{normalized}:{year or ''}" if normalized else None
+
 
 class SupabaseService:
-    def __init__(self):
-        self.schema = "pikflix"
-        self.client: Client = create_client(
-            SUPABASE_URL,
-            SUPABASE_KEY,
-            options=ClientOptions().replace(schema=self.schema)
-        )
-
-    @staticmethod
-    def _table_for(content_type: ContentType) -> str:
-        return "shows" if content_type == ContentType.SHOW else "movies"
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or get_backend()
 
+    @timed(SUPABASE_LATENCY, "lookup")
     async def get_content_by_titles(self, recommendations: List[ContentRecommendation], content_type: ContentType) -> CacheResult:
         """
         Check if content exists in the database and determine which need to be fetched/refreshed.
-        Branches column names based on content_type (title/release_date vs name/first_air_date).
+        Titles the title index knows are read by id; the rest are matched on
+        their normalized form with a trigram fallback above TITLE_MATCH_THRESHOLD.
         """
-        table = self._table_for(content_type)
-        title_col = "name" if content_type == ContentType.SHOW else "title"
-        date_col = "first_air_date" if content_type == ContentType.SHOW else "release_date"
-
         found = []
         to_fetch = []
         cache_expiry = datetime.now(timezone.utc) - timedelta(hours=CACHE_DURATION)
 
-        for rec in recommendations:
-            query = self.client.table(table).select("*").eq(title_col, rec.title)
-
-            if rec.year:
-                query = query.filter(date_col, "gte", f"{rec.year}-01-01")
-                query = query.filter(date_col, "lte", f"{rec.year}-12-31")
+        rows, known_ids = await self._lookup_rows(recommendations, content_type)
 
-            result = query.execute()
+        for rec, item, known_id in zip(recommendations, rows, known_ids):
+            if item:
+                score = item.pop('_score', 1.0)
+                if score < 1.0:
+                    CACHE_FUZZY_MATCHES.labels(content_type.value).inc()
+                    logger.info(
+                        "Fuzzy cache match for '%s': '%s' (similarity %.2f)",
+                        rec.title, item.get('title') or item.get('name'), score,
+                    )
 
-            if result.data and len(result.data) > 0:
-                item = result.data[0]
-                last_updated = datetime.fromisoformat(item['last_updated'])
+                last_updated = item['last_updated']
+                if isinstance(last_updated, str):
+                    last_updated = datetime.fromisoformat(last_updated)
 
                 if last_updated < cache_expiry:
+                    CACHE_LOOKUPS.labels(content_type.value, "stale").inc()
                     to_fetch.append(FetchRequest(
                         title=rec.title,
                         year=rec.year,
                         reason=rec.reason,
-                        id=item['id']
+                        id=item['id'],
+                        stale=item
                     ))
                 else:
+                    CACHE_LOOKUPS.labels(content_type.value, "hit").inc()
                     item['reason'] = rec.reason or ''
                     found.append(item)
             else:
+                CACHE_LOOKUPS.labels(content_type.value, "miss").inc()
                 to_fetch.append(FetchRequest(
                     title=rec.title,
                     year=rec.year,
-                    reason=rec.reason
+                    reason=rec.reason,
+                    id=known_id
                 ))
 
         return CacheResult(found=found, to_fetch=to_fetch)
 
+    async def _lookup_rows(
+        self, recommendations: List[ContentRecommendation], content_type: ContentType
+    ) -> Tuple[List[Optional[Dict[str, Any]]], List[Optional[int]]]:
+        """
+        Cached row for each recommendation (or None), and the TMDB id its title
+        resolved to (or None). Titles resolve through the shared cache, then
+        the title index; known ids are read by id from the shared cache, then
+        the backend. The rest go through the backend's title match. An id
+        without a row still saves the TMDB search: the caller can fetch the
+        details directly.
+
+        Backend reads are cut off at the active deadline. A PostgREST call
+        runs on a worker thread, so the wait is interrupted on time; the call
+        itself finishes in the background.
+        """
+        cache = get_shared_cache()
+        title_keys = [_title_key(content_type, rec.title, rec.year) for rec in recommendations]
+        cached_ids = cache.get_many("titles", [key for key in title_keys if key]) if cache else {}
+
+        known_ids: List[Optional[int]] = [cached_ids.get(key) if key else None for key in title_keys]
+        index = get_title_index()
+        if index is not None:
+            for position, rec in enumerate(recommendations):
+                if known_ids[position] is not None:
+                    continue
+                match = index.lookup(rec.title, rec.year, content_type)
+                if match and match.content_type == content_type:
+                    known_ids[position] = match.id
+                TITLE_INDEX_LOOKUPS.labels("cache", "hit" if known_ids[position] else "miss").inc()
+
+        rows: List[Optional[Dict[str, Any]]] = [None] * len(recommendations)
+        wanted = {known_id for known_id in known_ids if known_id is not None}
+        if wanted:
+            by_id: Dict[int, Dict[str, Any]] = {}
+            if cache:
+                cached_rows = cache.get_many("content", [_content_key(content_type, i) for i in wanted])
+                by_id = {row["id"]: row for row in cached_rows.values()}
+            fetch_ids = sorted(wanted - by_id.keys())
+            if fetch_ids:
+                async with deadline.enforced():
+                    fetched = await self.backend.get_content_by_ids(content_type, fetch_ids)
+                self._cache_rows(content_type, fetched.values())
+                by_id.update(fetched)
+            for position, known_id in enumerate(known_ids):
+                row = by_id.get(known_id) if known_id is not None else None
+                rows[position] = dict(row) if row else None
+
+        unresolved = [position for position, known_id in enumerate(known_ids) if known_id is None]
+        if unresolved:
+            keys: List[TitleKey] = [(recommendations[p].title, recommendations[p].year) for p in unresolved]
+            async with deadline.enforced():
+                matched = await self.backend.find_content(content_type, keys, TITLE_MATCH_THRESHOLD)
+            found_titles = {}
+            for position, row in zip(unresolved, matched):
+                rows[position] = row
+                key = title_keys[position]
+                if row and key:
+                    found_titles[key] = row["id"]
+            self._cache_rows(content_type, (row for row in matched if row))
+            if cache:
+                cache.set_many("titles", found_titles, LOCAL_CACHE_TTL["titles"])
+
+        return rows, known_ids
+
+    def _cache_rows(self, content_type: ContentType, rows: Iterable[Dict[str, Any]]) -> None:
+        """Write content rows through to the shared cache, keyed by id and by their own title."""
+        cache = get_shared_cache()
+        if cache is None:
+            return
+        title_col, _, date_col = title_columns(content_type)
+        by_id = {}
+        by_title = {}
+        for row in rows:
+            clean = {key: value for key, value in row.items() if key not in ('_score', 'reason')}
+            by_id[_content_key(content_type, row["id"])] = clean
+            year = str(row.get(date_col) or "")[:4]
+            key = _title_key(content_type, row.get(title_col) or "", int(year) if year.isdigit() else None)
+            if key:
+                by_title[key] = row["id"]
+        cache.set_many("content", by_id, LOCAL_CACHE_TTL["content"])
+        cache.set_many("titles", by_title, LOCAL_CACHE_TTL["titles"])
+
+    @timed(SUPABASE_LATENCY, "save_content")
     async def save_content(self, items: List[Dict[str, Any]], content_type: ContentType) -> None:
-        table = self._table_for(content_type)
         for item in items:
             try:
-                item['last_updated'] = datetime.now().isoformat()
+                item['last_updated'] = datetime.now(timezone.utc).isoformat()
                 prepared = self._prepare_for_db(item, content_type)
                 label = prepared.get('title') or prepared.get('name', 'unknown')
-                logger.info("Saving %s: %s", content_type.value, label)
-                self.client.table(table).upsert(prepared).execute()
+                logger.info("Saving %s: %s", content_type.value, label, extra=SAMPLED)
+                await self.backend.upsert_content(content_type, [prepared])
+                self._cache_rows(content_type, [prepared])
+                details = self._show_details_rows([item]) if content_type == ContentType.SHOW else []
+                if details:
+                    await self.backend.upsert_show_details(details)
             except Exception as e:
                 label = item.get('title') or item.get('name', 'unknown')
                 logger.error("Error saving %s %s: %s (%s)", content_type.value, label, e, e.__class__.__name__)
 
-    def _prepare_for_db(self, item: Dict[str, Any], content_type: ContentType) -> Dict[str, Any]:
-        copy = item.copy()
+    @timed(SUPABASE_LATENCY, "save_batch")
+    async def save_content_batch(self, items: List[Dict[str, Any]], content_type: ContentType) -> None:
+        """Upsert many items in one backend call. Unlike save_content, errors propagate."""
+        now = datetime.now(timezone.utc).isoformat()
+        rows = []
+        for item in items:
+            item['last_updated'] = now
+            rows.append(self._prepare_for_db(item, content_type))
+        await self.backend.upsert_content(content_type, rows)
+        self._cache_rows(content_type, rows)
+        details = self._show_details_rows(items) if content_type == ContentType.SHOW else []
+        if details:
+            await self.backend.upsert_show_details(details)
 
-        # Remove transient fields not in DB
-        for field in ('reason',):
-            copy.pop(field, None)
+    def _prepare_for_db(self, item: Dict[str, Any], content_type: ContentType) -> Dict[str, Any]:
+        # Only the fields the API models declare; TMDB sends many more, and
+        # the nested show data goes to show_details instead
+        columns = content_columns(content_type)
+        copy = {key: value for key, value in item.items() if key in columns}
 
         # Convert date objects to ISO strings
         date_fields = ['release_date'] if content_type == ContentType.MOVIE else ['first_air_date', 'last_air_date']
@@ -95,14 +208,52 @@ class SupabaseService:
 
         return copy
 
+    def _show_details_rows(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """show_details rows for TMDB show payloads that carry any season or episode data."""
+        rows = []
+        for item in items:
+            if any(item.get(column) for column in SHOW_DETAIL_COLUMNS):
+                row = {column: item.get(column) for column in SHOW_DETAIL_COLUMNS}
+                rows.append({"id": item["id"], **row, "last_updated": item.get("last_updated")})
+        return rows
+
+    @timed(SUPABASE_LATENCY, "get_show_details")
+    async def get_show_details(self, show_id: int) -> Optional[Dict[str, Any]]:
+        """Stored season and episode data for a show, or None if missing or older than CACHE_DURATION."""
+        row = (await self.backend.get_show_details([show_id])).get(show_id)
+        if row is None:
+            return None
+        last_updated = row.get("last_updated")
+        if isinstance(last_updated, str):
+            last_updated = datetime.fromisoformat(last_updated)
+        if last_updated is None or last_updated < datetime.now(timezone.utc) - timedelta(hours=CACHE_DURATION):
+            return None
+        return row
+
+    @timed(SUPABASE_LATENCY, "save_show_details")
+    async def save_show_details(self, show: Dict[str, Any]) -> None:
+        """Store the season and episode data of a TMDB show payload."""
+        try:
+            show['last_updated'] = datetime.now(timezone.utc).isoformat()
+            rows = self._show_details_rows([show])
+            if rows:
+                await self.backend.upsert_show_details(rows)
+        except Exception as e:
+            logger.error("Error saving details for show ID %s: %s (%s)", show.get('id'), e, e.__class__.__name__)
+
+    @timed(SUPABASE_LATENCY, "get_providers")
     async def get_providers(self, content_id: int, content_type: ContentType, region: str = None) -> Dict[str, Any]:
-        query = self.client.table("providers").select("*").eq("content_id", content_id).eq("content_type", content_type.value)
-        result = query.execute()
+        cache = get_shared_cache()
+        key = _content_key(content_type, content_id)
+        provider_data = cache.get("providers", key) if cache else None
+        if provider_data is None:
+            provider_data = await self.backend.get_providers(content_id, content_type)
+            if provider_data and cache:
+                cache.set("providers", key, provider_data, LOCAL_CACHE_TTL["providers"])
 
-        if not result.data or len(result.data) == 0:
+        if not provider_data:
             return None
 
-        provider_data = result.data[0]
         results = provider_data.get("results") or {}
 
         if region:
@@ -118,6 +269,23 @@ class SupabaseService:
             "results": results
         }
 
+    @timed(SUPABASE_LATENCY, "get_providers_version")
+    async def get_providers_version(self, content_id: int, content_type: ContentType) -> Optional[str]:
+        """When the stored providers row was last written, or None without one. Reads no provider data."""
+        cache = get_shared_cache()
+        row = cache.get("providers", _content_key(content_type, content_id)) if cache else None
+        updated = row.get("last_updated") if row else await self.backend.get_providers_updated(content_id, content_type)
+        if updated is None:
+            return None
+        # asyncpg returns a datetime, PostgREST and save_providers ISO strings that may differ in precision
+        if isinstance(updated, str):
+            try:
+                return datetime.fromisoformat(updated).isoformat()
+            except ValueError:
+                return updated
+        return updated.isoformat()
+
+    @timed(SUPABASE_LATENCY, "save_providers")
     async def save_providers(self, content_id: int, content_type: ContentType, provider_data: Dict[str, Any]) -> None:
         try:
             data = {
@@ -126,14 +294,10 @@ class SupabaseService:
                 "last_updated": datetime.now(timezone.utc).isoformat(),
                 "results": provider_data.get("results", {})
             }
-
-            query = self.client.table("providers").select("content_id").eq("content_id", content_id).eq("content_type", content_type.value)
-            result = query.execute()
-
-            if result.data and len(result.data) > 0:
-                self.client.table("providers").update(data).eq("content_id", content_id).eq("content_type", content_type.value).execute()
-            else:
-                self.client.table("providers").insert(data).execute()
+            await self.backend.upsert_providers(data)
+            cache = get_shared_cache()
+            if cache:
+                cache.set("providers", _content_key(content_type, content_id), data, LOCAL_CACHE_TTL["providers"])
 
             logger.info("Saved providers for %s ID: %s", content_type.value, content_id)
         except Exception as e:
@@ -0,0 +1,181 @@
+"""
+Memory-mapped (title, year) -> TMDB id resolver.
+
+The index file is built from the cached catalog (python -m app.cli.build_title_index)
+and holds four parallel arrays sorted by a 64-bit hash of the normalized title:
+
+    header   magic "PKTI", version, byte order, entry count     16 bytes
+    hashes   uint64[count]   blake2b-64 of normalize_title(title)
+    ids      uint32[count]   TMDB id
+    years    uint16[count]   release / first air year, 0 if unknown
+    types    uint8[count]    0 = movie, 1 = show
+
+Entries sharing a hash are ordered by popularity, most popular first. Every
+uvicorn worker maps the same file read-only, so the pages are shared through
+the page cache and opening it costs nothing. A lookup is a binary search over
+the hash array. Rebuilds write a new file and os.replace() it into place;
+workers notice the new inode and remap it.
+"""
+
+import bisect
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from app.config import TITLE_INDEX_PATH
+from app.models import ContentType
+from app.titles import normalize_title
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"PKTI"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHBxQ")  # magic, version, byte order, count
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+_TYPES = (ContentType.MOVIE, ContentType.SHOW)
+
+# How often a worker checks whether the file was replaced
+_RECHECK_SECONDS = 30.0
+
+
+class TitleMatch(NamedTuple):
+    id: int
+    year: Optional[int]
+    content_type: ContentType
+
+
+def title_hash(title: str) -> int:
+    digest = hashlib.blake2b(normalize_title(title).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class TitleIndex:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.inode = (stat.st_dev, stat.st_ino)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, byte_order, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not a version {_VERSION} title index")
+        if byte_order != _BYTE_ORDER:
+            raise ValueError(f"{path} was built on a machine with a different byte order")
+
+        view = memoryview(self._mmap)
+        offset = _HEADER.size
+        self._hashes = view[offset:offset + 8 * count].cast("Q")
+        offset += 8 * count
+        self._ids = view[offset:offset + 4 * count].cast("I")
+        offset += 4 * count
+        self._years = view[offset:offset + 2 * count].cast("H")
+        offset += 2 * count
+        self._types = view[offset:offset + count]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def lookup(self, title: str, year: Optional[int], content_type: ContentType) -> Optional[TitleMatch]:
+        """
+        Most popular entry with this normalized title (and year, when given),
+        preferring `content_type` over the other type.
+        """
+        key = title_hash(title)
+        start = bisect.bisect_left(self._hashes, key)
+        other: Optional[TitleMatch] = None
+        position = start
+        while position < len(self._hashes) and self._hashes[position] == key:
+            entry_year = self._years[position]
+            if not year or entry_year == year:
+                match = TitleMatch(self._ids[position], entry_year or None, _TYPES[self._types[position]])
+                if match.content_type == content_type:
+                    return match
+                other = other or match
+            position += 1
+        return other
+
+    def close(self) -> None:
+        for view in (self._hashes, self._ids, self._years, self._types):
+            view.release()
+        self._mmap.close()
+
+
+def write_index(path: str, entries: Iterable[Tuple[str, Optional[int], int, ContentType, float]]) -> int:
+    """
+    Build an index from (title, year, id, content_type, popularity) entries and
+    atomically replace `path` with it. Returns the number of entries written.
+    """
+    rows: List[Tuple[int, float, int, int, int]] = []
+    for title, year, content_id, content_type, popularity in entries:
+        if not normalize_title(title):
+            continue
+        rows.append((title_hash(title), -(popularity or 0.0), content_id, year or 0, _TYPES.index(content_type)))
+    rows.sort()
+
+    # Drop repeats of the same id under one hash (title and original title often normalize alike)
+    unique: List[Tuple[int, float, int, int, int]] = []
+    seen = set()
+    for row in rows:
+        marker = (row[0], row[2], row[4])
+        if marker not in seen:
+            seen.add(marker)
+            unique.append(row)
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, _BYTE_ORDER, len(unique)))
+            array("Q", (row[0] for row in unique)).tofile(f)
+            array("I", (row[2] for row in unique)).tofile(f)
+            array("H", (min(row[3], 0xFFFF) for row in unique)).tofile(f)
+            array("B", (row[4] for row in unique)).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return len(unique)
+
+
+_index: Optional[TitleIndex] = None
+_checked_at = 0.0
+
+
+def get_title_index() -> Optional[TitleIndex]:
+    """The process-wide index, remapped when the file is replaced. None if there is no index."""
+    global _index, _checked_at
+    if not TITLE_INDEX_PATH:
+        return None
+    now = time.monotonic()
+    if now - _checked_at < _RECHECK_SECONDS:
+        return _index
+    _checked_at = now
+
+    try:
+        stat = os.stat(TITLE_INDEX_PATH)
+    except FileNotFoundError:
+        return _index
+    if _index is not None and _index.inode == (stat.st_dev, stat.st_ino):
+        return _index
+
+    try:
+        index = TitleIndex(TITLE_INDEX_PATH)
+    except (OSError, ValueError) as e:
+        logger.error("Could not load title index %s: %s", TITLE_INDEX_PATH, e)
+        return _index
+
+    # The previous mapping is left to the garbage collector: a lookup may still be using it
+    _index = index
+    logger.info("Loaded title index %s (%d entries)", TITLE_INDEX_PATH, len(index))
+    return _index
@@ -1,10 +1,32 @@
+import asyncio
 import logging
+import time
 from typing import List, Dict, Any, Optional
 import httpx
 
 logger = logging.getLogger(__name__)
-from app.config import TMDB_READ_ACCESS_TOKEN, TMDB_BASE_URL
+from app import deadline
+from app.config import (
+    TMDB_BASE_URL,
+    TMDB_HEDGE_MAX_RATIO,
+    TMDB_HEDGE_MIN_DELAY,
+    TMDB_HEDGE_PERCENTILE,
+    TMDB_MAX_RETRIES,
+    TMDB_READ_ACCESS_TOKEN,
+    TMDB_TIMEOUT,
+)
+from app.deadline import DeadlineExceeded
+from app.logging_config import SAMPLED
+from app.metrics import TITLE_INDEX_LOOKUPS, TMDB_LATENCY, TMDB_RETRIES, TMDB_SEARCHES
 from app.models import ContentType, FetchRequest
+from app.services.hedging import HedgeBudget, LatencyWindow, first_of
+from app.services.rate_limiter import backoff, get_tmdb_limiter, retry_after
+from app.services.title_index import get_title_index
+from app.timing import record
+
+# Shared by every TMDBService instance in the process
+_latencies = LatencyWindow(percentile=TMDB_HEDGE_PERCENTILE)
+_hedge_budget = HedgeBudget(TMDB_HEDGE_MAX_RATIO)
 
 
 class TMDBService:
@@ -15,46 +37,133 @@ class TMDBService:
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json;charset=utf-8"
         }
+
+    async def _get(self, endpoint: str, path: str, params: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """
+        GET a TMDB path through the shared rate limiter. `endpoint` is the
+        templated path (e.g. /movie/{id}) used to label latency metrics.
+        429s, 5xx and connection errors are retried with backoff, honoring
+        Retry-After; the last response (or error) is returned after
+        TMDB_MAX_RETRIES retries. Timeouts come from the active deadline
+        (capped at TMDB_TIMEOUT), and DeadlineExceeded is raised once no
+        further attempt fits in it.
+        """
+        limiter = get_tmdb_limiter()
+        async with httpx.AsyncClient(timeout=TMDB_TIMEOUT) as client:
+            for attempt in range(TMDB_MAX_RETRIES + 1):
+                final = attempt == TMDB_MAX_RETRIES
+                try:
+                    response = await self._hedged_get(client, endpoint, path, params)
+                except httpx.TransportError as e:
+                    left = deadline.remaining()
+                    delay = backoff(attempt)
+                    if left is not None and delay >= left:
+                        raise DeadlineExceeded() from e
+                    if final:
+                        raise
+                    TMDB_RETRIES.labels(endpoint, e.__class__.__name__).inc()
+                    await asyncio.sleep(delay)
+                    continue
+
+                status = response.status_code
+                if status == 429:
+                    limiter.throttled()
+                retry_delay: Optional[float] = None
+                if not final and (status == 429 or status >= 500):
+                    retry_delay = retry_after(response.headers.get("retry-after"))
+                    if retry_delay is None:
+                        retry_delay = backoff(attempt)
+                    left = deadline.remaining()
+                    if left is not None and retry_delay >= left:
+                        retry_delay = None
+                if retry_delay is None:
+                    if status == 429 or status >= 500:
+                        logger.warning("TMDB %s still failing with %s after %d retries", endpoint, status, attempt)
+                    return response
+
+                TMDB_RETRIES.labels(endpoint, str(status)).inc()
+                if status == 429:
+                    # Every caller is over the limit, not just this one: slot() holds them all
+                    limiter.pause(retry_delay)
+                else:
+                    await asyncio.sleep(retry_delay)
+        return response
+
+    async def _hedged_get(self, client: httpx.AsyncClient, endpoint: str, path: str, params: Optional[Dict[str, Any]]) -> httpx.Response:
+        """One attempt, duplicated if it runs past the endpoint's recent p95 (see hedging.py)."""
+        limiter = get_tmdb_limiter()
+        sent = asyncio.Event()
+
+        async def call() -> httpx.Response:
+            # Waiting for a limiter slot counts against the deadline too
+            async with deadline.enforced(), limiter.slot():
+                sent.set()
+                return await self._timed_get(client, endpoint, path, params, deadline.timeout(TMDB_TIMEOUT))
+
+        threshold = _latencies.threshold(endpoint)
+        delay = max(threshold, TMDB_HEDGE_MIN_DELAY) if threshold is not None else None
+        started = time.perf_counter()
+        try:
+            # The hedge delay runs from when the request leaves the limiter, not from the queue
+            response, _ = await first_of(call, delay, _hedge_budget, endpoint, sent)
+        finally:
+            # Once per attempt, not per hedged duplicate: the time the caller waited
+            record(self._stage_for(endpoint), time.perf_counter() - started)
+        return response
+
+    async def _timed_get(self, client: httpx.AsyncClient, endpoint: str, path: str, params: Optional[Dict[str, Any]], timeout: float) -> httpx.Response:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = await client.get(
+                f"{self.base_url}{path}",
+                headers=self.headers,
+                params=params,
+                timeout=timeout
+            )
+            status = str(response.status_code)
+            if response.status_code < 500 and response.status_code != 429:
+                _latencies.observe(endpoint, time.perf_counter() - started)
+            return response
+        finally:
+            TMDB_LATENCY.labels(endpoint, status).observe(time.perf_counter() - started)
+
+    @staticmethod
+    def _stage_for(endpoint: str) -> str:
+        """Debug timing stage an endpoint's time is attributed to."""
+        if endpoint.startswith("/search/"):
+            return "search"
+        if endpoint.endswith("/watch/providers"):
+            return "providers"
+        return "detail"
     
     async def search_movies(self, query: str, year: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Search for movies by title and optionally year
         """
-        url = f"{self.base_url}/search/movie"
         params = {"query": query}
         
         if year:
             params["year"] = year
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                url, 
-                headers=self.headers, 
-                params=params
-            )
-            
-            if response.status_code == 200:
-                results = response.json().get("results", [])
-                return results[:1] if results else []  # Return only the top match
-            
-            return []
+        response = await self._get("/search/movie", "/search/movie", params)
+        
+        if response.status_code == 200:
+            results = response.json().get("results", [])
+            return results[:1] if results else []  # Return only the top match
+        
+        return []
     
     async def get_movie_details(self, movie_id: int) -> Dict[str, Any]:
         """
         Get detailed information about a movie by its ID
         """
-        url = f"{self.base_url}/movie/{movie_id}"
+        response = await self._get("/movie/{id}", f"/movie/{movie_id}")
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                url, 
-                headers=self.headers
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            
-            return {}
+        if response.status_code == 200:
+            return response.json()
+        
+        return {}
     
     async def fetch_movie_data(self, movie_list: List[FetchRequest]) -> List[Dict[str, Any]]:
         """
@@ -65,7 +174,7 @@ class TMDBService:
         results = []
 
         for movie in movie_list:
-            logger.info("Fetching movie from TMDB: %s", movie.title)
+            logger.info("Fetching movie from TMDB: %s", movie.title, extra=SAMPLED)
             movie_data = None
             reason = movie.reason or ''
 
@@ -90,45 +199,35 @@ class TMDBService:
         Get movie watch providers (streaming services) from TMDB API
         Returns data for all available regions
         """
-        url = f"{self.base_url}/movie/{movie_id}/watch/providers"
-
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(
-                url,
-                headers=self.headers
-            )
+        response = await self._get("/movie/{id}/watch/providers", f"/movie/{movie_id}/watch/providers")
 
-            if response.status_code == 200:
-                return response.json()
+        if response.status_code == 200:
+            return response.json()
 
-            # Return empty structure if API call fails
-            return {"id": movie_id, "results": {}}
+        # Return empty structure if API call fails
+        return {"id": movie_id, "results": {}}
 
     async def search_shows(self, query: str, year: Optional[int] = None) -> List[Dict[str, Any]]:
-        url = f"{self.base_url}/search/tv"
         params = {"query": query}
         if year:
             params["first_air_date_year"] = year
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=self.headers, params=params)
-            if response.status_code == 200:
-                results = response.json().get("results", [])
-                return results[:1] if results else []
-            return []
+        response = await self._get("/search/tv", "/search/tv", params)
+        if response.status_code == 200:
+            results = response.json().get("results", [])
+            return results[:1] if results else []
+        return []
 
     async def get_show_details(self, show_id: int) -> Dict[str, Any]:
-        url = f"{self.base_url}/tv/{show_id}"
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=self.headers)
-            if response.status_code == 200:
-                return response.json()
-            return {}
+        response = await self._get("/tv/{id}", f"/tv/{show_id}")
+        if response.status_code == 200:
+            return response.json()
+        return {}
 
     async def fetch_show_data(self, show_list: List[FetchRequest]) -> List[Dict[str, Any]]:
         results = []
         for show in show_list:
-            logger.info("Fetching show from TMDB: %s", show.title)
+            logger.info("Fetching show from TMDB: %s", show.title, extra=SAMPLED)
             show_data = None
             reason = show.reason or ''
 
@@ -146,12 +245,10 @@ class TMDBService:
         return results
 
     async def get_show_providers(self, show_id: int) -> Dict[str, Any]:
-        url = f"{self.base_url}/tv/{show_id}/watch/providers"
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=self.headers)
-            if response.status_code == 200:
-                return response.json()
-            return {"id": show_id, "results": {}}
+        response = await self._get("/tv/{id}/watch/providers", f"/tv/{show_id}/watch/providers")
+        if response.status_code == 200:
+            return response.json()
+        return {"id": show_id, "results": {}}
 
     async def fetch_content_data(self, content_list: List[FetchRequest], content_type: ContentType) -> List[Dict[str, Any]]:
         if content_type == ContentType.SHOW:
@@ -168,7 +265,21 @@ class TMDBService:
         Search TMDB for content. Tries the given content_type first.
         If no result, falls back to the other type.
         Returns (detail_data, resolved_content_type) or (None, original_type).
+        Titles known to the title index skip the search and go straight to details.
         """
+        index = get_title_index()
+        if index is not None:
+            match = index.lookup(title, year, content_type)
+            if match and match.content_type != content_type:
+                match = None
+            TITLE_INDEX_LOOKUPS.labels("search", "hit" if match else "miss").inc()
+            if match:
+                detail = self.get_show_details if match.content_type == ContentType.SHOW else self.get_movie_details
+                data = await detail(match.id)
+                if data:
+                    TMDB_SEARCHES.labels(content_type.value, "index").inc()
+                    return data, match.content_type
+
         # Try primary type first
         if content_type == ContentType.MOVIE:
             primary_search, fallback_search = self.search_movies, self.search_shows
@@ -183,6 +294,7 @@ class TMDBService:
         if results:
             data = await primary_detail(results[0]['id'])
             if data:
+                TMDB_SEARCHES.labels(content_type.value, "primary").inc()
                 return data, content_type
 
         # Fallback to the other type
@@ -191,6 +303,8 @@ class TMDBService:
         if results:
             data = await fallback_detail(results[0]['id'])
             if data:
+                TMDB_SEARCHES.labels(content_type.value, "fallback").inc()
                 return data, fallback_type
 
+        TMDB_SEARCHES.labels(content_type.value, "not_found").inc()
         return None, content_type
\ No newline at end of file
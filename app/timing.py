@@ -0,0 +1,64 @@
+"""
+Per-request stage timing for debug output and Server-Timing headers.
+
+A StageTimer is activated for the duration of some work; services record
+into whichever timer is active (if any) via record(), so they need no extra
+parameters and pay almost nothing when timing is off.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+_current: ContextVar[Optional["StageTimer"]] = ContextVar("stage_timer", default=None)
+
+
+class StageTimer:
+    """Accumulates wall time per named stage."""
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def merge(self, other: "StageTimer") -> None:
+        for stage, seconds in other.stages.items():
+            self.add(stage, seconds)
+
+    def as_ms(self) -> Dict[str, float]:
+        return {stage: round(seconds * 1000.0, 2) for stage, seconds in self.stages.items()}
+
+    def server_timing(self, descriptions: Optional[Dict[str, str]] = None) -> str:
+        """Render as a Server-Timing header value."""
+        descriptions = descriptions or {}
+        entries = []
+        for stage, ms in self.as_ms().items():
+            desc = descriptions.get(stage)
+            entries.append(f'{stage};desc="{desc}";dur={ms}' if desc else f"{stage};dur={ms}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def activate(timer: Optional[StageTimer]) -> Iterator[Optional[StageTimer]]:
+    """Make `timer` the one services record into. Must not span a generator yield."""
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+def record(stage: str, seconds: float) -> None:
+    timer = _current.get()
+    if timer is not None:
+        timer.add(stage, seconds)
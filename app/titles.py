@@ -0,0 +1,30 @@
+"""
+Title normalization shared by cache lookups and deduplication.
+
+normalize_title must stay identical to pikflix.normalize_title() in
+supabase/migrations/20261019120000_fold_title_accents.sql: the generated
+title_norm columns are computed by the database, and the lookup keys compared
+against them are computed here.
+"""
+
+import unicodedata
+
+# The combining accents unaccent strips from Latin, Greek and Cyrillic letters.
+# Other marks (kana dakuten, Hangul jamo) are recomposed, not dropped.
+_ACCENTS = range(0x0300, 0x0370)
+# Letters unaccent folds that have no Unicode decomposition to strip
+_UNACCENT_EXTRAS = str.maketrans({"ß": "ss", "æ": "ae", "œ": "oe", "ø": "o", "ł": "l", "đ": "d"})
+
+
+def normalize_title(title: str) -> str:
+    """
+    Lowercase, spell out "&", strip accents and collapse everything that is
+    not a letter or digit into single spaces: "Spider-Man: Into the
+    Spider-Verse" becomes "spider man into the spider verse", "Amélie"
+    becomes "amelie". Letters of any script are kept, so a title can only
+    normalize to "" if it has no letters or digits at all; callers must not
+    use "" as a lookup or dedup key.
+    """
+    decomposed = unicodedata.normalize("NFKD", title.lower().replace("&", " and ").translate(_UNACCENT_EXTRAS))
+    folded = unicodedata.normalize("NFC", "".join(ch for ch in decomposed if ord(ch) not in _ACCENTS))
+    return " ".join("".join(ch if ch.isalnum() else " " for ch in folded).split())
@@ -0,0 +1,134 @@
+"""
+Micro-benchmark: bytes on the wire and CPU per event for the compressed
+recommendation stream (app/compression.py).
+
+Builds synthetic recommendation streams (init event, nine content events
+with full Movie/Show payloads, summary) and sends each one through a
+StreamCompressor event by event, flushing after every line as the
+middleware does. The baseline is the same stream uncompressed, and the
+whole stream compressed in one go shows what the per-event flushes cost.
+
+    python -m benchmarks.bench_compression [--streams 200] [--seed 0] [--gzip-level 6] [--brotli-quality 4]
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+from typing import Any, Dict, List
+
+from app.compression import StreamCompressor, brotli
+
+_WORDS = (
+    "a an the heist crew vault betrayal detective city night rain money "
+    "family secret past war small town mystery love revenge escape prison "
+    "journey island storm killer truth lies power empire dream memory"
+).split()
+_GENRES = ["Action", "Crime", "Drama", "Thriller", "Mystery", "Comedy", "Science Fiction", "Western"]
+_COMPANIES = ["Warner Bros. Pictures", "Legendary Pictures", "A24", "Focus Features", "Neon", "Plan B"]
+_COUNTRIES = [("US", "United States of America"), ("GB", "United Kingdom"), ("FR", "France"), ("KR", "South Korea")]
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+def _movie(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "id": rng.randint(1, 1_000_000),
+        "imdb_id": f"tt{rng.randint(1_000_000, 9_999_999)}",
+        "title": _sentence(rng, rng.randint(1, 4))[:-1],
+        "original_title": _sentence(rng, rng.randint(1, 4))[:-1],
+        "original_language": "en",
+        "overview": " ".join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 4))),
+        "tagline": _sentence(rng, 6),
+        "status": "Released",
+        "release_date": f"{rng.randint(1960, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "adult": False,
+        "budget": rng.randint(0, 200) * 1_000_000,
+        "revenue": rng.randint(0, 900) * 1_000_000,
+        "runtime": rng.randint(80, 180),
+        "vote_average": round(rng.uniform(4, 9), 3),
+        "vote_count": rng.randint(10, 30_000),
+        "popularity": round(rng.uniform(1, 400), 3),
+        "video": False,
+        "poster_path": f"/{rng.getrandbits(128):032x}.jpg",
+        "backdrop_path": f"/{rng.getrandbits(128):032x}.jpg",
+        "homepage": "",
+        "belongs_to_collection": None,
+        "genres": [{"id": rng.randint(10, 10_000), "name": g} for g in rng.sample(_GENRES, 3)],
+        "production_companies": [
+            {"id": rng.randint(1, 100_000), "name": c, "logo_path": f"/{rng.getrandbits(64):016x}.png", "origin_country": "US"}
+            for c in rng.sample(_COMPANIES, 3)
+        ],
+        "production_countries": [{"iso_3166_1": code, "name": name} for code, name in rng.sample(_COUNTRIES, 2)],
+        "spoken_languages": [{"english_name": "English", "iso_639_1": "en", "name": "English"}],
+        "reason": _sentence(rng, rng.randint(10, 18)),
+    }
+
+
+def _stream(rng: random.Random) -> List[bytes]:
+    lines: List[Dict[str, Any]] = [{"type": "init", "query": "slow-burn heist movies", "content_type": "movie"}]
+    lines += [{"type": "content", "content_type": "movie", "data": _movie(rng)} for _ in range(9)]
+    lines.append({"type": "summary", "items": 9, "dropped": 0, "total_ms": 2314.5})
+    return [(json.dumps(line) + "\n").encode() for line in lines]
+
+
+def _per_event(streams: List[List[bytes]], encoding: str, args: argparse.Namespace) -> Dict[str, float]:
+    sent = 0
+    events = 0
+    started = time.process_time()
+    for lines in streams:
+        compressor = StreamCompressor(encoding, args.gzip_level, args.brotli_quality)
+        for line in lines:
+            sent += len(compressor.compress(line))
+        sent += len(compressor.finish())
+        events += len(lines)
+    cpu = time.process_time() - started
+    return {"bytes_per_event": sent / events, "cpu_us_per_event": cpu / events * 1e6}
+
+
+def _whole(streams: List[List[bytes]], args: argparse.Namespace) -> Dict[str, float]:
+    sent = 0
+    events = 0
+    started = time.process_time()
+    for lines in streams:
+        compressor = zlib.compressobj(args.gzip_level, zlib.DEFLATED, 31)
+        sent += len(compressor.compress(b"".join(lines)) + compressor.flush())
+        events += len(lines)
+    cpu = time.process_time() - started
+    return {"bytes_per_event": sent / events, "cpu_us_per_event": cpu / events * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    streams = [_stream(rng) for _ in range(args.streams)]
+    raw = sum(len(line) for lines in streams for line in lines) / sum(len(lines) for lines in streams)
+
+    results = {"identity": {"bytes_per_event": raw, "cpu_us_per_event": 0.0}}
+    results["gzip, flush per event"] = _per_event(streams, "gzip", args)
+    if brotli is not None:
+        results["br, flush per event"] = _per_event(streams, "br", args)
+    results["gzip, whole stream"] = _whole(streams, args)
+
+    print(f"{args.streams} streams x {len(streams[0])} events, gzip level {args.gzip_level}, brotli quality {args.brotli_quality}")
+    print(f"{'encoding':<24}{'bytes/event':>12}{'ratio':>8}{'cpu us/event':>14}")
+    for name, result in results.items():
+        print(
+            f"{name:<24}{result['bytes_per_event']:>12.0f}{raw / result['bytes_per_event']:>8.2f}"
+            f"{result['cpu_us_per_event']:>14.1f}"
+        )
+    if brotli is None:
+        print("(brotli not installed; pip install brotli to include it)")
+
+
+if __name__ == "__main__":
+    main()
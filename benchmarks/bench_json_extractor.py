@@ -0,0 +1,133 @@
+"""
+Micro-benchmark: JSONObjectExtractor vs the previous per-character parser loop.
+
+Replays synthetic structured-output documents split into deltas of several
+sizes and reports the time spent parsing per document. Timing uses documents
+without escaped quotes (the legacy loop stops early on those, which would flatter
+it); correctness is checked on the full corpus against json.loads.
+
+    python -m benchmarks.bench_json_extractor [--docs 2000] [--seed 0]
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+from app.json_stream import JSONObjectExtractor
+
+_REASONS = [
+    "A slow-burn heist thriller with a \"perfect crime\" at its core",
+    "Mind-bending [nested] timelines and {unreliable} narrators",
+    "Cozy small-town mystery, perfect for a rainy evening",
+    "Back\\slashes and ünïcödé survive the round trip",
+    "Quotes a line: \"Get to the chopper]\" and means it",
+]
+
+
+def _make_document(rng: random.Random, reasons: List[str]) -> str:
+    items = [
+        {
+            "title": f"Title {rng.randint(1, 10_000)}",
+            "year": rng.randint(1950, 2025),
+            "reason": rng.choice(reasons),
+            "content_type": rng.choice(["movie", "show"]),
+        }
+        for _ in range(9)
+    ]
+    return json.dumps({"movies": items}, ensure_ascii=False)
+
+
+def _split_deltas(doc: str, rng: random.Random, max_size: int) -> List[str]:
+    """Split like a token stream: deltas of 1..max_size characters."""
+    deltas, i = [], 0
+    while i < len(doc):
+        n = rng.randint(1, max_size)
+        deltas.append(doc[i:i + n])
+        i += n
+    return deltas
+
+
+def _legacy_parse(deltas: List[str]) -> List[Dict[str, Any]]:
+    """The per-character loop previously inlined in AnthropicService."""
+    items = []
+    buffer = ""
+    depth = 0
+    in_string = False
+    for text in deltas:
+        for ch in text:
+            if in_string:
+                buffer += ch
+                if ch == '"':
+                    in_string = False
+                continue
+            if ch == '"' and depth >= 2:
+                in_string = True
+                buffer += ch
+                continue
+            if ch == '{':
+                depth += 1
+                if depth == 2:
+                    buffer = '{'
+                continue
+            if ch == '}' and depth == 2:
+                buffer += '}'
+                try:
+                    items.append(json.loads(buffer))
+                except json.JSONDecodeError:
+                    pass
+                buffer = ""
+                depth -= 1
+                continue
+            if ch == ']':
+                return items
+            if depth >= 2:
+                buffer += ch
+    return items
+
+
+def _extractor_parse(deltas: List[str]) -> List[Dict[str, Any]]:
+    extractor = JSONObjectExtractor()
+    items = []
+    for text in deltas:
+        items.extend(extractor.feed(text))
+    return items
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+
+    docs = [_make_document(rng, _REASONS) for _ in range(args.docs)]
+    legacy_ok = 0
+    for doc in docs:
+        deltas = _split_deltas(doc, rng, 16)
+        expected = json.loads(doc)["movies"]
+        assert _extractor_parse(deltas) == expected, doc
+        legacy_ok += _legacy_parse(deltas) == expected
+    print(f"correctness: extractor {len(docs)}/{len(docs)}, legacy {legacy_ok}/{len(docs)} documents")
+
+    clean = [r for r in _REASONS if '\\"' not in json.dumps(r)]
+    docs = [_make_document(rng, clean) for _ in range(args.docs)]
+    print(f"timing: {len(docs)} documents, avg {sum(map(len, docs)) // len(docs)} chars, 9 items each")
+    for max_size in (4, 16, 64, 256):
+        streams = [_split_deltas(doc, rng, max_size) for doc in docs]
+        results = {}
+        for name, fn in (("legacy", _legacy_parse), ("extractor", _extractor_parse)):
+            start = time.perf_counter()
+            for deltas in streams:
+                fn(deltas)
+            results[name] = (time.perf_counter() - start) / len(streams) * 1e6
+        print(
+            f"  deltas <= {max_size:>3} chars: legacy {results['legacy']:7.1f} us/doc, "
+            f"extractor {results['extractor']:7.1f} us/doc ({results['legacy'] / results['extractor']:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
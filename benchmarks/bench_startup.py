@@ -0,0 +1,83 @@
+"""
+Startup benchmark: how long `import app.main` takes in a fresh interpreter,
+which imports dominate it, and what the first AnthropicService costs.
+
+Each run starts a new Python process with -X importtime, so nothing is
+cached in sys.modules. It reports the median wall time, then the slowest
+top-level packages by cumulative import time in the last run. Afterwards,
+in this process, it times the warm-up the app's lifespan runs in the
+background and the per-request AnthropicService() constructor.
+
+Importing the app does not validate the environment, so no .env is needed.
+
+    python -m benchmarks.bench_startup [--runs 5] [--top 15]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+
+def _import_once() -> Tuple[float, str]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - started, result.stderr
+
+
+def _slowest_packages(importtime: str, top: int) -> List[Tuple[str, float]]:
+    """Cumulative import time (seconds) per top-level package, slowest first."""
+    totals: Dict[str, float] = {}
+    for line in importtime.splitlines():
+        # "import time:      self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only the outermost import of each package: nested ones are already in its cumulative time
+        if name.startswith("  "):
+            continue
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0.0) + int(cumulative) / 1e6
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    times = []
+    importtime = ""
+    for _ in range(args.runs):
+        elapsed, importtime = _import_once()
+        times.append(elapsed)
+    print(f"import app.main: median {statistics.median(times) * 1000:.0f} ms over {args.runs} runs "
+          f"(min {min(times) * 1000:.0f}, max {max(times) * 1000:.0f}; includes interpreter start)")
+    print(f"{'package':<24}{'cumulative ms':>14}")
+    for package, seconds in _slowest_packages(importtime, args.top):
+        print(f"{package:<24}{seconds * 1000:>14.1f}")
+
+    from app.services import anthropic_service
+
+    started = time.perf_counter()
+    state = anthropic_service.warm_up()
+    print(f"\nwarm-up: {(time.perf_counter() - started) * 1000:.0f} ms "
+          f"({state['schemas']} schemas, {state['prompts']} prompts, SDK import and client)")
+
+    rounds = 10_000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        anthropic_service.AnthropicService()
+    print(f"AnthropicService(): {(time.perf_counter() - started) / rounds * 1e6:.2f} us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+End-to-end load benchmark for the recommendation and providers endpoints.
+
+Starts the FastAPI app in-process against local stand-ins for Claude
+(recorded-stream replay), TMDB and Supabase/PostgREST, then drives concurrent
+user sessions: one streaming /api/recommendations/ request followed by
+/api/providers/ lookups for the returned cards, as the frontend does.
+
+Reports time-to-first-content-event, time-to-last-event, throughput,
+outbound calls per stand-in and event-loop lag of the app's loop, and writes
+everything as JSON so runs can be compared between commits:
+
+    python -m benchmarks.load --sessions 50 --concurrency 10 --out results/head.json
+    python -m benchmarks.load --sessions 50 --concurrency 10 --compare results/head.json
+
+The stand-ins share the process (on their own threads and loops) with the app,
+so absolute numbers include some GIL contention; compare runs on the same
+machine with the same flags.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.stubs import anthropic_stub, supabase_stub, tmdb_stub
+from benchmarks.stubs.server import ServerThread
+
+QUERIES = [
+    ("slow-burn heist movies with a twist", "movie"),
+    ("crime shows like The Wire", "show"),
+    ("tense cartel thrillers, movies or series", "both"),
+    ("90s neo-noir", "movie"),
+    ("binge-worthy crime dramas", "show"),
+    ("modern westerns", "both"),
+]
+REGIONS = ["US", "GB", "DE", "IN"]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p90": None, "p99": None, "max": None, "mean": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 2),
+        "mean": round(sum(ordered) / len(ordered), 2),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class LoopLagProbe:
+    """Measures how late a periodic timer fires on the app's event loop."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._running = False
+
+    async def run(self) -> None:
+        self._running = True
+        loop = asyncio.get_running_loop()
+        while self._running:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected) * 1000.0)
+
+    def stop(self) -> None:
+        self._running = False
+
+
+class Stats:
+    def __init__(self):
+        self.ttfe: List[float] = []  # ms to first content event
+        self.ttle: List[float] = []  # ms to last event (stream end)
+        self.items: List[int] = []
+        self.provider_latency: List[float] = []
+        self.errors: Counter = Counter()
+
+
+async def _recommendation(
+    client: httpx.AsyncClient, stats: Stats, query: str, content_type: str, client_ip: str
+) -> List[Dict[str, Any]]:
+    cards: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    first = None
+    try:
+        async with client.stream(
+            "POST",
+            "/api/recommendations/",
+            json={"query": query, "content_type": content_type},
+            headers={"X-Forwarded-For": client_ip},
+        ) as response:
+            if response.status_code != 200:
+                stats.errors[f"recommendations {response.status_code}"] += 1
+                return cards
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if event.get("type") == "content":
+                    if first is None:
+                        first = time.perf_counter()
+                    cards.append({"id": event["data"]["id"], "content_type": event["content_type"]})
+    except httpx.HTTPError as e:
+        stats.errors[f"recommendations {e.__class__.__name__}"] += 1
+        return cards
+    finished = time.perf_counter()
+    if first is not None:
+        stats.ttfe.append((first - started) * 1000.0)
+    stats.ttle.append((finished - started) * 1000.0)
+    stats.items.append(len(cards))
+    return cards
+
+
+async def _providers(client: httpx.AsyncClient, stats: Stats, card: Dict[str, Any], region: str) -> None:
+    started = time.perf_counter()
+    try:
+        response = await client.post(
+            "/api/providers/",
+            json={"content_id": card["id"], "content_type": card["content_type"], "region": region},
+        )
+    except httpx.HTTPError as e:
+        stats.errors[f"providers {e.__class__.__name__}"] += 1
+        return
+    if response.status_code != 200:
+        stats.errors[f"providers {response.status_code}"] += 1
+        return
+    stats.provider_latency.append((time.perf_counter() - started) * 1000.0)
+
+
+async def _drive(base_url: str, sessions: int, concurrency: int, providers_per_session: int, seed: int, stats: Stats) -> float:
+    rng = random.Random(seed)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def session(index: int) -> None:
+        query, content_type = QUERIES[index % len(QUERIES)]
+        region = rng.choice(REGIONS)
+        async with semaphore:
+            # Each session is its own client for admission control, as separate users would be;
+            # uvicorn trusts X-Forwarded-For from 127.0.0.1 by default
+            ip = f"10.0.{index // 256 % 256}.{index % 256}"
+            cards = await _recommendation(client, stats, query, content_type, ip)
+            await asyncio.gather(*(_providers(client, stats, card, region) for card in cards[:providers_per_session]))
+
+    limits = httpx.Limits(max_connections=concurrency * 4, max_keepalive_connections=concurrency * 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        return time.perf_counter() - started
+
+
+def _configure_environment(claude: ServerThread, tmdb: ServerThread, supabase: ServerThread) -> None:
+    """Point app.config at the stand-ins; must run before the app is imported."""
+    os.environ.update({
+        "ANTHROPIC_API_KEY": "stub",
+        "ANTHROPIC_BASE_URL": claude.url,
+        "TMDB_READ_ACCESS_TOKEN": "stub",
+        "TMDB_BASE_URL": tmdb.url,
+        "SUPABASE_URL": supabase.url,
+        "SUPABASE_KEY": supabase_stub.STUB_KEY,
+    })
+
+
+def _compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    rows = [
+        ("ttfe p50 ms", ("recommendations", "ttfe_ms", "p50")),
+        ("ttfe p99 ms", ("recommendations", "ttfe_ms", "p99")),
+        ("ttle p50 ms", ("recommendations", "ttle_ms", "p50")),
+        ("ttle p99 ms", ("recommendations", "ttle_ms", "p99")),
+        ("providers p50 ms", ("providers", "latency_ms", "p50")),
+        ("providers p99 ms", ("providers", "latency_ms", "p99")),
+        ("loop lag p99 ms", ("event_loop_lag_ms", "p99")),
+        ("loop lag max ms", ("event_loop_lag_ms", "max")),
+        ("sessions/s", ("throughput", "sessions_per_second")),
+    ]
+
+    def lookup(data: Dict[str, Any], path: tuple) -> Optional[float]:
+        value: Any = data
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        return value
+
+    print(f"\n{'metric':<18}{'baseline':>12}{'current':>12}{'change':>10}")
+    for label, path in rows:
+        old, new = lookup(baseline, path), lookup(current, path)
+        change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else "n/a"
+        print(f"{label:<18}{old if old is not None else '-':>12}{new if new is not None else '-':>12}{change:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark against local stand-ins")
+    parser.add_argument("--sessions", type=int, default=30, help="user sessions to run")
+    parser.add_argument("--concurrency", type=int, default=10, help="sessions in flight at once")
+    parser.add_argument("--providers-per-session", type=int, default=9)
+    parser.add_argument("--warmup", type=int, default=0, help="sessions run before measuring (warms the cache)")
+    parser.add_argument("--claude-tps", type=float, default=200.0, help="stand-in Claude tokens per second")
+    parser.add_argument("--claude-ttft", type=float, default=0.4, help="stand-in Claude time to first token (s)")
+    parser.add_argument("--tmdb-latency-ms", type=float, default=60.0)
+    parser.add_argument("--tmdb-429-rate", type=float, default=0.0)
+    parser.add_argument("--tmdb-miss-rate", type=float, default=0.05)
+    parser.add_argument("--supabase-latency-ms", type=float, default=25.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    claude_app = anthropic_stub.create_app(config=anthropic_stub.ReplayConfig(
+        tokens_per_second=args.claude_tps, first_token_delay=args.claude_ttft, jitter=args.jitter, seed=args.seed,
+    ))
+    tmdb_app = tmdb_stub.create_app(tmdb_stub.FaultConfig(
+        latency_ms=args.tmdb_latency_ms, jitter=args.jitter, rate_429=args.tmdb_429_rate,
+        miss_rate=args.tmdb_miss_rate, seed=args.seed,
+    ))
+    supabase_app = supabase_stub.create_app(supabase_stub.StubConfig(
+        latency_ms=args.supabase_latency_ms, jitter=args.jitter, seed=args.seed,
+    ))
+
+    claude = ServerThread(claude_app, args.base_port + 1).start()
+    tmdb = ServerThread(tmdb_app, args.base_port + 2).start()
+    supabase = ServerThread(supabase_app, args.base_port + 3).start()
+    _configure_environment(claude, tmdb, supabase)
+
+    from app.main import app
+
+    api = ServerThread(app, args.base_port).start()
+    try:
+        if args.warmup:
+            asyncio.run(_drive(api.url, args.warmup, args.concurrency, args.providers_per_session, args.seed, Stats()))
+
+        calls_before = {
+            "claude": claude_app.state.calls,
+            "tmdb": Counter(tmdb_app.state.calls),
+            "supabase": Counter(supabase_app.state.calls),
+        }
+        probe = LoopLagProbe()
+        assert api.loop is not None  # set by start()
+        probe_future = asyncio.run_coroutine_threadsafe(probe.run(), api.loop)
+
+        stats = Stats()
+        elapsed = asyncio.run(_drive(api.url, args.sessions, args.concurrency, args.providers_per_session, args.seed + 1, stats))
+
+        probe.stop()
+        probe_future.result(timeout=5)
+    finally:
+        api.stop()
+        for server in (claude, tmdb, supabase):
+            server.stop()
+
+    tmdb_calls = Counter(tmdb_app.state.calls)
+    tmdb_calls.subtract(calls_before["tmdb"])
+    supabase_calls = Counter(supabase_app.state.calls)
+    supabase_calls.subtract(calls_before["supabase"])
+
+    results = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": vars(args),
+        "recommendations": {
+            "ttfe_ms": _percentiles(stats.ttfe),
+            "ttle_ms": _percentiles(stats.ttle),
+            "items_per_request": _percentiles([float(n) for n in stats.items]),
+        },
+        "providers": {"latency_ms": _percentiles(stats.provider_latency)},
+        "throughput": {
+            "elapsed_s": round(elapsed, 3),
+            "sessions_per_second": round(len(stats.ttle) / elapsed, 3) if elapsed else None,
+            "requests_per_second": round((len(stats.ttle) + len(stats.provider_latency)) / elapsed, 3) if elapsed else None,
+        },
+        "outbound_calls": {
+            "claude": claude_app.state.calls - calls_before["claude"],
+            "tmdb": {k: v for k, v in sorted(tmdb_calls.items()) if v},
+            "supabase": {k: v for k, v in sorted(supabase_calls.items()) if v},
+        },
+        "event_loop_lag_ms": _percentiles(probe.samples),
+        "errors": dict(stats.errors),
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            _compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
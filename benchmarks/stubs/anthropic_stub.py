@@ -0,0 +1,161 @@
+"""
+Local stand-in for the Anthropic Messages streaming API.
+
+Replays JSONL fixtures captured with ANTHROPIC_RECORD_DIR (see
+app/services/stream_recorder.py) as server-sent events, including
+server_tool_use / web_search_tool_result blocks. Timing is either the recorded
+one or synthesized from a token rate, with optional jitter; a fixed seed makes
+runs reproducible.
+
+    python -m benchmarks.stubs.anthropic_stub --port 8101 --tokens-per-second 150 --jitter 0.2
+
+Then run the API with ANTHROPIC_BASE_URL=http://127.0.0.1:8101.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "fixtures", "claude")
+
+
+class Fixture(BaseModel):
+    name: str
+    meta: Dict[str, Any] = {}
+    events: List[Tuple[float, Dict[str, Any]]] = []
+
+    @property
+    def key(self) -> Tuple[bool, Tuple[str, ...]]:
+        return _request_key(self.meta.get("request", {}))
+
+
+class ReplayConfig(BaseModel):
+    tokens_per_second: Optional[float] = None  # None replays recorded timing
+    first_token_delay: float = 0.4  # seconds before message_start with a token rate
+    jitter: float = 0.0  # +/- fraction applied to every delay
+    speed: float = 1.0  # recorded-timing multiplier (2.0 = twice as fast)
+    seed: int = 0
+
+
+def _request_key(request: Dict[str, Any]) -> Tuple[bool, Tuple[str, ...]]:
+    """Fixtures are matched on whether tools are enabled and on the output schema's top-level keys."""
+    schema = request.get("output_config", {}).get("format", {}).get("schema", {})
+    return bool(request.get("tools")), tuple(sorted(schema.get("properties", {})))
+
+
+def load_fixture(path: str) -> Fixture:
+    fixture = Fixture(name=os.path.basename(path))
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "meta" in entry:
+                fixture.meta = entry["meta"]
+            else:
+                fixture.events.append((float(entry.get("t", 0.0)), entry["event"]))
+    return fixture
+
+
+def load_fixtures(directory: str) -> List[Fixture]:
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".jsonl")
+    )
+    if not paths:
+        raise FileNotFoundError(f"No .jsonl fixtures in {directory}")
+    return [load_fixture(path) for path in paths]
+
+
+def _approx_tokens(event: Dict[str, Any]) -> int:
+    delta = event.get("delta", {})
+    text = delta.get("text") or delta.get("partial_json") or ""
+    return max(1, round(len(text) / 4))
+
+
+async def replay(fixture: Fixture, config: ReplayConfig, rng: random.Random) -> AsyncGenerator[str, None]:
+    """Yield the fixture's events as SSE frames with recorded or synthesized pacing."""
+    previous_t = 0.0
+    for t, event in fixture.events:
+        if config.tokens_per_second:
+            if event["type"] == "message_start":
+                delay = config.first_token_delay
+            elif event["type"] == "content_block_delta":
+                delay = _approx_tokens(event) / config.tokens_per_second
+            elif event["type"] == "content_block_start" and event["content_block"]["type"] == "web_search_tool_result":
+                delay = max(0.0, t - previous_t)  # search latency is not token-bound
+            else:
+                delay = 0.0
+        else:
+            delay = max(0.0, t - previous_t) / config.speed
+        previous_t = t
+
+        if config.jitter:
+            delay *= 1.0 + rng.uniform(-config.jitter, config.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def create_app(fixtures_dir: str = DEFAULT_FIXTURES, config: Optional[ReplayConfig] = None) -> FastAPI:
+    config = config or ReplayConfig()
+    fixtures = load_fixtures(fixtures_dir)
+    rng = random.Random(config.seed)
+
+    # Round-robin within each (tools, schema) group, falling back to all fixtures
+    groups: Dict[Tuple[bool, Tuple[str, ...]], List[Fixture]] = {}
+    for fixture in fixtures:
+        groups.setdefault(fixture.key, []).append(fixture)
+    cycles = {key: itertools.cycle(group) for key, group in groups.items()}
+    any_cycle = itertools.cycle(fixtures)
+
+    app = FastAPI(title="Anthropic stand-in")
+    app.state.calls = 0
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        cycle = cycles.get(_request_key(body), any_cycle)
+        return StreamingResponse(replay(next(cycle), config, rng), media_type="text/event-stream")
+
+    @app.get("/__stats")
+    async def stats():
+        return {"calls": app.state.calls, "fixtures": [f.name for f in fixtures]}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Replay recorded Claude streams")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--first-token-delay", type=float, default=0.4)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = ReplayConfig(
+        tokens_per_second=args.tokens_per_second,
+        first_token_delay=args.first_token_delay,
+        jitter=args.jitter,
+        speed=args.speed,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(args.fixtures, config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Run ASGI stand-ins in background threads so benchmarks can start and stop them in-process."""
+
+import asyncio
+import threading
+import time
+from typing import Optional
+
+import uvicorn
+
+
+class ServerThread:
+    """A uvicorn server on its own thread and event loop."""
+
+    def __init__(self, app, port: int, host: str = "127.0.0.1"):
+        self.host = host
+        self.port = port
+        config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off")
+        self.server = uvicorn.Server(config)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread = threading.Thread(target=self._run, name=f"server-{port}", daemon=True)
+
+    def _run(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        # Keep a handle on the loop so callers can schedule probes onto it
+        self.loop = asyncio.get_running_loop()
+        await self.server.serve()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "ServerThread":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Server on port {self.port} failed to start")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=5.0)
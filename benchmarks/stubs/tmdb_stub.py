@@ -0,0 +1,239 @@
+"""
+Local stand-in for the TMDB v3 API.
+
+Serves /search/movie, /search/tv, /movie/{id}, /tv/{id} and their
+/watch/providers with deterministic synthetic payloads shaped like TMDB's.
+Latency, jitter, 429s and search misses are injected per FaultConfig; call
+counts per endpoint and status are exposed at /__stats.
+
+    python -m benchmarks.stubs.tmdb_stub --port 8102 --latency-ms 80 --rate-429 0.02
+
+Then run the API with TMDB_BASE_URL=http://127.0.0.1:8102.
+"""
+
+import argparse
+import asyncio
+import random
+import zlib
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+
+class FaultConfig(BaseModel):
+    latency_ms: float = 50.0
+    jitter: float = 0.3  # +/- fraction of latency_ms
+    rate_429: float = 0.0  # probability of answering 429 instead
+    retry_after: int = 1  # Retry-After seconds sent with 429s
+    miss_rate: float = 0.0  # fraction of search queries with no results (deterministic per title)
+    seed: int = 0
+
+
+def _stable_id(kind: str, query: str) -> int:
+    return zlib.crc32(f"{kind}:{query.casefold()}".encode()) % 900_000 + 1_000
+
+
+def _is_miss(kind: str, query: str, miss_rate: float) -> bool:
+    return miss_rate > 0 and (zlib.crc32(f"miss:{kind}:{query.casefold()}".encode()) % 10_000) < miss_rate * 10_000
+
+
+def _movie(movie_id: int, title: str, year: int) -> Dict[str, Any]:
+    return {
+        "id": movie_id,
+        "imdb_id": f"tt{movie_id:07d}",
+        "title": title,
+        "original_title": title,
+        "original_language": "en",
+        "overview": f"{title} is a synthetic film used for load testing. " * 4,
+        "tagline": "Nothing is what it seems.",
+        "status": "Released",
+        "release_date": f"{year}-06-15",
+        "adult": False,
+        "budget": 40_000_000,
+        "revenue": 120_000_000,
+        "runtime": 118,
+        "vote_average": 7.4,
+        "vote_count": 5321,
+        "popularity": 42.7,
+        "video": False,
+        "poster_path": f"/poster{movie_id}.jpg",
+        "backdrop_path": f"/backdrop{movie_id}.jpg",
+        "homepage": "",
+        "belongs_to_collection": None,
+        "genres": [{"id": 80, "name": "Crime"}, {"id": 53, "name": "Thriller"}],
+        "production_companies": [{"id": 4, "logo_path": "/logo4.png", "name": "Stub Pictures", "origin_country": "US"}],
+        "production_countries": [{"iso_3166_1": "US", "name": "United States of America"}],
+        "spoken_languages": [{"english_name": "English", "iso_639_1": "en", "name": "English"}],
+        "origin_country": ["US"],
+    }
+
+
+def _episode(show_id: int, season: int, number: int) -> Dict[str, Any]:
+    return {
+        "id": show_id * 1000 + season * 100 + number,
+        "name": f"Episode {number}",
+        "overview": "A synthetic episode overview. " * 3,
+        "vote_average": 8.1,
+        "vote_count": 120,
+        "air_date": "2020-01-01",
+        "episode_number": number,
+        "episode_type": "standard",
+        "production_code": "",
+        "runtime": 52,
+        "season_number": season,
+        "show_id": show_id,
+        "still_path": f"/still{show_id}{season}{number}.jpg",
+    }
+
+
+def _show(show_id: int, name: str, year: int) -> Dict[str, Any]:
+    seasons = 5
+    return {
+        "id": show_id,
+        "name": name,
+        "original_name": name,
+        "original_language": "en",
+        "overview": f"{name} is a synthetic series used for load testing. " * 4,
+        "tagline": "Every season raises the stakes.",
+        "status": "Ended",
+        "first_air_date": f"{year}-01-20",
+        "last_air_date": f"{year + seasons - 1}-11-02",
+        "number_of_seasons": seasons,
+        "number_of_episodes": seasons * 10,
+        "episode_run_time": [52],
+        "adult": False,
+        "vote_average": 8.3,
+        "vote_count": 8120,
+        "popularity": 61.2,
+        "poster_path": f"/poster{show_id}.jpg",
+        "backdrop_path": f"/backdrop{show_id}.jpg",
+        "homepage": "",
+        "genres": [{"id": 80, "name": "Crime"}, {"id": 18, "name": "Drama"}],
+        "production_companies": [{"id": 7, "logo_path": None, "name": "Stub Television", "origin_country": "US"}],
+        "production_countries": [{"iso_3166_1": "US", "name": "United States of America"}],
+        "spoken_languages": [{"english_name": "English", "iso_639_1": "en", "name": "English"}],
+        "networks": [{"id": 49, "logo_path": "/net49.png", "name": "Stub Network", "origin_country": "US"}],
+        "created_by": [{"id": 66633, "credit_id": "52542286760ee31328001a7b", "name": "Stub Creator", "profile_path": None}],
+        "origin_country": ["US"],
+        "languages": ["en"],
+        "seasons": [
+            {
+                "air_date": f"{year + s - 1}-01-20",
+                "episode_count": 10,
+                "id": show_id * 10 + s,
+                "name": f"Season {s}",
+                "overview": "A synthetic season overview. " * 6,
+                "poster_path": f"/season{show_id}{s}.jpg",
+                "season_number": s,
+                "vote_average": 8.0,
+            }
+            for s in range(1, seasons + 1)
+        ],
+        "last_episode_to_air": _episode(show_id, seasons, 10),
+        "next_episode_to_air": None,
+        "in_production": False,
+        "type": "Scripted",
+    }
+
+
+def _providers(content_id: int) -> Dict[str, Any]:
+    entry = {
+        "link": f"https://www.themoviedb.org/movie/{content_id}/watch",
+        "flatrate": [{"logo_path": "/nflx.jpg", "provider_id": 8, "provider_name": "Netflix", "display_priority": 1}],
+        "rent": [{"logo_path": "/appl.jpg", "provider_id": 2, "provider_name": "Apple TV", "display_priority": 4}],
+    }
+    return {"id": content_id, "results": {region: entry for region in ("US", "GB", "DE", "FR", "IN", "CA")}}
+
+
+def create_app(config: Optional[FaultConfig] = None) -> FastAPI:
+    config = config or FaultConfig()
+    rng = random.Random(config.seed)
+    titles: Dict[Tuple[str, int], Tuple[str, int]] = {}
+
+    app = FastAPI(title="TMDB stand-in")
+    app.state.calls = Counter()
+
+    async def inject(endpoint: str) -> Optional[JSONResponse]:
+        delay = config.latency_ms / 1000.0 * (1.0 + rng.uniform(-config.jitter, config.jitter))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if config.rate_429 and rng.random() < config.rate_429:
+            app.state.calls[f"{endpoint} 429"] += 1
+            return JSONResponse(
+                {"status_code": 25, "status_message": "Your request count is over the allowed limit."},
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        app.state.calls[f"{endpoint} 200"] += 1
+        return None
+
+    def search(kind: str, query: str, year: Optional[int]) -> Dict[str, Any]:
+        if _is_miss(kind, query, config.miss_rate):
+            return {"page": 1, "results": [], "total_results": 0}
+        content_id = _stable_id(kind, query)
+        titles[(kind, content_id)] = (query, year or 2000)
+        key = "title" if kind == "movie" else "name"
+        date_key = "release_date" if kind == "movie" else "first_air_date"
+        return {"page": 1, "results": [{"id": content_id, key: query, date_key: f"{year or 2000}-01-01"}], "total_results": 1}
+
+    @app.get("/search/movie")
+    async def search_movie(query: str, year: Optional[int] = None):
+        return await inject("/search/movie") or search("movie", query, year)
+
+    @app.get("/search/tv")
+    async def search_tv(query: str, first_air_date_year: Optional[int] = None):
+        return await inject("/search/tv") or search("tv", query, first_air_date_year)
+
+    @app.get("/movie/{movie_id}")
+    async def movie_details(movie_id: int):
+        title, year = titles.get(("movie", movie_id), (f"Movie {movie_id}", 2000))
+        return await inject("/movie/{id}") or _movie(movie_id, title, year)
+
+    @app.get("/tv/{show_id}")
+    async def show_details(show_id: int):
+        name, year = titles.get(("tv", show_id), (f"Show {show_id}", 2000))
+        return await inject("/tv/{id}") or _show(show_id, name, year)
+
+    @app.get("/movie/{movie_id}/watch/providers")
+    async def movie_providers(movie_id: int):
+        return await inject("/movie/{id}/watch/providers") or _providers(movie_id)
+
+    @app.get("/tv/{show_id}/watch/providers")
+    async def show_providers(show_id: int):
+        return await inject("/tv/{id}/watch/providers") or _providers(show_id)
+
+    @app.get("/__stats")
+    async def stats(request: Request):
+        return dict(app.state.calls)
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Synthetic TMDB API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--miss-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FaultConfig(
+        latency_ms=args.latency_ms,
+        jitter=args.jitter,
+        rate_429=args.rate_429,
+        miss_rate=args.miss_rate,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
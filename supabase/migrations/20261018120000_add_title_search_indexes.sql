@@ -0,0 +1,92 @@
+-- Normalized-title lookups with a trigram fallback.
+-- Cache lookups used to compare the raw title with "=", so Claude's case and
+-- punctuation variants ("Spider-Man: Into the Spider-Verse" vs "Spider-Man Into
+-- The Spider-Verse") missed the cache and went back to TMDB.
+
+CREATE SCHEMA IF NOT EXISTS extensions;
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA extensions;
+
+-- Must match app/titles.py:normalize_title
+CREATE OR REPLACE FUNCTION pikflix.normalize_title(title text)
+RETURNS text
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+AS $$
+  SELECT btrim(regexp_replace(replace(lower(title), '&', ' and '), '[^a-z0-9]+', ' ', 'g'))
+$$;
+
+-- 1. Generated normalized title and release year
+ALTER TABLE pikflix.movies
+  ADD COLUMN IF NOT EXISTS title_norm text GENERATED ALWAYS AS (pikflix.normalize_title(title)) STORED,
+  ADD COLUMN IF NOT EXISTS year smallint GENERATED ALWAYS AS (extract(year FROM release_date)::smallint) STORED;
+
+ALTER TABLE pikflix.shows
+  ADD COLUMN IF NOT EXISTS title_norm text GENERATED ALWAYS AS (pikflix.normalize_title(name)) STORED,
+  ADD COLUMN IF NOT EXISTS year smallint GENERATED ALWAYS AS (extract(year FROM first_air_date)::smallint) STORED;
+
+-- 2. Exact lookups: (title_norm, year), with id and last_updated in the index
+-- so the freshness check can be answered from the index alone
+CREATE INDEX IF NOT EXISTS movies_title_norm_year_idx ON pikflix.movies USING btree (title_norm, year) INCLUDE (id, last_updated);
+CREATE INDEX IF NOT EXISTS shows_title_norm_year_idx ON pikflix.shows USING btree (title_norm, year) INCLUDE (id, last_updated);
+
+-- 3. Fuzzy fallback
+CREATE INDEX IF NOT EXISTS movies_title_norm_trgm_idx ON pikflix.movies USING gin (title_norm extensions.gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS shows_title_norm_trgm_idx ON pikflix.shows USING gin (title_norm extensions.gin_trgm_ops);
+
+-- The raw-title indexes are no longer used by any lookup
+DROP INDEX IF EXISTS pikflix.movies_title_idx;
+DROP INDEX IF EXISTS pikflix.shows_name_idx;
+
+-- 4. Batched lookup: for each (title, year) key, the most popular exact
+-- normalized match, or else the most similar title at or above threshold.
+-- key_index is the 1-based position of the key; keys without a match return no row.
+-- The trigram index is used through "%", so thresholds below
+-- pg_trgm.similarity_threshold (0.3 by default) behave as that value.
+CREATE OR REPLACE FUNCTION pikflix.match_movies(titles text[], years integer[], threshold real DEFAULT 0.6)
+RETURNS TABLE (key_index bigint, score real, item jsonb)
+LANGUAGE sql STABLE
+SET search_path = pikflix, extensions, public
+AS $$
+  SELECT k.idx, m.score, m.item
+  FROM unnest(titles, years) WITH ORDINALITY AS k(title, year, idx)
+  CROSS JOIN LATERAL (
+    (SELECT 1.0::real AS score, to_jsonb(t) - 'title_norm' - 'year' AS item
+     FROM pikflix.movies t
+     WHERE t.title_norm = normalize_title(k.title) AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY t.popularity DESC NULLS LAST
+     LIMIT 1)
+    UNION ALL
+    (SELECT similarity(t.title_norm, normalize_title(k.title)), to_jsonb(t) - 'title_norm' - 'year'
+     FROM pikflix.movies t
+     WHERE t.title_norm % normalize_title(k.title)
+       AND similarity(t.title_norm, normalize_title(k.title)) >= threshold
+       AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY similarity(t.title_norm, normalize_title(k.title)) DESC, t.popularity DESC NULLS LAST
+     LIMIT 1)
+    LIMIT 1
+  ) m
+$$;
+
+CREATE OR REPLACE FUNCTION pikflix.match_shows(titles text[], years integer[], threshold real DEFAULT 0.6)
+RETURNS TABLE (key_index bigint, score real, item jsonb)
+LANGUAGE sql STABLE
+SET search_path = pikflix, extensions, public
+AS $$
+  SELECT k.idx, m.score, m.item
+  FROM unnest(titles, years) WITH ORDINALITY AS k(title, year, idx)
+  CROSS JOIN LATERAL (
+    (SELECT 1.0::real AS score, to_jsonb(t) - 'title_norm' - 'year' AS item
+     FROM pikflix.shows t
+     WHERE t.title_norm = normalize_title(k.title) AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY t.popularity DESC NULLS LAST
+     LIMIT 1)
+    UNION ALL
+    (SELECT similarity(t.title_norm, normalize_title(k.title)), to_jsonb(t) - 'title_norm' - 'year'
+     FROM pikflix.shows t
+     WHERE t.title_norm % normalize_title(k.title)
+       AND similarity(t.title_norm, normalize_title(k.title)) >= threshold
+       AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY similarity(t.title_norm, normalize_title(k.title)) DESC, t.popularity DESC NULLS LAST
+     LIMIT 1)
+    LIMIT 1
+  ) m
+$$;
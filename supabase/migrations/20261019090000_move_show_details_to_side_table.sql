@@ -0,0 +1,33 @@
+-- Move per-season and episode data out of pikflix.shows.
+-- seasons, last_episode_to_air and next_episode_to_air were most of a show
+-- row's size, and every cache lookup read them for a card that never shows
+-- them. They now live in pikflix.show_details, read only by
+-- GET /api/shows/{id}/details.
+
+-- 1. Side table, one row per show. No foreign key: the show row and its
+-- details are written separately and either write may be deferred while
+-- storage is unavailable.
+CREATE TABLE IF NOT EXISTS pikflix.show_details (
+  id integer NOT NULL,
+  seasons jsonb NULL,
+  last_episode_to_air jsonb NULL,
+  next_episode_to_air jsonb NULL,
+  last_updated timestamp with time zone NULL DEFAULT CURRENT_TIMESTAMP,
+  CONSTRAINT show_details_pkey PRIMARY KEY (id)
+) TABLESPACE pg_default;
+
+-- 2. Copy what the shows rows already hold
+INSERT INTO pikflix.show_details (id, seasons, last_episode_to_air, next_episode_to_air, last_updated)
+SELECT id, seasons, last_episode_to_air, next_episode_to_air, last_updated
+FROM pikflix.shows
+WHERE seasons IS NOT NULL OR last_episode_to_air IS NOT NULL OR next_episode_to_air IS NOT NULL
+ON CONFLICT (id) DO NOTHING;
+
+-- 3. Drop the columns from the hot row. match_shows returns to_jsonb(t), so
+-- cache lookups stop carrying them from here on. The space is reclaimed as
+-- rows are rewritten; run VACUUM FULL pikflix.shows in a quiet window to
+-- reclaim it at once.
+ALTER TABLE pikflix.shows
+  DROP COLUMN IF EXISTS seasons,
+  DROP COLUMN IF EXISTS last_episode_to_air,
+  DROP COLUMN IF EXISTS next_episode_to_air;
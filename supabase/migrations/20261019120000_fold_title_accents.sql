@@ -0,0 +1,79 @@
+-- Unicode-aware title normalization.
+-- pikflix.normalize_title kept only ASCII letters and digits, so "Amélie"
+-- became "am lie" and titles in non-Latin scripts became "". Every such
+-- title from the same year then shared one exact-match key. Accents are now
+-- folded with unaccent and letters of every script are kept.
+
+CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA extensions;
+
+-- Must match app/titles.py:normalize_title. The dictionary is named
+-- explicitly so the function stays IMMUTABLE (and usable in generated
+-- columns) whatever the caller's search_path.
+CREATE OR REPLACE FUNCTION pikflix.normalize_title(title text)
+RETURNS text
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+AS $$
+  SELECT btrim(regexp_replace(
+    extensions.unaccent('extensions.unaccent'::regdictionary, replace(lower(title), '&', ' and ')),
+    '[^[:alnum:]]+', ' ', 'g'
+  ))
+$$;
+
+-- 1. Recompute the stored title_norm columns: a stored generated column is
+-- only recomputed when its row is written
+UPDATE pikflix.movies SET title = title;
+UPDATE pikflix.shows SET name = name;
+
+-- 2. A title that normalizes to "" has no exact key; it can still match
+-- through the trigram fallback, where "" is never similar to anything
+CREATE OR REPLACE FUNCTION pikflix.match_movies(titles text[], years integer[], threshold real DEFAULT 0.6)
+RETURNS TABLE (key_index bigint, score real, item jsonb)
+LANGUAGE sql STABLE
+SET search_path = pikflix, extensions, public
+AS $$
+  SELECT k.idx, m.score, m.item
+  FROM unnest(titles, years) WITH ORDINALITY AS k(title, year, idx)
+  CROSS JOIN LATERAL (
+    (SELECT 1.0::real AS score, to_jsonb(t) - 'title_norm' - 'year' AS item
+     FROM pikflix.movies t
+     WHERE t.title_norm = normalize_title(k.title) AND normalize_title(k.title) <> ''
+       AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY t.popularity DESC NULLS LAST
+     LIMIT 1)
+    UNION ALL
+    (SELECT similarity(t.title_norm, normalize_title(k.title)), to_jsonb(t) - 'title_norm' - 'year'
+     FROM pikflix.movies t
+     WHERE t.title_norm % normalize_title(k.title)
+       AND similarity(t.title_norm, normalize_title(k.title)) >= threshold
+       AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY similarity(t.title_norm, normalize_title(k.title)) DESC, t.popularity DESC NULLS LAST
+     LIMIT 1)
+    LIMIT 1
+  ) m
+$$;
+
+CREATE OR REPLACE FUNCTION pikflix.match_shows(titles text[], years integer[], threshold real DEFAULT 0.6)
+RETURNS TABLE (key_index bigint, score real, item jsonb)
+LANGUAGE sql STABLE
+SET search_path = pikflix, extensions, public
+AS $$
+  SELECT k.idx, m.score, m.item
+  FROM unnest(titles, years) WITH ORDINALITY AS k(title, year, idx)
+  CROSS JOIN LATERAL (
+    (SELECT 1.0::real AS score, to_jsonb(t) - 'title_norm' - 'year' AS item
+     FROM pikflix.shows t
+     WHERE t.title_norm = normalize_title(k.title) AND normalize_title(k.title) <> ''
+       AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY t.popularity DESC NULLS LAST
+     LIMIT 1)
+    UNION ALL
+    (SELECT similarity(t.title_norm, normalize_title(k.title)), to_jsonb(t) - 'title_norm' - 'year'
+     FROM pikflix.shows t
+     WHERE t.title_norm % normalize_title(k.title)
+       AND similarity(t.title_norm, normalize_title(k.title)) >= threshold
+       AND (k.year IS NULL OR t.year = k.year)
+     ORDER BY similarity(t.title_norm, normalize_title(k.title)) DESC, t.popularity DESC NULLS LAST
+     LIMIT 1)
+    LIMIT 1
+  ) m
+$$;
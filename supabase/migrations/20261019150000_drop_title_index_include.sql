@@ -0,0 +1,13 @@
+-- Exact title lookups without the INCLUDE columns.
+-- The (title_norm, year) indexes carried INCLUDE (id, last_updated) so the
+-- freshness check could be answered from the index alone. No lookup reads
+-- only those columns: match_movies and match_shows return the whole row
+-- (to_jsonb(t)), because callers use the match as the content row itself.
+-- Every match therefore visits the heap, and the included columns only made
+-- the indexes larger and every write to them more expensive.
+
+DROP INDEX IF EXISTS pikflix.movies_title_norm_year_idx;
+DROP INDEX IF EXISTS pikflix.shows_title_norm_year_idx;
+
+CREATE INDEX movies_title_norm_year_idx ON pikflix.movies USING btree (title_norm, year);
+CREATE INDEX shows_title_norm_year_idx ON pikflix.shows USING btree (title_norm, year);
@@ -0,0 +1,47 @@
+import socket
+
+import pytest
+
+from benchmarks.stubs import supabase_stub
+from benchmarks.stubs.server import ServerThread
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def serve():
+    """Start ASGI apps on free ports: serve(app) returns the running ServerThread. All are stopped afterwards."""
+    servers = []
+
+    def start(app) -> ServerThread:
+        server = ServerThread(app, _free_port()).start()
+        servers.append(server)
+        return server
+
+    try:
+        yield start
+    finally:
+        for server in servers:
+            server.stop()
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    """The PostgREST stand-in on a free port, with the postgrest backend pointed at it."""
+    app = supabase_stub.create_app(supabase_stub.StubConfig(latency_ms=0))
+    server = ServerThread(app, _free_port()).start()
+    monkeypatch.setattr("app.services.storage.postgrest.SUPABASE_URL", server.url)
+    monkeypatch.setattr("app.services.storage.postgrest.SUPABASE_KEY", supabase_stub.STUB_KEY)
+    try:
+        yield app
+    finally:
+        server.stop()
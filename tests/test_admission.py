@@ -0,0 +1,163 @@
+"""AdmissionController: per-client limits, the bounded queue, round-robin dispatch and waiters giving up."""
+
+import asyncio
+from typing import List
+
+import pytest
+from starlette.requests import Request
+
+from app.api.endpoints.recommendations import _client_key
+from app.services.admission import AdmissionController, AdmissionRejected, Ticket
+
+pytestmark = pytest.mark.anyio
+
+
+def _controller(max_concurrent: int = 1, max_queue: int = 8, max_wait: float = 5.0, max_per_client: int = 4) -> AdmissionController:
+    return AdmissionController("test", max_concurrent, max_queue, max_wait, max_per_client)
+
+
+async def _queue(controller: AdmissionController, client: str) -> "asyncio.Task[Ticket]":
+    """Start admit() for `client` and let it take its place in the queue."""
+    task = asyncio.create_task(controller.admit(client))
+    await asyncio.sleep(0)
+    assert not task.done()
+    return task
+
+
+def _assert_idle(controller: AdmissionController) -> None:
+    assert controller._active == 0
+    assert controller._queued == 0
+    assert controller._per_client == {}
+    assert not controller._queues
+
+
+async def test_free_slot_is_granted_at_once():
+    controller = _controller(max_concurrent=2)
+    first = await controller.admit("ip:a")
+    second = await controller.admit("ip:b")
+    assert controller._active == 2
+
+    first.release()
+    first.release()  # idempotent
+    second.release()
+    _assert_idle(controller)
+
+
+async def test_client_limit():
+    controller = _controller(max_concurrent=4, max_per_client=1)
+    ticket = await controller.admit("ip:a")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.admit("ip:a")
+    assert rejected.value.reason == "client_limit"
+    assert 1 <= rejected.value.retry_after <= 30
+
+    # Other clients are unaffected, and the client's share comes back on release
+    (await controller.admit("ip:b")).release()
+    ticket.release()
+    (await controller.admit("ip:a")).release()
+    _assert_idle(controller)
+
+
+async def test_queue_full():
+    controller = _controller(max_concurrent=1, max_queue=1)
+    ticket = await controller.admit("ip:a")
+    waiter = await _queue(controller, "ip:b")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.admit("ip:c")
+    assert rejected.value.reason == "queue_full"
+
+    ticket.release()
+    (await waiter).release()
+    _assert_idle(controller)
+
+
+async def test_queue_timeout():
+    controller = _controller(max_concurrent=1, max_wait=0.01)
+    ticket = await controller.admit("ip:a")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.admit("ip:b")
+    assert rejected.value.reason == "queue_timeout"
+    # The place in the queue was given up with the wait
+    assert controller._queued == 0
+    assert controller._per_client == {"ip:a": 1}
+
+    ticket.release()
+    _assert_idle(controller)
+
+
+async def test_queues_are_served_round_robin_by_client():
+    controller = _controller(max_concurrent=1)
+    holder = await controller.admit("ip:x")
+    waiters = {
+        "a1": await _queue(controller, "ip:a"),
+        "a2": await _queue(controller, "ip:a"),
+        "a3": await _queue(controller, "ip:a"),
+        "b1": await _queue(controller, "ip:b"),
+    }
+
+    order: List[str] = []
+    ticket = holder
+    while len(order) < len(waiters):
+        ticket.release()
+        pending = [task for name, task in waiters.items() if name not in order]
+        await asyncio.wait(pending, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+        done = [name for name, task in waiters.items() if task.done() and name not in order]
+        assert len(done) == 1
+        order.append(done[0])
+        ticket = waiters[done[0]].result()
+    ticket.release()
+
+    # b's one request does not wait behind all of a's burst
+    assert order == ["a1", "b1", "a2", "a3"]
+    _assert_idle(controller)
+
+
+async def test_cancelled_waiter_gives_up_its_place():
+    controller = _controller(max_concurrent=1)
+    ticket = await controller.admit("ip:a")
+    waiter = await _queue(controller, "ip:b")
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert controller._queued == 0
+
+    ticket.release()
+    _assert_idle(controller)
+
+
+async def test_slot_granted_as_the_waiter_gives_up_is_passed_on():
+    controller = _controller(max_concurrent=1)
+    ticket = await controller.admit("ip:a")
+    gives_up = await _queue(controller, "ip:b")
+    next_in_line = await _queue(controller, "ip:c")
+
+    # The cancellation lands first, then the release hands the slot to the
+    # waiter before it runs again: it must give the slot back, not leak it
+    gives_up.cancel()
+    ticket.release()
+    with pytest.raises(asyncio.CancelledError):
+        await gives_up
+
+    granted = await asyncio.wait_for(next_in_line, 1)
+    assert granted.client == "ip:c"
+    assert controller._active == 1
+    assert controller._per_client == {"ip:c": 1}
+
+    granted.release()
+    _assert_idle(controller)
+
+
+def test_client_key_ignores_client_chosen_ids():
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/recommendations/",
+        "headers": [(b"x-session-id", b"abc")],
+        "query_string": b"session_id=abc",
+        "client": ("203.0.113.7", 50000),
+    }
+    assert _client_key(Request(scope)) == "ip:203.0.113.7"
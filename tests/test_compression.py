@@ -0,0 +1,152 @@
+"""CompressionMiddleware: encoding negotiation, what is left uncompressed, and the headers of what is not."""
+
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from app import compression
+from app.compression import CompressionMiddleware, negotiate
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"title": "Heat", "year": 1995}\n' * 40
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    # negotiate() only asks whether brotli is available
+    monkeypatch.setattr(compression, "brotli", object())
+
+
+def test_negotiate_prefers_brotli_on_a_tie(with_brotli):
+    assert negotiate("gzip, deflate, br") == "br"
+    assert negotiate("*") == "br"
+
+
+def test_negotiate_follows_q_values(with_brotli):
+    assert negotiate("br;q=0.5, gzip;q=0.8") == "gzip"
+    assert negotiate("br;q=0.9, gzip;q=0.8") == "br"
+    assert negotiate("gzip;q=0, *;q=0.3") == "br"
+
+
+def test_negotiate_refuses_what_the_client_excludes(with_brotli):
+    assert negotiate("br;q=0, gzip;q=0") is None
+    assert negotiate("identity") is None
+    assert negotiate("*;q=0") is None
+    # An unparseable weight counts as q=0
+    assert negotiate("br;q=x, gzip") == "gzip"
+
+
+def test_negotiate_without_brotli(gzip_only):
+    assert negotiate("br") is None
+    assert negotiate("br, gzip;q=0.1") == "gzip"
+
+
+def _app(status: int, headers: List[Tuple[bytes, bytes]], chunks: List[bytes]):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+    return app
+
+
+async def _call(app, accept_encoding: Optional[str] = "gzip", minimum_size: int = 500) -> List[Dict[str, Any]]:
+    sent: List[Dict[str, Any]] = []
+
+    async def send(message):
+        sent.append(message)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding else []
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": headers}
+    await CompressionMiddleware(app, minimum_size=minimum_size)(scope, receive, send)
+    return sent
+
+
+def _headers(start: Dict[str, Any]) -> Dict[bytes, bytes]:
+    return {k.lower(): v for k, v in start["headers"]}
+
+
+def _json_headers(**extra: bytes) -> List[Tuple[bytes, bytes]]:
+    headers = [(b"content-type", b"application/json")]
+    headers.extend((name.replace("_", "-").encode(), value) for name, value in extra.items())
+    return headers
+
+
+async def test_single_body_is_gzipped(gzip_only):
+    sent = await _call(_app(200, _json_headers(content_length=str(len(BODY)).encode()), [BODY]))
+    start, body = sent
+    headers = _headers(start)
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert int(headers[b"content-length"]) == len(body["body"]) < len(BODY)
+    assert zlib.decompress(body["body"], 31) == BODY
+
+
+async def test_small_body_passes_through(gzip_only):
+    sent = await _call(_app(200, _json_headers(etag=b'"v1"'), [b'{"results": {}}']))
+    start, body = sent
+    headers = _headers(start)
+    assert b"content-encoding" not in headers
+    assert headers[b"etag"] == b'"v1"'
+    assert body["body"] == b'{"results": {}}'
+
+
+async def test_without_accept_encoding_nothing_is_compressed(gzip_only):
+    sent = await _call(_app(200, _json_headers(), [BODY]), accept_encoding=None)
+    assert b"content-encoding" not in _headers(sent[0])
+    assert sent[1]["body"] == BODY
+
+
+@pytest.mark.parametrize("status", [204, 304])
+async def test_bodyless_statuses_pass_through(gzip_only, status):
+    headers = _json_headers(etag=b'"v1"', cache_control=b"public, max-age=3600")
+    sent = await _call(_app(status, headers, [b""]), minimum_size=0)
+    start, body = sent
+    assert start["status"] == status
+    assert start["headers"] == headers
+    assert body["body"] == b""
+
+
+async def test_other_content_types_pass_through(gzip_only):
+    sent = await _call(_app(200, [(b"content-type", b"image/png")], [BODY]))
+    assert b"content-encoding" not in _headers(sent[0])
+    assert sent[1]["body"] == BODY
+
+
+async def test_strong_etag_becomes_weak(gzip_only):
+    sent = await _call(_app(200, _json_headers(etag=b'"v1"'), [BODY]))
+    assert _headers(sent[0])[b"etag"] == b'W/"v1"'
+
+    sent = await _call(_app(200, _json_headers(etag=b'W/"v1"'), [BODY]))
+    assert _headers(sent[0])[b"etag"] == b'W/"v1"'
+
+
+async def test_existing_vary_is_extended(gzip_only):
+    sent = await _call(_app(200, _json_headers(vary=b"Origin"), [BODY]))
+    assert _headers(sent[0])[b"vary"] == b"Origin, Accept-Encoding"
+
+
+async def test_stream_is_flushed_per_chunk(gzip_only):
+    events = [b'{"event": %d, "title": "Heat"}\n' % i for i in range(5)]
+    sent = await _call(_app(200, [(b"content-type", b"application/x-ndjson")], events + [b""]))
+    start, *bodies = sent
+    headers = _headers(start)
+    assert headers[b"content-encoding"] == b"gzip"
+    assert b"content-length" not in headers
+
+    # Every chunk decodes to its event as soon as it arrives
+    decoder = zlib.decompressobj(31)
+    for event, message in zip(events, bodies):
+        assert message["more_body"] is True
+        assert decoder.decompress(message["body"]) == event
+    assert decoder.decompress(bodies[-1]["body"]) == b""
+    assert decoder.eof
@@ -0,0 +1,179 @@
+"""GuardedBackend: the breaker opening on storage errors, spilling writes, and replaying them once it closes."""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+from app.models import ContentType
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.storage.base import StorageBackend
+from app.services.storage.guarded import GuardedBackend
+from app.services.storage.postgrest import PostgRESTBackend
+
+pytestmark = pytest.mark.anyio
+
+
+class Rejected(Exception):
+    """Storage refused the call itself, e.g. a constraint violation."""
+
+
+class FlakyBackend(StorageBackend):
+    """Stores rows in memory; raises `failure` from every call while it is set."""
+
+    def __init__(self):
+        self.failure: Optional[Exception] = None
+        self.content: Dict[int, Dict[str, Any]] = {}
+        self.providers: List[Dict[str, Any]] = []
+        self.calls = 0
+
+    async def _call(self) -> None:
+        self.calls += 1
+        if self.failure is not None:
+            raise self.failure
+
+    async def find_content(self, content_type, keys, threshold):
+        await self._call()
+        return [None] * len(keys)
+
+    async def get_content_by_ids(self, content_type, ids):
+        await self._call()
+        return {i: self.content[i] for i in ids if i in self.content}
+
+    async def scan_titles(self, content_type, after_id, limit):
+        return []
+
+    async def upsert_content(self, content_type, rows):
+        await self._call()
+        self.content.update({row["id"]: row for row in rows})
+
+    async def get_show_details(self, ids):
+        await self._call()
+        return {}
+
+    async def upsert_show_details(self, rows):
+        await self._call()
+
+    async def get_providers(self, content_id, content_type):
+        await self._call()
+        return None
+
+    async def get_providers_updated(self, content_id, content_type):
+        await self._call()
+        return None
+
+    async def upsert_providers(self, row):
+        await self._call()
+        self.providers.append(row)
+
+
+def _guarded(backend: FlakyBackend) -> GuardedBackend:
+    breaker = CircuitBreaker("test", window=4, min_calls=4, open_seconds=0.0, probes=2)
+    return GuardedBackend(backend, breaker, spill_rows=100)
+
+
+async def _settle(condition, timeout: float = 1.0) -> None:
+    """Wait for background work (the replay) to make `condition` true."""
+    async def wait():
+        while not condition():
+            await asyncio.sleep(0.005)
+    await asyncio.wait_for(wait(), timeout)
+
+
+async def test_open_spill_half_open_replay():
+    backend = FlakyBackend()
+    guarded = _guarded(backend)
+
+    # Storage goes down: writes fail, are spilled and open the breaker
+    backend.failure = ConnectionError("storage unreachable")
+    for i in range(4):
+        with pytest.raises(ConnectionError):
+            await guarded.upsert_content(ContentType.MOVIE, [{"id": i, "title": f"movie {i}"}])
+    assert guarded.breaker.state == OPEN
+    assert len(guarded.spill) == 4
+    # A read while storage is failing is a miss, not an error
+    assert await guarded.get_content_by_ids(ContentType.MOVIE, [1]) == {}
+
+    # Storage recovers. Probes go through half-open, then the breaker closes and replays the spill
+    backend.failure = None
+    await guarded.upsert_providers({"content_id": 7, "content_type": "movie", "results": {}})
+    assert guarded.breaker.state == HALF_OPEN
+    await guarded.upsert_content(ContentType.MOVIE, [{"id": 4, "title": "movie 4"}])
+    assert guarded.breaker.state == CLOSED
+
+    await _settle(lambda: len(backend.content) == 5)
+    assert len(guarded.spill) == 0
+    assert await guarded.get_content_by_ids(ContentType.MOVIE, [1]) == {1: {"id": 1, "title": "movie 1"}}
+
+
+async def test_writes_are_spilled_without_calling_storage_while_open():
+    backend = FlakyBackend()
+    guarded = _guarded(backend)
+    backend.failure = TimeoutError()
+    for i in range(4):
+        with pytest.raises(TimeoutError):
+            await guarded.upsert_content(ContentType.MOVIE, [{"id": i}])
+    guarded.breaker.open_seconds = 60.0
+    calls = backend.calls
+
+    assert await guarded._write(lambda: backend.upsert_providers({}), lambda: None) is False
+    assert backend.calls == calls
+
+
+async def test_rejected_writes_are_not_spilled_or_counted():
+    backend = FlakyBackend()
+    guarded = _guarded(backend)
+    backend.failure = Rejected("duplicate key value violates unique constraint")
+    for i in range(10):
+        with pytest.raises(Rejected):
+            await guarded.upsert_content(ContentType.MOVIE, [{"id": i}])
+
+    assert guarded.breaker.state == CLOSED
+    assert len(guarded.spill) == 0
+
+
+async def test_spill_keeps_the_newest_row_per_key():
+    backend = FlakyBackend()
+    guarded = _guarded(backend)
+    backend.failure = ConnectionError()
+    for title in ("old", "new"):
+        with pytest.raises(ConnectionError):
+            await guarded.upsert_content(ContentType.MOVIE, [{"id": 1, "title": title}])
+
+    assert guarded.spill.drain() == [("content", ContentType.MOVIE, {"id": 1, "title": "new"})]
+
+
+async def test_cancelled_call_is_not_a_failure():
+    backend = FlakyBackend()
+    guarded = _guarded(backend)
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    for _ in range(4):
+        task = asyncio.create_task(guarded._read("hang", hang, None))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert guarded.breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("error, transient", [
+    (APIError({"code": "PGRST003", "message": "Timed out acquiring connection from connection pool."}), True),
+    (APIError({"code": "57014", "message": "canceling statement due to statement timeout"}), True),
+    (APIError({"code": 503, "message": "JSON could not be generated"}), True),
+    (APIError({"code": "23505", "message": "duplicate key value violates unique constraint"}), False),
+    (APIError({"code": "42703", "message": "column does not exist"}), False),
+    (APIError({"code": 404, "message": "JSON could not be generated"}), False),
+    (httpx.ConnectError("connection refused"), True),
+    (TimeoutError(), True),
+    (ValueError("bad row"), False),
+])
+def test_postgrest_transient_errors(error, transient):
+    # Classification needs no client
+    backend = object.__new__(PostgRESTBackend)
+    assert backend.is_transient(error) is transient
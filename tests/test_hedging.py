@@ -0,0 +1,181 @@
+"""Request hedging: the budget, first_of's race between a call and its duplicate, and TMDB's hedged GET."""
+
+import asyncio
+import time
+from typing import List
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.services import rate_limiter, tmdb_service
+from app.services.hedging import HedgeBudget, LatencyWindow, first_of
+from app.services.rate_limiter import RateLimiter
+from app.services.tmdb_service import TMDBService
+
+pytestmark = pytest.mark.anyio
+
+
+class Upstream:
+    """call() answers after the next delay in `delays`; a delay of None fails instead."""
+
+    def __init__(self, *delays):
+        self.delays = list(delays)
+        self.started = 0
+        self.cancelled: List[int] = []
+
+    async def call(self) -> int:
+        self.started += 1
+        attempt = self.started
+        delay = self.delays[attempt - 1]
+        try:
+            await asyncio.sleep(delay if delay is not None else 0.05)
+        except asyncio.CancelledError:
+            self.cancelled.append(attempt)
+            raise
+        if delay is None:
+            raise ConnectionError(f"attempt {attempt} failed")
+        return attempt
+
+
+def test_budget_banks_at_most_burst():
+    budget = HedgeBudget(ratio=0.5, burst=2)
+    assert budget.try_spend()
+    assert budget.try_spend()
+    assert not budget.try_spend()
+
+    budget.earn()
+    assert not budget.try_spend()
+    budget.earn()
+    assert budget.try_spend()
+
+    for _ in range(10):
+        budget.earn()
+    assert budget._tokens == 2
+
+
+def test_latency_window_threshold():
+    window = LatencyWindow(percentile=0.9, min_samples=10, refresh_every=10)
+    for i in range(9):
+        window.observe("/movie/{id}", i / 100)
+    assert window.threshold("/movie/{id}") is None
+    window.observe("/movie/{id}", 0.09)
+    assert window.threshold("/movie/{id}") == 0.09
+    assert window.threshold("/tv/{id}") is None
+
+
+async def test_fast_call_is_not_hedged():
+    upstream = Upstream(0.01)
+    result, hedged = await first_of(upstream.call, 0.2, HedgeBudget(1.0), "test")
+    assert (result, hedged) == (1, False)
+    assert upstream.started == 1
+
+
+async def test_no_delay_means_no_hedge():
+    upstream = Upstream(0.05)
+    assert await first_of(upstream.call, None, HedgeBudget(1.0), "test") == (1, False)
+    assert upstream.started == 1
+
+
+async def test_hedge_wins_and_the_slow_call_is_cancelled():
+    upstream = Upstream(1.0, 0.01)
+    started = time.monotonic()
+    result, hedged = await first_of(upstream.call, 0.02, HedgeBudget(1.0), "test")
+    assert (result, hedged) == (2, True)
+    assert time.monotonic() - started < 0.5
+    await asyncio.sleep(0)
+    assert upstream.cancelled == [1]
+
+
+async def test_primary_can_still_win_after_the_hedge_is_sent():
+    upstream = Upstream(0.05, 1.0)
+    result, hedged = await first_of(upstream.call, 0.02, HedgeBudget(1.0), "test")
+    assert (result, hedged) == (1, False)
+    await asyncio.sleep(0)
+    assert upstream.cancelled == [2]
+
+
+async def test_first_success_wins_over_an_earlier_failure():
+    # The primary fails after the hedge is sent; the hedge's answer is used
+    upstream = Upstream(None, 0.1)
+    result, hedged = await first_of(upstream.call, 0.02, HedgeBudget(1.0), "test")
+    assert (result, hedged) == (2, True)
+
+
+async def test_every_attempt_failing_raises():
+    upstream = Upstream(None, None)
+    with pytest.raises(ConnectionError, match="attempt 1"):
+        await first_of(upstream.call, 0.02, HedgeBudget(1.0), "test")
+
+
+async def test_budget_caps_hedges():
+    budget = HedgeBudget(ratio=0.25, burst=1)
+    upstream = Upstream(*([0.03] * 40))
+    hedges = 0
+    for _ in range(20):
+        before = upstream.started
+        await first_of(upstream.call, 0.01, budget, "test")
+        hedges += upstream.started - before - 1
+    # The banked hedge, then one for every four calls after it
+    assert hedges == 5
+
+
+async def test_delay_runs_from_when_the_request_is_sent():
+    sent = asyncio.Event()
+    calls = 0
+
+    async def call() -> str:
+        nonlocal calls
+        calls += 1
+        # Queued locally for longer than the hedge delay, then quick upstream
+        await asyncio.sleep(0.1)
+        sent.set()
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    assert await first_of(call, 0.05, HedgeBudget(1.0), "test", sent) == ("ok", False)
+    assert calls == 1
+
+
+@pytest.fixture
+def tmdb(monkeypatch, serve):
+    """A TMDBService and the ids its stand-in was asked for; the first request hangs, hedging fires after 20ms."""
+    requests: List[int] = []
+    app = FastAPI()
+
+    @app.get("/movie/{movie_id}")
+    async def movie(movie_id: int):
+        requests.append(movie_id)
+        if len(requests) == 1:
+            await asyncio.sleep(0.5)
+        return {"id": movie_id, "attempt": len(requests)}
+
+    latencies = LatencyWindow(min_samples=1, refresh_every=1)
+    latencies.observe("/movie/{id}", 0.02)
+    monkeypatch.setattr(tmdb_service, "_latencies", latencies)
+    monkeypatch.setattr(tmdb_service, "TMDB_HEDGE_MIN_DELAY", 0.0)
+    monkeypatch.setattr(rate_limiter, "_tmdb_limiter", RateLimiter("test", rate=0, burst=1, max_concurrency=4))
+
+    service = TMDBService()
+    service.base_url = serve(app).url
+    return service, requests
+
+
+async def test_tmdb_get_is_hedged(monkeypatch, tmdb):
+    monkeypatch.setattr(tmdb_service, "_hedge_budget", HedgeBudget(1.0))
+    started = time.monotonic()
+    service, requests = tmdb
+    async with httpx.AsyncClient() as client:
+        response = await service._hedged_get(client, "/movie/{id}", "/movie/550", None)
+    assert response.json() == {"id": 550, "attempt": 2}
+    assert time.monotonic() - started < 0.4
+    assert requests == [550, 550]
+
+
+async def test_tmdb_get_waits_when_over_budget(monkeypatch, tmdb):
+    monkeypatch.setattr(tmdb_service, "_hedge_budget", HedgeBudget(0.0, burst=0.0))
+    service, requests = tmdb
+    async with httpx.AsyncClient() as client:
+        response = await service._hedged_get(client, "/movie/{id}", "/movie/550", None)
+    assert response.json() == {"id": 550, "attempt": 1}
+    assert requests == [550]
@@ -0,0 +1,72 @@
+"""
+Property tests for JSONObjectExtractor: however a valid document is split
+into deltas, the extractor yields exactly the list items json.loads sees.
+"""
+
+import json
+
+from hypothesis import given, strategies as st
+
+from app.json_stream import JSONObjectExtractor
+
+# Strings are where brackets, braces, quotes and escapes hide
+_text = st.text(alphabet=st.sampled_from(list('ab {}[]",:\\\n\tüé日本')) | st.characters(), max_size=20)
+
+_scalars = st.none() | st.booleans() | st.integers() | st.floats(allow_nan=False, allow_infinity=False) | _text
+_values = st.recursive(
+    _scalars,
+    lambda children: st.lists(children, max_size=3) | st.dictionaries(_text, children, max_size=3),
+    max_leaves=8,
+)
+_items = st.lists(st.dictionaries(_text, _values, max_size=4), max_size=6)
+
+
+@st.composite
+def _documents(draw):
+    """A {"<prefix keys>..., "movies": [...]} document, compact or indented."""
+    prefix = draw(st.dictionaries(_text.filter(lambda key: key != "movies"), _scalars, max_size=2))
+    items = draw(_items)
+    indent = draw(st.sampled_from([None, 2]))
+    return json.dumps({**prefix, "movies": items}, indent=indent, ensure_ascii=draw(st.booleans()))
+
+
+def _split(doc: str, cuts: list) -> list:
+    points = sorted({cut % (len(doc) + 1) for cut in cuts})
+    bounds = [0, *points, len(doc)]
+    return [doc[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _extract(deltas: list) -> list:
+    extractor = JSONObjectExtractor()
+    items = []
+    for delta in deltas:
+        items.extend(extractor.feed(delta))
+    return items
+
+
+@given(_documents(), st.lists(st.integers(min_value=0), max_size=40))
+def test_any_split_yields_the_decoded_items(doc, cuts):
+    assert _extract(_split(doc, cuts)) == json.loads(doc)["movies"]
+
+
+@given(_documents())
+def test_one_character_deltas(doc):
+    assert _extract(list(doc)) == json.loads(doc)["movies"]
+
+
+@given(_documents(), st.lists(st.integers(min_value=0), max_size=10), _text)
+def test_text_after_the_list_is_ignored(doc, cuts, trailer):
+    extractor = JSONObjectExtractor()
+    items = []
+    for delta in _split(doc, cuts) + [trailer, '{"x": 1}]']:
+        items.extend(extractor.feed(delta))
+    assert items == json.loads(doc)["movies"]
+    assert extractor.done
+
+
+@given(_items, st.integers(min_value=1))
+def test_truncated_stream_only_yields_complete_items(items, cut):
+    doc = json.dumps({"movies": items})
+    truncated = doc[:cut % len(doc)]
+    extracted = _extract([truncated])
+    assert extracted == items[:len(extracted)]
@@ -0,0 +1,122 @@
+"""
+Integration tests for PostgresBackend against a database built from
+supabase/migrations (see "Direct Postgres storage" in the README). Skipped
+unless DATABASE_URL is set and asyncpg is installed. Rows use ids far above
+TMDB's and are deleted afterwards.
+"""
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import ContentType
+
+pytest.importorskip("asyncpg")
+DATABASE_URL = os.environ.get("DATABASE_URL")
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not DATABASE_URL, reason="DATABASE_URL is not set"),
+]
+
+from app.services.storage.postgres import SCHEMA, PostgresBackend  # noqa: E402
+
+MOVIE_IDS = [990000001, 990000002, 990000003]
+SHOW_ID = 990000101
+
+
+@pytest.fixture
+async def backend():
+    backend = PostgresBackend(DATABASE_URL, min_size=1, max_size=2)
+    try:
+        yield backend
+    finally:
+        pool = await backend._get_pool()
+        await pool.execute(f"DELETE FROM {SCHEMA}.movies WHERE id = ANY($1::int[])", MOVIE_IDS)
+        await pool.execute(f"DELETE FROM {SCHEMA}.shows WHERE id = $1", SHOW_ID)
+        await pool.execute(f"DELETE FROM {SCHEMA}.show_details WHERE id = $1", SHOW_ID)
+        await pool.execute(f"DELETE FROM {SCHEMA}.providers WHERE content_id = ANY($1::int[])", MOVIE_IDS)
+        await backend.close()
+
+
+def _movie(movie_id: int, title: str, release_date: str, popularity: float = 1.0) -> dict:
+    return {
+        "id": movie_id,
+        "title": title,
+        "release_date": release_date,
+        "popularity": popularity,
+        "genres": [{"id": 80, "name": "Crime"}],
+        "last_updated": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def test_find_content_matches_normalized_and_similar_titles(backend):
+    await backend.upsert_content(ContentType.MOVIE, [
+        _movie(MOVIE_IDS[0], "Amélie", "2001-04-25"),
+        _movie(MOVIE_IDS[1], "Spider-Man: Into the Spider-Verse", "2018-12-14"),
+    ])
+
+    rows = await backend.find_content(ContentType.MOVIE, [
+        ("amelie", 2001),
+        ("Spider Man Into The Spiderverse", 2018),
+        ("Amélie", 1999),
+        ("Nothing Like It", None),
+    ], threshold=0.5)
+
+    assert rows[0]["id"] == MOVIE_IDS[0] and rows[0]["_score"] == 1.0
+    assert rows[1]["id"] == MOVIE_IDS[1] and 0.5 <= rows[1]["_score"] < 1.0
+    assert rows[2] is None  # wrong year
+    assert rows[3] is None
+    # Generated and internal columns stay out of the item
+    assert "title_norm" not in rows[0] and "year" not in rows[0]
+
+
+async def test_upsert_updates_existing_rows(backend):
+    await backend.upsert_content(ContentType.MOVIE, [_movie(MOVIE_IDS[2], "Heat", "1995-12-15", popularity=1.0)])
+    await backend.upsert_content(ContentType.MOVIE, [_movie(MOVIE_IDS[2], "Heat", "1995-12-15", popularity=9.5)])
+
+    rows = await backend.get_content_by_ids(ContentType.MOVIE, [MOVIE_IDS[2]])
+    assert rows[MOVIE_IDS[2]]["popularity"] == 9.5
+    assert rows[MOVIE_IDS[2]]["genres"] == [{"id": 80, "name": "Crime"}]
+
+
+async def test_show_details_round_trip(backend):
+    await backend.upsert_content(ContentType.SHOW, [{"id": SHOW_ID, "name": "The Wire", "first_air_date": "2002-06-02"}])
+    seasons = [{"id": 2317, "season_number": 1, "episode_count": 13}]
+    await backend.upsert_show_details([{
+        "id": SHOW_ID,
+        "seasons": seasons,
+        "last_episode_to_air": None,
+        "next_episode_to_air": None,
+        "last_updated": datetime.now(timezone.utc).isoformat(),
+    }])
+
+    details = await backend.get_show_details([SHOW_ID])
+    assert details[SHOW_ID]["seasons"] == seasons
+
+
+async def test_providers_round_trip(backend):
+    assert await backend.get_providers(MOVIE_IDS[0], ContentType.MOVIE) is None
+    assert await backend.get_providers_updated(MOVIE_IDS[0], ContentType.MOVIE) is None
+
+    first = datetime(2026, 10, 1, tzinfo=timezone.utc)
+    second = datetime(2026, 10, 2, tzinfo=timezone.utc)
+    for updated, results in ((first, {"US": {"flatrate": []}}), (second, {"GB": {"flatrate": [{"provider_id": 8}]}})):
+        await backend.upsert_providers({
+            "content_id": MOVIE_IDS[0],
+            "content_type": "movie",
+            "last_updated": updated.isoformat(),
+            "results": results,
+        })
+
+    row = await backend.get_providers(MOVIE_IDS[0], ContentType.MOVIE)
+    assert row["results"] == {"GB": {"flatrate": [{"provider_id": 8}]}}
+    assert row["content_type"] == "movie"
+    assert await backend.get_providers_updated(MOVIE_IDS[0], ContentType.MOVIE) == second
+
+
+async def test_rejected_write_is_not_transient(backend):
+    with pytest.raises(Exception) as raised:
+        # title is NOT NULL
+        await backend.upsert_content(ContentType.MOVIE, [{"id": MOVIE_IDS[0], "title": None}])
+    assert not backend.is_transient(raised.value)
@@ -0,0 +1,134 @@
+"""The cacheable providers lookup: ETags, 304s on revalidation, and Cache-Control."""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.endpoints import providers
+from app.config import PROVIDERS_MAX_AGE, PROVIDERS_STALE_WHILE_REVALIDATE
+from app.models import ContentType
+
+pytestmark = pytest.mark.anyio
+
+CACHEABLE = f"public, max-age={PROVIDERS_MAX_AGE}, stale-while-revalidate={PROVIDERS_STALE_WHILE_REVALIDATE}"
+
+
+class FakeStorage:
+    """A stored providers row written at `version`, or none while `version` is None."""
+
+    def __init__(self):
+        self.version: Optional[str] = "2026-10-19T12:00:00+00:00"
+        self.loads = 0
+        self.saved: List[Dict[str, Any]] = []
+
+    async def get_providers_version(self, content_id: int, content_type: ContentType) -> Optional[str]:
+        return self.version
+
+    async def get_providers(self, content_id: int, content_type: ContentType, region: str) -> Optional[Dict[str, Any]]:
+        self.loads += 1
+        if self.version is None:
+            return None
+        return {"id": content_id, "results": {region: {"flatrate": [{"provider_id": 8}]}}}
+
+    async def save_providers(self, content_id: int, content_type: ContentType, data: Dict[str, Any]) -> None:
+        self.saved.append(data)
+
+
+class FakeTMDB:
+    def __init__(self):
+        self.available = True
+
+    async def get_content_providers(self, content_id: int, content_type: ContentType) -> Optional[Dict[str, Any]]:
+        if not self.available:
+            return None
+        return {"id": content_id, "results": {"US": {"flatrate": [{"provider_id": 337}]}}}
+
+
+@pytest.fixture
+async def api():
+    storage, tmdb = FakeStorage(), FakeTMDB()
+    app = FastAPI()
+    app.include_router(providers.router, prefix="/api/providers")
+    app.dependency_overrides[providers.get_supabase_service] = lambda: storage
+    app.dependency_overrides[providers.get_tmdb_service] = lambda: tmdb
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client, storage, tmdb
+
+
+async def test_stored_providers_carry_an_etag(api):
+    client, storage, _ = api
+    response = await client.get("/api/providers/movie/550?region=us")
+    assert response.status_code == 200
+    assert response.json() == {"id": 550, "results": {"US": {"flatrate": [{"provider_id": 8}]}}}
+    assert response.headers["cache-control"] == CACHEABLE
+    assert response.headers["etag"].startswith('"')
+
+    # The tag is per region and per stored version
+    other_region = await client.get("/api/providers/movie/550?region=GB")
+    assert other_region.headers["etag"] != response.headers["etag"]
+    storage.version = "2026-10-20T12:00:00+00:00"
+    rewritten = await client.get("/api/providers/movie/550?region=US")
+    assert rewritten.headers["etag"] != response.headers["etag"]
+
+
+@pytest.mark.parametrize("weak", [False, True])
+async def test_matching_if_none_match_gets_a_304_without_loading(api, weak):
+    client, storage, _ = api
+    etag = (await client.get("/api/providers/movie/550?region=US")).headers["etag"]
+    loads = storage.loads
+
+    # Compression hands clients a weak W/ form of the tag; it still matches
+    sent = "W/" + etag if weak else etag
+    response = await client.get("/api/providers/movie/550?region=US", headers={"If-None-Match": f'"other", {sent}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == CACHEABLE
+    assert storage.loads == loads
+
+
+async def test_stale_if_none_match_gets_the_body(api):
+    client, storage, _ = api
+    etag = (await client.get("/api/providers/movie/550?region=US")).headers["etag"]
+    storage.version = "2026-10-20T12:00:00+00:00"
+
+    response = await client.get("/api/providers/movie/550?region=US", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_answer_from_tmdb_has_no_etag_until_stored(api):
+    client, storage, _ = api
+    storage.version = None
+
+    response = await client.get("/api/providers/movie/550?region=US")
+    assert response.status_code == 200
+    assert response.json() == {"id": 550, "results": {"US": {"flatrate": [{"provider_id": 337}]}}}
+    assert response.headers["cache-control"] == CACHEABLE
+    assert "etag" not in response.headers
+    await asyncio.sleep(0)
+    assert len(storage.saved) == 1
+
+
+async def test_tmdb_failure_is_not_cached(api):
+    client, storage, tmdb = api
+    storage.version = None
+    tmdb.available = False
+
+    response = await client.get("/api/providers/movie/550?region=US")
+    assert response.status_code == 200
+    assert response.json() == {"id": 550, "results": {"US": {}}}
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
+    assert storage.saved == []
+
+
+async def test_post_lookup(api):
+    client, _, _ = api
+    response = await client.post("/api/providers/", json={"content_id": 550, "content_type": "movie", "region": "US"})
+    assert response.status_code == 200
+    assert response.json()["results"] == {"US": {"flatrate": [{"provider_id": 8}]}}
+    assert "cache_lookup" in response.headers["server-timing"]
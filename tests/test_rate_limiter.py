@@ -0,0 +1,140 @@
+"""RateLimiter: the token bucket, Retry-After pauses, and the rate cut on 429s and recovered afterwards."""
+
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.services import rate_limiter
+from app.services.rate_limiter import RateLimiter, TokenBucket, retry_after
+from app.services.tmdb_service import TMDBService
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=100, capacity=2)
+    started = time.monotonic()
+    await bucket.take()
+    await bucket.take()
+    assert time.monotonic() - started < 0.02
+
+    for _ in range(5):
+        await bucket.take()
+    # 5 tokens at 100/s, less whatever refilled meanwhile
+    assert 0.03 < time.monotonic() - started < 0.5
+
+
+async def test_bucket_without_a_rate_does_not_limit():
+    bucket = TokenBucket(rate=0, capacity=1)
+    started = time.monotonic()
+    for _ in range(100):
+        await bucket.take()
+    assert time.monotonic() - started < 0.05
+
+
+async def test_pause_holds_back_callers():
+    limiter = RateLimiter("test", rate=0, burst=1, max_concurrency=4)
+    limiter.pause(0.1)
+    # A shorter pause does not cut the longer one short
+    limiter.pause(0.01)
+    started = time.monotonic()
+    async with limiter.slot():
+        pass
+    assert time.monotonic() - started >= 0.09
+
+
+async def test_slot_caps_concurrency():
+    limiter = RateLimiter("test", rate=0, burst=1, max_concurrency=1)
+    async with limiter.slot():
+        assert limiter._semaphore.locked()
+    assert not limiter._semaphore.locked()
+
+
+def test_throttled_halves_the_rate_once_per_burst():
+    limiter = RateLimiter("test", rate=40, burst=10, max_concurrency=4)
+    limiter.throttled()
+    assert limiter.bucket.rate == 20
+    # More 429s from the same overload
+    limiter.throttled()
+    limiter.throttled()
+    assert limiter.bucket.rate == 20
+
+    limiter._last_decrease -= 2
+    limiter._recovered_at = time.monotonic()
+    limiter.throttled()
+    assert limiter.bucket.rate == pytest.approx(10)
+    assert limiter.rate == 40
+
+
+def test_throttled_stops_at_the_floor():
+    limiter = RateLimiter("test", rate=40, burst=10, max_concurrency=4)
+    for _ in range(20):
+        limiter._last_decrease -= 2
+        limiter._recovered_at = time.monotonic()
+        limiter.throttled()
+    assert limiter.bucket.rate == pytest.approx(2)
+
+
+def test_rate_recovers_linearly():
+    limiter = RateLimiter("test", rate=40, burst=10, max_concurrency=4, recovery_seconds=30)
+    limiter.throttled()
+    cut_at = limiter._recovered_at
+
+    limiter._recover(cut_at + 7.5)
+    assert limiter.bucket.rate == pytest.approx(30)
+    limiter._recover(cut_at + 30)
+    assert limiter.bucket.rate == 40
+
+
+async def test_slot_applies_recovery():
+    limiter = RateLimiter("test", rate=40, burst=10, max_concurrency=4, recovery_seconds=30)
+    limiter.throttled()
+    limiter._recovered_at -= 30
+    async with limiter.slot():
+        pass
+    assert limiter.bucket.rate == 40
+
+
+def test_set_rate_drops_the_backoff():
+    limiter = RateLimiter("test", rate=40, burst=10, max_concurrency=4)
+    limiter.throttled()
+    limiter.set_rate(10)
+    assert limiter.rate == limiter.bucket.rate == 10
+
+
+def test_unlimited_rate_is_not_throttled():
+    limiter = RateLimiter("test", rate=0, burst=1, max_concurrency=4)
+    limiter.throttled()
+    assert limiter.bucket.rate == 0
+
+
+def test_retry_after_parsing():
+    assert retry_after("3") == 3.0
+    assert retry_after("-1") == 0.0
+    assert retry_after(None) is None
+    assert retry_after("soon") is None
+    assert retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+async def test_tmdb_429_is_retried_and_throttles(monkeypatch, serve):
+    calls = []
+    app = FastAPI()
+
+    @app.get("/movie/{movie_id}")
+    async def movie(movie_id: int):
+        calls.append(movie_id)
+        if len(calls) == 1:
+            return JSONResponse({"status_code": 25}, status_code=429, headers={"Retry-After": "0"})
+        return {"id": movie_id}
+
+    limiter = RateLimiter("test", rate=40, burst=10, max_concurrency=4)
+    monkeypatch.setattr(rate_limiter, "_tmdb_limiter", limiter)
+    service = TMDBService()
+    service.base_url = serve(app).url
+    response = await service._get("/movie/{id}", "/movie/550")
+
+    assert response.status_code == 200
+    assert calls == [550, 550]
+    assert limiter.bucket.rate == pytest.approx(20, abs=0.5)
@@ -0,0 +1,48 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.endpoints import shows
+from app.models import ContentType
+from app.services.storage.postgrest import PostgRESTBackend
+from app.services.supabase_service import SupabaseService
+
+pytestmark = pytest.mark.anyio
+
+SHOW = {
+    "id": 1399,
+    "name": "Game of Thrones",
+    "first_air_date": "2011-04-17",
+    "number_of_seasons": 8,
+    "seasons": [{"id": 3624, "name": "Season 1", "season_number": 1, "episode_count": 10}],
+    "last_episode_to_air": {"id": 1551830, "name": "The Iron Throne", "episode_number": 6},
+    "next_episode_to_air": None,
+}
+
+
+class _NoTMDB:
+    async def get_show_details(self, show_id):
+        raise AssertionError("details should come from storage")
+
+
+async def test_saved_show_details_are_served(supabase):
+    service = SupabaseService(PostgRESTBackend())
+    await service.save_content([dict(SHOW)], ContentType.SHOW)
+
+    # The card row stays lean; the nested data is in show_details
+    (row,) = supabase.state.tables["shows"].values()
+    assert "seasons" not in row
+    assert list(supabase.state.tables["show_details"]) == [(1399,)]
+
+    app = FastAPI()
+    app.include_router(shows.router, prefix="/api/shows")
+    app.dependency_overrides[shows.get_supabase_service] = lambda: service
+    app.dependency_overrides[shows.get_tmdb_service] = _NoTMDB
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/shows/1399/details")
+
+    assert response.status_code == 200
+    details = response.json()
+    assert details["seasons"][0]["id"] == 3624
+    assert details["last_episode_to_air"]["name"] == "The Iron Throne"
+    assert details["next_episode_to_air"] is None
@@ -0,0 +1,23 @@
+import pytest
+
+from app.titles import normalize_title
+
+
+@pytest.mark.parametrize("title, expected", [
+    ("Spider-Man: Into the Spider-Verse", "spider man into the spider verse"),
+    ("Fast & Furious", "fast and furious"),
+    ("Amélie", "amelie"),
+    ("Léon: The Professional", "leon the professional"),
+    ("Straße", "strasse"),
+    ("Ёлки", "елки"),
+    ("千と千尋の神隠し", "千と千尋の神隠し"),
+    ("ゴジラ", "ゴジラ"),  # dakuten are part of the letter, not an accent
+    ("기생충", "기생충"),
+    ("  --- ", ""),
+])
+def test_normalize_title(title, expected):
+    assert normalize_title(title) == expected
+
+
+def test_scripts_do_not_collide():
+    assert normalize_title("Брат") != normalize_title("千と千尋の神隠し")